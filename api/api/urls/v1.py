@@ -6,7 +6,7 @@ from drf_yasg2.views import get_schema_view
 from rest_framework import authentication, permissions, routers
 
 from environments.identities.traits.views import SDKTraits
-from environments.identities.views import SDKIdentities
+from environments.identities.views import SDKBulkIdentities, SDKIdentities
 from environments.sdk.views import SDKEnvironmentAPIView
 from features.views import SDKFeatureStates
 from organisations.views import chargebee_webhook
@@ -45,6 +45,11 @@ urlpatterns = [
     # Client SDK urls
     url(r"^flags/$", SDKFeatureStates.as_view(), name="flags"),
     url(r"^identities/$", SDKIdentities.as_view(), name="sdk-identities"),
+    url(
+        r"^bulk-identities/$",
+        SDKBulkIdentities.as_view(),
+        name="sdk-identities-bulk",
+    ),
     url(r"^traits/", include(traits_router.urls), name="traits"),
     url(r"^analytics/flags/$", SDKAnalyticsFlags.as_view()),
     url(r"^analytics/telemetry/$", SelfHostedTelemetryAPIView.as_view()),
@@ -1,12 +1,21 @@
 import base64
+import binascii
 import json
+import typing
 from collections import OrderedDict
+from datetime import datetime
+from functools import reduce
+from operator import or_
 
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
 from drf_yasg2 import openapi
 from drf_yasg2.inspectors import PaginatorInspector
 from flag_engine.identities.builders import build_identity_model
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
@@ -15,6 +24,125 @@ class CustomPagination(PageNumberPagination):
     max_page_size = 999
 
 
+class KeysetPaginationMixin:
+    """
+    Paginate the results by the values of the ordering fields of the last result
+    of the previous page (i.e. keyset pagination), so that each page is retrieved
+    using an index on the ordering fields rather than an OFFSET, and without
+    counting the results.
+
+    Keyset pagination is used when the `cursor` query parameter is given (with an
+    empty value for the first page), and each page includes the url of the next
+    page, which has an opaque cursor. Otherwise, the results are paginated by page
+    number as before.
+
+    The last of the ordering fields must be unique (e.g. the id).
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    ordering: typing.Tuple[str, ...] = ("created_date", "id")
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None):
+        self.use_keyset = self.cursor_query_param in request.query_params
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = queryset.filter(
+                self._get_keyset_filter(queryset, self._decode_cursor(cursor))
+            )
+
+        results = list(queryset[: page_size + 1])
+        self.next_cursor = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_cursor = self._encode_cursor(results[-1])
+
+        return results
+
+    def get_paginated_response(self, data) -> Response:
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
+
+    def get_next_link(self) -> typing.Optional[str]:
+        if not self.use_keyset:
+            return super().get_next_link()
+
+        if not self.next_cursor:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def _get_keyset_filter(self, queryset: QuerySet, values: list) -> Q:
+        """
+        Build the filter for the results after the given values of the ordering
+        fields, i.e. for ordering (a, b): a > x OR (a = x AND b > y)
+        """
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = []
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            try:
+                value = queryset.model._meta.get_field(name).to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = "lt" if field.startswith("-") else "gt"
+            fields.append((name, lookup, value))
+
+        return reduce(
+            or_,
+            (
+                Q(
+                    **{name: value for name, _, value in fields[:i]},
+                    **{f"{fields[i][0]}__{fields[i][1]}": fields[i][2]},
+                )
+                for i in range(len(fields))
+            ),
+        )
+
+    def _encode_cursor(self, instance) -> str:
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            # keep the microseconds of datetimes, unlike DjangoJSONEncoder
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+class CustomKeysetPagination(KeysetPaginationMixin, CustomPagination):
+    pass
+
+
+class KeysetPageNumberPagination(KeysetPaginationMixin, PageNumberPagination):
+    # i.e. for the default pagination, which orders models by id
+    ordering = ("id",)
+
+
 class EdgeIdentityPaginationInspector(PaginatorInspector):
     def get_paginator_parameters(self, paginator):
         """
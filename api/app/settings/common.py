@@ -492,6 +492,15 @@ if ENABLE_DB_LOGGING:
 CACHE_FLAGS_SECONDS = env.int("CACHE_FLAGS_SECONDS", default=0)
 FLAGS_CACHE_LOCATION = "environment-flags"
 ENVIRONMENT_CACHE_LOCATION = "environment-objects"
+ENVIRONMENT_CACHE_SECONDS = env.int("ENVIRONMENT_CACHE_SECONDS", default=60)
+ENVIRONMENT_CACHE_BACKEND = env.str(
+    "ENVIRONMENT_CACHE_BACKEND",
+    default="django.core.cache.backends.locmem.LocMemCache",
+)
+# Number of environments (keyed by api key) to keep in a process local LRU cache in
+# front of the environment cache, which saves fetching (and unpickling) them on
+# every request. Set to 0 to disable.
+ENVIRONMENT_LOCAL_CACHE_SIZE = env.int("ENVIRONMENT_LOCAL_CACHE_SIZE", default=1000)
 CHARGEBEE_CACHE_LOCATION = "chargebee-objects"
 
 GET_FLAGS_ENDPOINT_CACHE_SECONDS = env.int(
@@ -520,6 +529,14 @@ GET_IDENTITIES_ENDPOINT_CACHE_LOCATION = env.str(
     default=GET_IDENTITIES_ENDPOINT_CACHE_NAME,
 )
 
+# Number of hashed percentages (used for percentage split segments and multivariate
+# values) to keep in a process local LRU cache.
+HASHED_PERCENTAGE_CACHE_SIZE = env.int("HASHED_PERCENTAGE_CACHE_SIZE", default=100000)
+
+# Maximum number of identities that can be identified in a single request to the
+# bulk identify endpoint.
+BULK_IDENTIFY_MAX_IDENTITIES = env.int("BULK_IDENTIFY_MAX_IDENTITIES", default=1000)
+
 CACHE_PROJECT_SEGMENTS_SECONDS = env.int("CACHE_PROJECT_SEGMENTS_SECONDS", 0)
 PROJECT_SEGMENTS_CACHE_LOCATION = "project-segments"
 
@@ -536,13 +553,100 @@ ENVIRONMENT_SEGMENTS_CACHE_BACKEND = env(
 CACHE_ENVIRONMENT_DOCUMENT_SECONDS = env.int("CACHE_ENVIRONMENT_DOCUMENT_SECONDS", 0)
 ENVIRONMENT_DOCUMENT_CACHE_LOCATION = "environment-documents"
 
+# Patch the environment documents (in dynamodb and the environment document cache)
+# with only the feature states and segments affected by a change, rather than
+# rebuilding them in full. See environments/document_patching.py.
+PATCH_ENVIRONMENT_DOCUMENTS = env.bool("PATCH_ENVIRONMENT_DOCUMENTS", default=False)
+# The number of seconds between the checks of the patched environment documents,
+# which rebuild any that are inconsistent (using the checkenvironmentdocuments
+# management command). The checks are scheduled using the task processor.
+CHECK_ENVIRONMENT_DOCUMENTS_INTERVAL_SECONDS = env.int(
+    "CHECK_ENVIRONMENT_DOCUMENTS_INTERVAL_SECONDS", default=6 * 60 * 60
+)
+
+# The maximum number of changes (audit logs) to serve as a delta of the environment
+# document (i.e. GET /environment-document/?since=...), beyond which the full
+# document is returned instead.
+ENVIRONMENT_DOCUMENT_DELTA_MAX_CHANGES = env.int(
+    "ENVIRONMENT_DOCUMENT_DELTA_MAX_CHANGES", default=100
+)
+
+# List the trait keys of an environment (i.e. GET /environments/<key>/trait-keys/)
+# from the registry of trait keys, rather than from all of the traits in the
+# environment. The registry is only maintained while this is enabled, so run the
+# backfilltraitkeys management command after enabling it.
+USE_TRAIT_KEY_REGISTRY = env.bool("USE_TRAIT_KEY_REGISTRY", default=False)
+
+# The number of traits to delete in each transaction when deleting all of the traits
+# with a given key in an environment, and the number of seconds to wait between
+# each chunk to limit the load on the database.
+TRAIT_DELETION_CHUNK_SIZE = env.int("TRAIT_DELETION_CHUNK_SIZE", default=1000)
+TRAIT_DELETION_CHUNK_DELAY_SECONDS = env.float(
+    "TRAIT_DELETION_CHUNK_DELAY_SECONDS", default=0.1
+)
+
+# Cache the ids of identities in each process, keyed on their environment and
+# identifier, so that SDK requests for identities which are known to exist don't
+# need to query them. See environments/identities/identity_id_cache.py.
+IDENTITY_ID_CACHE_ENABLED = env.bool("IDENTITY_ID_CACHE_ENABLED", default=False)
+IDENTITY_ID_CACHE_MAX_SIZE = env.int("IDENTITY_ID_CACHE_MAX_SIZE", default=100000)
+IDENTITY_ID_CACHE_TIMEOUT_SECONDS = env.int(
+    "IDENTITY_ID_CACHE_TIMEOUT_SECONDS", default=60
+)
+
+# Evaluate the flags for identities of organisations which persist trait data using
+# the traits merged in memory and persist the traits later, in batches, using the
+# task processor. See environments/identities/traits/write_behind.py.
+TRAIT_WRITE_BEHIND_ENABLED = env.bool("TRAIT_WRITE_BEHIND_ENABLED", default=False)
+# The maximum number of (coalesced) trait writes to buffer in each process, and the
+# maximum number of seconds to buffer them for, before flushing them.
+TRAIT_WRITE_BEHIND_BATCH_SIZE = env.int("TRAIT_WRITE_BEHIND_BATCH_SIZE", default=1000)
+TRAIT_WRITE_BEHIND_MAX_DELAY_SECONDS = env.float(
+    "TRAIT_WRITE_BEHIND_MAX_DELAY_SECONDS", default=1.0
+)
+# The stats of the trait writes persisted by the task processor, which must be
+# shared with the processes buffering the writes to be reported by them.
+TRAIT_WRITE_BEHIND_STATS_CACHE_NAME = "trait-write-behind-stats"
+TRAIT_WRITE_BEHIND_STATS_CACHE_BACKEND = env.str(
+    "TRAIT_WRITE_BEHIND_STATS_CACHE_BACKEND",
+    default="django.core.cache.backends.db.DatabaseCache",
+)
+TRAIT_WRITE_BEHIND_STATS_CACHE_LOCATION = env.str(
+    "TRAIT_WRITE_BEHIND_STATS_CACHE_LOCATION",
+    default=TRAIT_WRITE_BEHIND_STATS_CACHE_NAME,
+)
+
+# Evaluate the flags for (non-edge) identities using an in memory snapshot of the
+# environment, which is rebuilt whenever the environment's updated_at changes.
+EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT = env.bool(
+    "EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT", default=False
+)
+# The number of environment snapshots to keep in each process (the least recently
+# used snapshots are evicted first).
+ENVIRONMENT_SNAPSHOT_CACHE_SIZE = env.int(
+    "ENVIRONMENT_SNAPSHOT_CACHE_SIZE", default=1000
+)
+
+# The versions of each environment and project, which are incremented whenever they
+# change and used to invalidate the environment and segment caches. Use a backend
+# which is shared between workers (e.g. redis) so that a change invalidates the
+# caches of every worker straight away, rather than after their timeout.
+CACHE_VERSIONS_CACHE_NAME = "cache-versions"
+CACHE_VERSIONS_CACHE_BACKEND = env.str(
+    "CACHE_VERSIONS_CACHE_BACKEND",
+    default="django.core.cache.backends.locmem.LocMemCache",
+)
+CACHE_VERSIONS_CACHE_LOCATION = env.str(
+    "CACHE_VERSIONS_CACHE_LOCATION", default=CACHE_VERSIONS_CACHE_NAME
+)
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
     },
     ENVIRONMENT_CACHE_LOCATION: {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": ENVIRONMENT_CACHE_BACKEND,
         "LOCATION": ENVIRONMENT_CACHE_LOCATION,
     },
     FLAGS_CACHE_LOCATION: {
@@ -576,6 +680,16 @@ CACHES = {
         "LOCATION": ENVIRONMENT_SEGMENTS_CACHE_LOCATION,
         "TIMEOUT": ENVIRONMENT_SEGMENTS_CACHE_SECONDS,
     },
+    CACHE_VERSIONS_CACHE_NAME: {
+        "BACKEND": CACHE_VERSIONS_CACHE_BACKEND,
+        "LOCATION": CACHE_VERSIONS_CACHE_LOCATION,
+        "TIMEOUT": None,
+    },
+    TRAIT_WRITE_BEHIND_STATS_CACHE_NAME: {
+        "BACKEND": TRAIT_WRITE_BEHIND_STATS_CACHE_BACKEND,
+        "LOCATION": TRAIT_WRITE_BEHIND_STATS_CACHE_LOCATION,
+        "TIMEOUT": None,
+    },
 }
 
 TRENCH_AUTH = {
@@ -687,6 +801,11 @@ ENVIRONMENTS_API_KEY_TABLE_NAME_DYNAMO = env.str(
 # DynamoDB table name for storing project metadata(currently only used for identity migration)
 PROJECT_METADATA_TABLE_NAME_DYNAMO = env.str("PROJECT_METADATA_TABLE_NAME_DYNAMO", None)
 
+# Number of environment models (built from the environment documents in dynamodb) to
+# keep in a process local LRU cache, which saves rebuilding them for every edge
+# identity which is evaluated.
+ENVIRONMENT_MODEL_CACHE_SIZE = env.int("ENVIRONMENT_MODEL_CACHE_SIZE", default=1000)
+
 # Front end environment variables
 API_URL = env("API_URL", default="/api/v1/")
 ASSET_URL = env("ASSET_URL", default="/")
@@ -789,6 +908,13 @@ MAX_SELF_MIGRATABLE_IDENTITIES = env.int("MAX_SELF_MIGRATABLE_IDENTITIES", 10000
 TASK_RUN_METHOD = env.enum(
     "TASK_RUN_METHOD", type=TaskRunMethod, default=TaskRunMethod.SEPARATE_THREAD.value
 )
+
+# Wake up the task processor's threads when tasks are created (using LISTEN / NOTIFY
+# on postgres), rather than only checking for tasks every sleep interval.
+TASK_PROCESSOR_LISTEN_FOR_TASKS = env.bool(
+    "TASK_PROCESSOR_LISTEN_FOR_TASKS", default=True
+)
+
 ENABLE_TASK_PROCESSOR_HEALTH_CHECK = env.bool(
     "ENABLE_TASK_PROCESSOR_HEALTH_CHECK", default=False
 )
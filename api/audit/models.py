@@ -1,6 +1,11 @@
 import typing
 from importlib import import_module
 
+from core.cache_versions import (
+    increment_environment_versions,
+    increment_project_versions,
+)
+from django.conf import settings
 from django.db import models
 from django.db.models import Model
 from django_lifecycle import AFTER_SAVE, BEFORE_CREATE, LifecycleModel, hook
@@ -8,6 +13,7 @@ from django_lifecycle import AFTER_SAVE, BEFORE_CREATE, LifecycleModel, hook
 from api_keys.models import MasterAPIKey
 from audit.related_object_type import RelatedObjectType
 from environments.models import Environment
+from features.flags_cache import delete_rendered_flags
 from projects.models import Project
 
 RELATED_OBJECT_TYPES = ((tag.name, tag.value) for tag in RelatedObjectType)
@@ -91,6 +97,16 @@ class AuditLog(LifecycleModel):
         # Since we're re-saving the environment, we don't want to duplicate signals.
         environments.update(updated_at=self.created_date)
 
+        increment_environment_versions(environments.values_list("id", flat=True))
+        if not self.environment:
+            increment_project_versions([self.project_id])
+
+        if settings.CACHE_FLAGS_SECONDS > 0:
+            # Replace the rendered flags for the environments straight away, rather
+            # than relying on the updated_at of the (cached) environment used by the
+            # request.
+            delete_rendered_flags(environments.values_list("api_key", flat=True))
+
     @hook(BEFORE_CREATE)
     def add_project(self):
         if self.environment and self.project is None:
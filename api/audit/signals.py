@@ -1,5 +1,7 @@
 import logging
+import typing
 
+from django.conf import settings
 from django.db.models import Q
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -7,7 +9,9 @@ from django.dispatch import receiver
 from audit.decorators import handle_skipped_signals
 from audit.models import AuditLog, RelatedObjectType
 from audit.serializers import AuditLogSerializer
+from environments.document_patching import EnvironmentDocumentChange
 from environments.models import Environment
+from environments.tasks import schedule_environment_documents_check
 from integrations.datadog.datadog import DataDogWrapper
 from integrations.dynatrace.dynatrace import DynatraceWrapper
 from integrations.new_relic.new_relic import NewRelicWrapper
@@ -61,6 +65,22 @@ def track_only_feature_related_events(signal_function):
     return signal_wrapper
 
 
+def _get_environments_filter(instance: AuditLog) -> Q:
+    return (
+        Q(id=instance.environment_id)
+        if instance.environment_id
+        else Q(project=instance.project)
+    )
+
+
+def _get_environment_document_change(
+    instance: AuditLog,
+) -> typing.Optional[EnvironmentDocumentChange]:
+    if not settings.PATCH_ENVIRONMENT_DOCUMENTS:
+        return None
+    return EnvironmentDocumentChange.from_audit_log(instance)
+
+
 def _track_event_async(instance, integration_client):
     event_data = integration_client.generate_event_data(
         log=instance.log,
@@ -125,12 +145,34 @@ def send_audit_log_event_to_dynatrace(sender, instance, **kwargs):
 @receiver(post_save, sender=AuditLog)
 @handle_skipped_signals
 def send_environments_to_dynamodb(sender, instance, **kwargs):
-    environments_filter = (
-        Q(id=instance.environment_id)
-        if instance.environment_id
-        else Q(project=instance.project)
+    Environment.write_environments_to_dynamodb(
+        _get_environments_filter(instance),
+        change=_get_environment_document_change(instance),
     )
-    Environment.write_environments_to_dynamodb(environments_filter)
+
+
+@receiver(post_save, sender=AuditLog)
+@handle_skipped_signals
+def update_cached_environment_documents(sender, instance, **kwargs):
+    if not (
+        settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS > 0
+        and settings.PATCH_ENVIRONMENT_DOCUMENTS
+    ):
+        return
+
+    Environment.update_cached_environment_documents(
+        _get_environments_filter(instance),
+        change=_get_environment_document_change(instance),
+    )
+
+
+@receiver(post_save, sender=AuditLog)
+@handle_skipped_signals
+def check_patched_environment_documents(sender, instance, **kwargs):
+    # the check is scheduled once the documents are first patched, and then
+    # reschedules itself
+    if settings.PATCH_ENVIRONMENT_DOCUMENTS:
+        schedule_environment_documents_check()
 
 
 @receiver(post_save, sender=AuditLog)
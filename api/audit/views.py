@@ -4,7 +4,7 @@ from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
 from rest_framework import mixins, viewsets
 
-from app.pagination import CustomPagination
+from app.pagination import CustomKeysetPagination
 from audit.models import AuditLog
 from audit.serializers import AuditLogSerializer, AuditLogsQueryParamSerializer
 
@@ -23,6 +23,10 @@ environment_query_param = openapi.Parameter(
 )
 
 
+class AuditLogPagination(CustomKeysetPagination):
+    ordering = ("-created_date", "-id")
+
+
 @method_decorator(
     name="list",
     decorator=swagger_auto_schema(
@@ -31,7 +35,7 @@ environment_query_param = openapi.Parameter(
 )
 class AuditLogViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = AuditLogSerializer
-    pagination_class = CustomPagination
+    pagination_class = AuditLogPagination
     filterset_fields = ["is_system_event"]
 
     def get_queryset(self):
@@ -4,6 +4,7 @@ from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
 from api_keys.models import MasterAPIKey
+from environments.identities.helpers import clear_hashed_percentage_cache
 from environments.identities.models import Identity
 from environments.identities.traits.models import Trait
 from environments.models import Environment, EnvironmentAPIKey
@@ -294,3 +295,11 @@ def user_project_permission(test_user, project):
 @pytest.fixture(autouse=True)
 def task_processor_synchronously(settings):
     settings.TASK_RUN_METHOD = TaskRunMethod.SYNCHRONOUSLY
+
+
+@pytest.fixture(autouse=True)
+def clear_hashed_percentages():
+    # some tests mock the hashing so make sure that no values leak between tests
+    clear_hashed_percentage_cache()
+    yield
+    clear_hashed_percentage_cache()
@@ -0,0 +1,72 @@
+"""
+Versions of environments and projects, used to invalidate the (process local)
+caches of objects derived from them across all workers.
+
+A version is incremented whenever the environment (or project) changes. Cache
+entries record the version they were generated for and are discarded when it no
+longer matches, so workers can keep long lived local caches which are invalidated
+as soon as the versions, stored in a cache shared between workers (see
+`CACHE_VERSIONS_CACHE_BACKEND`), are incremented.
+"""
+import time
+import typing
+
+from django.conf import settings
+from django.core.cache import caches
+
+cache_versions_cache = caches[settings.CACHE_VERSIONS_CACHE_NAME]
+
+ENVIRONMENT = "environment"
+PROJECT = "project"
+
+
+def get_environment_version(environment_id: int) -> int:
+    return get_versions((ENVIRONMENT, environment_id))[0]
+
+
+def get_project_version(project_id: int) -> int:
+    return get_versions((PROJECT, project_id))[0]
+
+
+def get_versions(*objects: typing.Tuple[str, int]) -> typing.Tuple[int, ...]:
+    """
+    Get the current versions of the given (object type, object id) pairs, using a
+    single request to the cache.
+    """
+    keys = [_get_key(*obj) for obj in objects]
+    versions = cache_versions_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # if the version has never been set (or has been evicted) then start
+            # from an arbitrary (but unique) version so that no entries which were
+            # generated for a previous version are matched
+            cache_versions_cache.add(key, _get_initial_version(), timeout=None)
+            versions[key] = cache_versions_cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def increment_environment_versions(environment_ids: typing.Iterable[int]) -> None:
+    _increment_versions(ENVIRONMENT, environment_ids)
+
+
+def increment_project_versions(project_ids: typing.Iterable[int]) -> None:
+    _increment_versions(PROJECT, project_ids)
+
+
+def _increment_versions(object_type: str, object_ids: typing.Iterable[int]) -> None:
+    for object_id in object_ids:
+        key = _get_key(object_type, object_id)
+        try:
+            cache_versions_cache.incr(key)
+        except ValueError:
+            # the version isn't in the cache, so there can't be any entries for
+            # the current version either
+            cache_versions_cache.add(key, _get_initial_version(), timeout=None)
+
+
+def _get_key(object_type: str, object_id: int) -> str:
+    return f"{object_type}:{object_id}"
+
+
+def _get_initial_version() -> int:
+    return time.time_ns()
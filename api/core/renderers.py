@@ -0,0 +1,97 @@
+"""
+Renderers for the SDK endpoints, which can be served as msgpack (a compact binary
+encoding of the same data as the JSON responses) to SDKs which request it using
+the Accept header.
+
+JSON responses are encoded with orjson (see `FastJSONRenderer`) rather than the
+standard library json module.
+"""
+import typing
+
+import msgpack
+import orjson
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+class MsgPackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(
+        self,
+        data: typing.Any,
+        accepted_media_type: str = None,
+        renderer_context: dict = None,
+    ) -> bytes:
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer which produces the same output as `JSONRenderer` (for compact,
+    ascii only content) using orjson. Anything else (e.g. indented or non-ascii
+    content) is rendered by `JSONRenderer`.
+
+    Note that floats are rendered in their shortest form by orjson, so those in
+    exponent notation may differ from `JSONRenderer` (e.g. 1e16 rather than
+    1e+16), although they're the same value.
+    """
+
+    def render(
+        self,
+        data: typing.Any,
+        accepted_media_type: str = None,
+        renderer_context: dict = None,
+    ) -> bytes:
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is None:
+            try:
+                content = orjson.dumps(
+                    data,
+                    default=_encode_default,
+                    option=orjson.OPT_PASSTHROUGH_DATETIME,
+                )
+            except orjson.JSONEncodeError:
+                # e.g. integers which are too large or non string keys
+                pass
+            else:
+                if content.isascii():
+                    return content
+
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class SDKRenderersMixin:
+    """
+    Mixin for SDK views which negotiates the content type of the response (JSON
+    or msgpack) from the Accept header.
+    """
+
+    renderer_classes = [FastJSONRenderer, MsgPackRenderer]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # the response depends on the Accept header, which must be reflected in
+        # any (e.g. `cache_page`) caches
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+
+_json_encoder = JSONEncoder()
+
+
+def _encode_default(obj: typing.Any) -> typing.Any:
+    # encode anything msgpack doesn't support natively (e.g. datetimes, decimals
+    # and uuids) in the same way as the JSON responses
+    return _json_encoder.default(obj)
@@ -0,0 +1,160 @@
+"""
+A process local LRU cache in front of a (Django) cache shared between processes,
+for objects which are read on every request (e.g. the environment of an SDK
+request) and are invalidated using versions (see `core.cache_versions`).
+
+Each entry records the version of the object it holds. An entry is only served
+while it has the current version and hasn't timed out, otherwise it's refreshed
+from the database. Only one thread per process refreshes a given key at a time:
+any other threads requesting the key in the meantime are served the stale entry
+(or, if there isn't one, wait for the refresh to complete).
+
+Note that objects in the local cache are shared between requests (and threads),
+so they must not be modified.
+"""
+import threading
+import time
+import typing
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+
+from django.core.cache import BaseCache
+
+T = typing.TypeVar("T")
+
+# number of locks used to make sure that only one thread refreshes a key at a time
+# (keys are assigned to a lock by their hash)
+LOCK_STRIPES = 64
+
+
+@dataclass
+class TwoTierCacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+
+
+@dataclass(frozen=True)
+class _Entry:
+    version: typing.Hashable
+    value: typing.Any
+    expires_at: float
+
+
+class TwoTierCache:
+    def __init__(self, shared_cache: BaseCache, max_size: int, timeout: int):
+        self.shared_cache = shared_cache
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self._entries: typing.OrderedDict[str, _Entry] = OrderedDict()
+        self._entries_lock = threading.Lock()
+        self._refresh_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stats = TwoTierCacheStats()
+        self._stats_lock = threading.Lock()
+
+    def get(
+        self,
+        key: str,
+        load: typing.Callable[[], T],
+        get_version: typing.Callable[[T], typing.Hashable],
+    ) -> T:
+        """
+        Get the object for the given key.
+
+        :param key: the cache key
+        :param load: function to load the object (from the database) on a miss
+        :param get_version: function to get the current version of the object
+        """
+        entry = self._get_entry(key)
+        version = get_version(entry.value) if entry else None
+        if entry and self._is_valid(entry, version):
+            self._increment("hits")
+            return entry.value
+
+        refresh_lock = self._refresh_locks[hash(key) % LOCK_STRIPES]
+        if entry and not refresh_lock.acquire(blocking=False):
+            # another thread is already refreshing the entry
+            self._increment("stale_hits")
+            return entry.value
+        elif not entry:
+            refresh_lock.acquire()
+
+        try:
+            # the entry may have been refreshed by another thread in the meantime
+            latest_entry = self._get_entry(key)
+            if latest_entry and latest_entry is not entry:
+                version = get_version(latest_entry.value)
+                if self._is_valid(latest_entry, version):
+                    self._increment("hits")
+                    return latest_entry.value
+
+            self._increment("refreshes" if entry else "misses")
+            value = load()
+            # where possible, the version is retrieved before the object is loaded
+            # so that a concurrent change isn't cached as the new version
+            self._set_entry(
+                key, value, get_version(value) if version is None else version
+            )
+            return value
+        finally:
+            refresh_lock.release()
+
+    def delete(self, key: str) -> None:
+        with self._entries_lock:
+            self._entries.pop(key, None)
+        self.shared_cache.delete(key)
+
+    def clear(self) -> None:
+        with self._entries_lock:
+            self._entries.clear()
+        self.shared_cache.clear()
+
+    def get_stats(self) -> TwoTierCacheStats:
+        with self._stats_lock:
+            return TwoTierCacheStats(
+                **{f.name: getattr(self._stats, f.name) for f in fields(self._stats)}
+            )
+
+    def _get_entry(self, key: str) -> typing.Optional[_Entry]:
+        entry = self._get_local_entry(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            # the shared cache may have been refreshed by another process
+            shared_entry = self.shared_cache.get(key)
+            if shared_entry:
+                version, value = shared_entry
+                entry = self._set_local_entry(key, value, version)
+        return entry
+
+    def _get_local_entry(self, key: str) -> typing.Optional[_Entry]:
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set_entry(self, key: str, value: T, version: typing.Hashable) -> None:
+        self.shared_cache.set(key, (version, value), timeout=self.timeout)
+        self._set_local_entry(key, value, version)
+
+    def _set_local_entry(self, key: str, value: T, version: typing.Hashable) -> _Entry:
+        entry = _Entry(
+            version=version, value=value, expires_at=time.monotonic() + self.timeout
+        )
+        if self.max_size <= 0:
+            return entry
+
+        with self._entries_lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _is_valid(self, entry: _Entry, version: typing.Hashable) -> bool:
+        return entry.version == version and entry.expires_at > time.monotonic()
+
+    def _increment(self, stat: str) -> None:
+        with self._stats_lock:
+            setattr(self._stats, stat, getattr(self._stats, stat) + 1)
@@ -5,7 +5,6 @@ from flag_engine.features.models import FeatureStateModel
 from flag_engine.identities.models import IdentityModel
 
 from environments.identities.models import Identity
-from environments.models import Environment
 from features.models import FeatureState
 from features.multivariate.models import MultivariateFeatureStateValue
 
@@ -25,14 +24,14 @@ def get_all_feature_states_for_edge_identity(
         for the identity specifically)
     """
     segment_ids = Identity.dynamo_wrapper.get_segment_ids(identity_model=identity)
-    django_environment = Environment.objects.get(api_key=identity.environment_api_key)
 
     q = Q(identity__isnull=True) & (
         Q(feature_segment__segment__id__in=segment_ids)
         | Q(feature_segment__isnull=True)
     )
     environment_and_segment_feature_states = (
-        django_environment.feature_states.select_related(
+        FeatureState.objects.filter(environment__api_key=identity.environment_api_key)
+        .select_related(
             "feature",
             "feature_segment",
             "feature_segment__segment",
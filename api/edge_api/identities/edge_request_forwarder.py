@@ -21,6 +21,31 @@ def forward_identity_request(
     project_id: int,
     query_params: dict = None,
     request_data: dict = None,
+):
+    return forward_identity_request_sync(
+        request_method, headers, project_id, query_params, request_data
+    )
+
+
+@register_task_handler()
+def forward_identity_requests(
+    request_method: str,
+    headers: dict,
+    project_id: int,
+    payload: list,
+):
+    for request_data in payload:
+        forward_identity_request_sync(
+            request_method, headers, project_id, request_data=request_data
+        )
+
+
+def forward_identity_request_sync(
+    request_method: str,
+    headers: dict,
+    project_id: int,
+    query_params: dict = None,
+    request_data: dict = None,
 ):
     if not _should_forward(project_id):
         return
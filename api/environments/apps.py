@@ -6,3 +6,9 @@ from core.apps import BaseAppConfig
 
 class EnvironmentsConfig(BaseAppConfig):
     name = "environments"
+
+    def ready(self):
+        super().ready()
+
+        # noinspection PyUnresolvedReferences
+        import environments.signals  # noqa
@@ -0,0 +1,408 @@
+"""
+Incremental updates of environment documents (see `build_environment_document`).
+
+Building an environment document requires every feature state, segment, rule,
+condition and multivariate value in the project to be retrieved, so rather than
+rebuilding the whole document every time the environment changes, we patch only
+the sub documents affected by the change (described by the audit log of the
+change): the feature states of the changed features (both the environment default
+and the segment overrides), and the changed segments.
+
+The same sub documents are served to local evaluation SDKs as a delta of the
+environment document (see `get_environment_document_delta`), so that they don't
+need to download the whole document every time it changes.
+
+Changes which can't be described this way (e.g. changes to the environment itself)
+require a full rebuild, as do documents which are written by another process while
+they're being patched. Since a patched document is only as correct as the audit
+logs it was patched with, the `checkenvironmentdocuments` management command is run
+periodically by the task processor (see `CHECK_ENVIRONMENT_DOCUMENTS_INTERVAL_SECONDS`)
+to rebuild the documents and report any differences.
+"""
+import typing
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from flag_engine.api.document_builders import django_environment_schema
+from flag_engine.api.schemas import (
+    DjangoFeatureStateSchema,
+    DjangoSegmentSchema,
+)
+
+from audit.related_object_type import RelatedObjectType
+from features.models import FeatureSegment, FeatureState
+from features.multivariate.models import MultivariateFeatureStateValue
+from segments.models import Segment
+
+if typing.TYPE_CHECKING:
+    from audit.models import AuditLog
+    from environments.models import Environment
+
+# uuids which are generated every time a document is built (since they don't exist
+# on the django models) and so are ignored when comparing documents
+GENERATED_KEYS = ("featurestate_uuid", "mv_fs_value_uuid")
+
+
+@dataclass(frozen=True)
+class EnvironmentDocumentChange:
+    updated_at: datetime
+    feature_ids: typing.FrozenSet[int] = frozenset()
+    segment_ids: typing.FrozenSet[int] = frozenset()
+
+    @classmethod
+    def from_audit_log(
+        cls, audit_log: "AuditLog"
+    ) -> typing.Optional["EnvironmentDocumentChange"]:
+        """
+        Get the change described by the given audit log, or None if the change
+        can't be applied as a patch (and so the document must be rebuilt).
+        """
+        related_object_type = audit_log.related_object_type
+        if related_object_type == RelatedObjectType.SEGMENT.name:
+            return cls(
+                updated_at=audit_log.created_date,
+                segment_ids=frozenset([audit_log.related_object_id]),
+            )
+
+        if related_object_type in (
+            RelatedObjectType.FEATURE.name,
+            RelatedObjectType.FEATURE_STATE.name,
+        ):
+            feature_id = _get_feature_id(audit_log)
+            if feature_id is not None:
+                return cls(
+                    updated_at=audit_log.created_date,
+                    feature_ids=frozenset([feature_id]),
+                )
+
+        return None
+
+    @classmethod
+    def from_audit_logs(
+        cls, audit_logs: typing.Iterable["AuditLog"]
+    ) -> typing.Optional["EnvironmentDocumentChange"]:
+        """
+        Get the combined change described by the given audit logs, or None if any
+        of them can't be applied as a patch.
+        """
+        changes = []
+        for audit_log in audit_logs:
+            change = cls.from_audit_log(audit_log)
+            if change is None:
+                return None
+            changes.append(change)
+
+        if not changes:
+            return None
+
+        return cls(
+            updated_at=max(change.updated_at for change in changes),
+            feature_ids=frozenset().union(*(c.feature_ids for c in changes)),
+            segment_ids=frozenset().union(*(c.segment_ids for c in changes)),
+        )
+
+
+def get_environment_document_change_since(
+    environment: "Environment", since: datetime
+) -> typing.Optional[EnvironmentDocumentChange]:
+    """
+    Get the change to the environment document since the given version of the
+    environment (i.e. its updated_at), or None if it can't be determined from the
+    audit log, e.g. if the audit logs have been removed, or there are too many.
+    """
+    from audit.models import AuditLog
+
+    if since == environment.updated_at:
+        return EnvironmentDocumentChange(updated_at=since)
+    if since > environment.updated_at:
+        return None
+
+    audit_logs = AuditLog.objects.filter(
+        Q(environment=environment)
+        | Q(environment__isnull=True, project_id=environment.project_id)
+    ).exclude(related_object_type=RelatedObjectType.CHANGE_REQUEST.name)
+
+    # the version of the environment is the created date of the latest audit log
+    # (see `AuditLog.update_environments_updated_at`), so if the audit log which
+    # created the client's version no longer exists we can't tell what changed
+    if not audit_logs.filter(created_date=since).exists():
+        return None
+
+    max_changes = settings.ENVIRONMENT_DOCUMENT_DELTA_MAX_CHANGES
+    changed_audit_logs = list(
+        audit_logs.filter(created_date__gt=since).order_by("created_date")[
+            : max_changes + 1
+        ]
+    )
+    if len(changed_audit_logs) > max_changes:
+        return None
+
+    return EnvironmentDocumentChange.from_audit_logs(changed_audit_logs)
+
+
+def patch_environment_document(
+    document: dict, environment: "Environment", change: EnvironmentDocumentChange
+) -> dict:
+    """
+    Apply the given change to the environment document. Note that the document
+    is modified in place.
+    """
+    return apply_environment_document_delta(
+        document, get_environment_document_delta(environment, change)
+    )
+
+
+def get_environment_document_delta(
+    environment: "Environment", change: EnvironmentDocumentChange
+) -> dict:
+    """
+    Get the parts of the environment document affected by the given change:
+
+        - feature_ids: the ids of the changed features. All of their feature
+          states in the document (including segment overrides) are replaced with
+          the ones in `feature_states` and `segment_overrides`, so any which
+          aren't included have been deleted.
+        - feature_states: the environment feature states of the changed features.
+        - segment_overrides: the segment overrides of the changed features, as
+          objects with the `segment_id` and the `feature_state`.
+        - segment_ids: the ids of the changed segments. These segments are
+          replaced with the ones in `segments`, so any which aren't included
+          have been deleted.
+        - segments: the changed segments.
+        - updated_at: the version of the environment after the change.
+    """
+    feature_states = _get_feature_states(environment, change.feature_ids)
+    feature_state_schema = DjangoFeatureStateSchema()
+
+    # the environment's updated_at may not have been updated by the audit log yet
+    updated_at = max(environment.updated_at, change.updated_at)
+
+    return {
+        "feature_ids": sorted(change.feature_ids),
+        "feature_states": feature_state_schema.dump(
+            [
+                feature_state
+                for (segment_id, _), feature_state in feature_states.items()
+                if segment_id is None
+            ],
+            many=True,
+        ),
+        "segment_overrides": [
+            {
+                "segment_id": segment_id,
+                "feature_state": feature_state_schema.dump(feature_state),
+            }
+            for (segment_id, _), feature_state in feature_states.items()
+            if segment_id is not None
+        ],
+        "segment_ids": sorted(change.segment_ids),
+        "segments": _get_segment_documents(environment, change.segment_ids),
+        "updated_at": django_environment_schema.fields["updated_at"].serialize(
+            "updated_at", {"updated_at": updated_at}
+        ),
+    }
+
+
+def apply_environment_document_delta(document: dict, delta: dict) -> dict:
+    """
+    Apply a delta (see `get_environment_document_delta`) to the environment
+    document. Note that the document is modified in place.
+    """
+    segment_ids = set(delta["segment_ids"])
+    segment_documents = {
+        segment_document["id"]: segment_document
+        for segment_document in delta["segments"]
+    }
+    patched_segment_documents = []
+    for segment_document in document["project"]["segments"]:
+        if segment_document["id"] in segment_ids:
+            # replace the segment, or remove it if it's been deleted
+            segment_document = segment_documents.pop(segment_document["id"], None)
+            if segment_document is None:
+                continue
+        patched_segment_documents.append(segment_document)
+
+    # and add any new segments
+    document["project"]["segments"] = patched_segment_documents + list(
+        segment_documents.values()
+    )
+
+    feature_ids = set(delta["feature_ids"])
+
+    def _replace_feature_states(
+        feature_state_documents: typing.List[dict],
+        new_feature_state_documents: typing.List[dict],
+    ) -> typing.List[dict]:
+        return [
+            feature_state_document
+            for feature_state_document in feature_state_documents
+            if feature_state_document["feature"]["id"] not in feature_ids
+        ] + new_feature_state_documents
+
+    document["feature_states"] = _replace_feature_states(
+        document["feature_states"], delta["feature_states"]
+    )
+    for segment_document in document["project"]["segments"]:
+        segment_document["feature_states"] = _replace_feature_states(
+            segment_document["feature_states"],
+            [
+                segment_override["feature_state"]
+                for segment_override in delta["segment_overrides"]
+                if segment_override["segment_id"] == segment_document["id"]
+            ],
+        )
+
+    document["updated_at"] = delta["updated_at"]
+    return document
+
+
+def normalise_environment_document(document: dict) -> dict:
+    """
+    Get a copy of the environment document which can be compared with another
+    document for the same environment, i.e. with a consistent ordering and without
+    any generated values.
+    """
+
+    def _normalise(value: typing.Any) -> typing.Any:
+        if isinstance(value, dict):
+            return {
+                key: _normalise(item)
+                for key, item in value.items()
+                if key not in GENERATED_KEYS
+            }
+        if isinstance(value, list):
+            return sorted(
+                (_normalise(item) for item in value), key=_get_document_sort_key
+            )
+        return value
+
+    return _normalise(document)
+
+
+def environment_documents_match(document: dict, other_document: dict) -> bool:
+    return normalise_environment_document(document) == normalise_environment_document(
+        other_document
+    )
+
+
+def _get_feature_states(
+    environment: "Environment", feature_ids: typing.Iterable[int]
+) -> typing.Dict[typing.Tuple[typing.Optional[int], int], FeatureState]:
+    """
+    Get the latest live version of the feature states for each of the features,
+    both for the environment itself and any segment overrides, keyed on the
+    (segment id, or None, and feature id).
+    """
+    if not feature_ids:
+        return {}
+
+    feature_states = {}
+    for feature_state in (
+        FeatureState.objects.filter(
+            environment=environment, feature_id__in=feature_ids, identity__isnull=True
+        )
+        .select_related("feature", "feature_state_value", "feature_segment")
+        .prefetch_related(_get_multivariate_feature_state_values_prefetch())
+    ):
+        if not feature_state.is_live:
+            continue
+        key = (
+            getattr(feature_state.feature_segment, "segment_id", None),
+            feature_state.feature_id,
+        )
+        existing_feature_state = feature_states.get(key)
+        if not existing_feature_state or (
+            feature_state.version > existing_feature_state.version
+        ):
+            feature_states[key] = feature_state
+    return feature_states
+
+
+def _get_segment_documents(
+    environment: "Environment", segment_ids: typing.Iterable[int]
+) -> typing.List[dict]:
+    if not segment_ids:
+        return []
+
+    segments = Segment.objects.filter(
+        id__in=segment_ids, project_id=environment.project_id
+    ).prefetch_related(
+        "rules",
+        "rules__rules",
+        "rules__conditions",
+        "rules__rules__conditions",
+        "rules__rules__rules",
+        Prefetch(
+            "feature_segments",
+            queryset=FeatureSegment.objects.filter(
+                environment=environment
+            ).select_related("environment"),
+        ),
+        Prefetch(
+            "feature_segments__feature_states",
+            queryset=FeatureState.objects.select_related(
+                "feature", "feature_state_value", "feature_segment"
+            ),
+        ),
+        _get_multivariate_feature_state_values_prefetch(
+            "feature_segments__feature_states__"
+        ),
+    )
+    segment_schema = DjangoSegmentSchema(
+        context={"environment_api_key": environment.api_key}
+    )
+    return segment_schema.dump(segments, many=True)
+
+
+def _get_feature_id(audit_log: "AuditLog") -> typing.Optional[int]:
+    # feature state and feature segment audit logs may be related to the feature,
+    # or (e.g. when they're deleted) to a feature state, so the feature is taken
+    # from the historical record where possible
+    if audit_log.history_record_class_path and audit_log.history_record_id:
+        history_record = (
+            audit_log.get_history_record_model_class(
+                audit_log.history_record_class_path
+            )
+            .objects.filter(history_id=audit_log.history_record_id)
+            .first()
+        )
+        if history_record is None:
+            return None
+        return getattr(history_record, "feature_id", None) or (
+            history_record.id
+            if audit_log.related_object_type == RelatedObjectType.FEATURE.name
+            else None
+        )
+
+    if audit_log.related_object_type == RelatedObjectType.FEATURE.name:
+        return audit_log.related_object_id
+
+    return (
+        FeatureState.objects.filter(id=audit_log.related_object_id)
+        .values_list("feature_id", flat=True)
+        .first()
+    )
+
+
+def _get_multivariate_feature_state_values_prefetch(
+    lookup_prefix: str = "",
+) -> Prefetch:
+    return Prefetch(
+        f"{lookup_prefix}multivariate_feature_state_values",
+        queryset=MultivariateFeatureStateValue.objects.select_related(
+            "multivariate_feature_option"
+        ),
+    )
+
+
+def _get_document_sort_key(item: typing.Any) -> typing.Any:
+    if isinstance(item, dict):
+        feature = item.get("feature")
+        return (
+            feature["id"] if isinstance(feature, dict) else 0,
+            item.get("id") or item.get("django_id") or 0,
+            repr(item),
+        )
+    return (0, 0, repr(item))
@@ -1,10 +1,14 @@
 import logging
+import threading
 import typing
+from collections import OrderedDict
 from contextlib import suppress
+from datetime import datetime
 from typing import Iterable
 
 import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from flag_engine.api.document_builders import (
@@ -12,17 +16,24 @@ from flag_engine.api.document_builders import (
     build_identity_document,
 )
 from flag_engine.environments.builders import build_environment_model
+from flag_engine.environments.models import EnvironmentModel
 from flag_engine.identities.builders import build_identity_model
 from flag_engine.identities.models import IdentityModel
 from flag_engine.segments.evaluator import get_identity_segments
 from rest_framework.exceptions import NotFound
 
 if typing.TYPE_CHECKING:
+    from environments.document_patching import EnvironmentDocumentChange
     from environments.identities.models import Identity
     from environments.models import Environment
 
 logger = logging.getLogger()
 
+# Process local LRU cache of the environment models built from the environment
+# documents in dynamodb, in the form: {api_key: EnvironmentModel}
+_environment_models: typing.OrderedDict[str, EnvironmentModel] = OrderedDict()
+_environment_models_lock = threading.Lock()
+
 
 class DynamoWrapper:
     table_name: str = None
@@ -126,10 +137,7 @@ class DynamoIdentityWrapper(DynamoWrapper):
             identity = identity_model or build_identity_model(
                 self.get_item_from_uuid(identity_pk)
             )
-            environment_wrapper = DynamoEnvironmentWrapper()
-            environment = build_environment_model(
-                environment_wrapper.get_item(identity.environment_api_key)
-            )
+            environment = get_environment_model(identity.environment_api_key)
             segments = get_identity_segments(environment, identity)
             return [segment.id for segment in segments]
 
@@ -147,8 +155,108 @@ class DynamoEnvironmentWrapper(DynamoWrapper):
             for environment in environments:
                 writer.put_item(Item=build_environment_document(environment))
 
+    def write_environment_document(self, environment_document: dict):
+        self._table.put_item(Item=environment_document)
+
+    def patch_environments(
+        self,
+        environments: Iterable["Environment"],
+        change: "EnvironmentDocumentChange",
+    ):
+        """
+        Patch the documents of the given environments with the given change. Each
+        patched document is only written if the document hasn't been written by
+        another process since it was read (i.e. its updated_at hasn't changed),
+        otherwise (or if there's no document to patch) it's rebuilt in full.
+        """
+        from environments.document_patching import patch_environment_document
+
+        for environment in environments:
+            try:
+                document = self.get_item(environment.api_key)
+            except ObjectDoesNotExist:
+                self._rebuild_environment_document(environment)
+                continue
+
+            updated_at = document.get("updated_at")
+            try:
+                self._table.put_item(
+                    Item=patch_environment_document(document, environment, change),
+                    ConditionExpression=(
+                        Attr("updated_at").eq(updated_at)
+                        if updated_at
+                        else Attr("updated_at").not_exists()
+                    ),
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                logger.info(
+                    "Environment document for environment %d was updated while "
+                    "patching it, rebuilding it instead.",
+                    environment.id,
+                )
+                self._rebuild_environment_document(environment)
+
     def get_item(self, api_key: str) -> dict:
         try:
             return self._table.get_item(Key={"api_key": api_key})["Item"]
         except KeyError as e:
             raise ObjectDoesNotExist() from e
+
+    def _rebuild_environment_document(self, environment: "Environment"):
+        from environments.models import Environment
+
+        self._table.put_item(
+            Item=build_environment_document(
+                Environment.objects.filter_for_document_builder(id=environment.id).get()
+            )
+        )
+
+
+def get_environment_model(api_key: str) -> EnvironmentModel:
+    """
+    Get the flag engine model for the environment with the given api key.
+
+    Building the model from the environment document in dynamodb is relatively
+    expensive so the (`ENVIRONMENT_MODEL_CACHE_SIZE` most recently used) models are
+    cached per process and only rebuilt when the environment has been updated since
+    the cached model was built, which is checked against `Environment.updated_at`
+    in the database.
+    """
+    with _environment_models_lock:
+        environment_model = _environment_models.get(api_key)
+        if environment_model is not None:
+            _environment_models.move_to_end(api_key)
+
+    if environment_model is not None and not _is_outdated(environment_model):
+        return environment_model
+
+    environment_model = build_environment_model(
+        DynamoEnvironmentWrapper().get_item(api_key)
+    )
+    with _environment_models_lock:
+        _environment_models[api_key] = environment_model
+        _environment_models.move_to_end(api_key)
+        while len(_environment_models) > settings.ENVIRONMENT_MODEL_CACHE_SIZE:
+            _environment_models.popitem(last=False)
+    return environment_model
+
+
+def clear_environment_models() -> None:
+    with _environment_models_lock:
+        _environment_models.clear()
+
+
+def _is_outdated(environment_model: EnvironmentModel) -> bool:
+    from environments.models import Environment
+
+    updated_at: typing.Optional[datetime] = (
+        Environment.objects.filter(api_key=environment_model.api_key)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    # Note that the updated_at of the model comes from the environment document
+    # itself so, if the document in dynamodb hasn't been rewritten yet following
+    # an update, the model will be rebuilt again on the next call.
+    return updated_at is None or environment_model.updated_at < updated_at
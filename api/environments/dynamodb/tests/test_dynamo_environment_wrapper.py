@@ -1,8 +1,19 @@
 import pytest
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 from flag_engine.api.document_builders import build_environment_document
 
+from environments.document_patching import (
+    EnvironmentDocumentChange,
+    environment_documents_match,
+)
 from environments.dynamodb import DynamoEnvironmentWrapper
+from environments.dynamodb.dynamodb_wrapper import (
+    clear_environment_models,
+    get_environment_model,
+)
 from environments.models import Environment
 
 
@@ -59,3 +70,160 @@ def test_get_item_raises_object_does_not_exists_if_get_item_does_not_return_any_
     # Then
     with pytest.raises(ObjectDoesNotExist):
         dynamo_environment_wrapper.get_item(api_key)
+
+
+def test_patch_environments_writes_patched_document_if_it_is_unchanged(
+    mocker, environment, feature
+):
+    # Given
+    dynamo_environment_wrapper = DynamoEnvironmentWrapper()
+    mocked_dynamo_table = mocker.patch.object(dynamo_environment_wrapper, "_table")
+    document = build_environment_document(environment)
+    updated_at = document["updated_at"]
+    mocked_dynamo_table.get_item.return_value = {"Item": document}
+    change = EnvironmentDocumentChange(
+        updated_at=timezone.now(), feature_ids=frozenset([feature.id])
+    )
+
+    # When
+    dynamo_environment_wrapper.patch_environments([environment], change)
+
+    # Then
+    mocked_dynamo_table.put_item.assert_called_once_with(
+        Item=document, ConditionExpression=Attr("updated_at").eq(updated_at)
+    )
+    assert document["updated_at"] != updated_at
+
+
+def test_patch_environments_rebuilds_document_if_it_is_changed_while_patching(
+    mocker, environment, feature
+):
+    # Given
+    dynamo_environment_wrapper = DynamoEnvironmentWrapper()
+    mocked_dynamo_table = mocker.patch.object(dynamo_environment_wrapper, "_table")
+    mocked_dynamo_table.get_item.return_value = {
+        "Item": build_environment_document(environment)
+    }
+    mocked_dynamo_table.put_item.side_effect = [
+        ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"),
+        None,
+    ]
+    change = EnvironmentDocumentChange(
+        updated_at=timezone.now(), feature_ids=frozenset([feature.id])
+    )
+
+    # When
+    dynamo_environment_wrapper.patch_environments([environment], change)
+
+    # Then
+    assert mocked_dynamo_table.put_item.call_count == 2
+    _, kwargs = mocked_dynamo_table.put_item.call_args
+    assert set(kwargs) == {"Item"}
+    assert environment_documents_match(
+        kwargs["Item"], build_environment_document(environment)
+    )
+
+
+def _update_environment(environment: Environment) -> None:
+    # emulate the update to the environment's updated_at made by the audit log
+    environment.updated_at = timezone.now()
+    Environment.objects.filter(id=environment.id).update(
+        updated_at=environment.updated_at
+    )
+
+
+def test_get_environment_model_is_cached_until_environment_is_updated(
+    mocker, environment, django_assert_num_queries
+):
+    # Given
+    mocked_environment_wrapper = mocker.patch(
+        "environments.dynamodb.dynamodb_wrapper.DynamoEnvironmentWrapper"
+    )
+    mocked_get_item = mocked_environment_wrapper.return_value.get_item
+    mocked_get_item.return_value = build_environment_document(environment)
+
+    environment_model = get_environment_model(environment.api_key)
+
+    # When
+    # only the environment's updated_at is retrieved to validate the cached model
+    with django_assert_num_queries(1):
+        cached_environment_model = get_environment_model(environment.api_key)
+
+    # Then
+    assert cached_environment_model is environment_model
+    mocked_get_item.assert_called_once_with(environment.api_key)
+
+    # When
+    _update_environment(environment)
+    mocked_get_item.return_value = build_environment_document(environment)
+    rebuilt_environment_model = get_environment_model(environment.api_key)
+
+    # Then
+    assert rebuilt_environment_model is not environment_model
+    assert rebuilt_environment_model.updated_at == environment.updated_at
+    assert mocked_get_item.call_count == 2
+
+
+def test_get_environment_model_is_rebuilt_if_dynamo_document_is_outdated(
+    mocker, environment
+):
+    # Given
+    mocked_environment_wrapper = mocker.patch(
+        "environments.dynamodb.dynamodb_wrapper.DynamoEnvironmentWrapper"
+    )
+    mocked_get_item = mocked_environment_wrapper.return_value.get_item
+    # a document which was written before the latest update to the environment
+    mocked_get_item.return_value = build_environment_document(environment)
+    _update_environment(environment)
+
+    # When
+    get_environment_model(environment.api_key)
+    get_environment_model(environment.api_key)
+
+    # Then
+    assert mocked_get_item.call_count == 2
+
+
+def test_get_environment_model_evicts_least_recently_used_models(
+    settings, mocker, project, environment
+):
+    # Given
+    settings.ENVIRONMENT_MODEL_CACHE_SIZE = 2
+    clear_environment_models()
+
+    mocked_environment_wrapper = mocker.patch(
+        "environments.dynamodb.dynamodb_wrapper.DynamoEnvironmentWrapper"
+    )
+    mocked_get_item = mocked_environment_wrapper.return_value.get_item
+    environments = {
+        e.api_key: e
+        for e in [
+            environment,
+            *(
+                Environment.objects.create(name=f"env_{i}", project=project)
+                for i in range(2)
+            ),
+        ]
+    }
+    mocked_get_item.side_effect = lambda api_key: build_environment_document(
+        environments[api_key]
+    )
+    first_api_key, second_api_key, third_api_key = environments
+
+    get_environment_model(first_api_key)
+    get_environment_model(second_api_key)
+    get_environment_model(first_api_key)
+
+    # When
+    # the least recently used model (of the second environment) is evicted
+    get_environment_model(third_api_key)
+    get_environment_model(first_api_key)
+    get_environment_model(second_api_key)
+
+    # Then
+    assert [call.args[0] for call in mocked_get_item.call_args_list] == [
+        first_api_key,
+        second_api_key,
+        third_api_key,
+        second_api_key,
+    ]
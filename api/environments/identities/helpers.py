@@ -1,5 +1,8 @@
 import hashlib
 import typing
+from functools import lru_cache
+
+from django.conf import settings
 
 
 def get_hashed_percentage_for_object_ids(
@@ -10,12 +13,46 @@ def get_hashed_percentage_for_object_ids(
     the hash of those ids. This should give the same value every time for any
     list of ids.
 
+    The result is memoized (see `HASHED_PERCENTAGE_CACHE_SIZE`) since the same ids
+    are hashed every time an identity is evaluated.
+
     :param object_ids: list of object ids to calculate the has for
     :param iterations: num times to include each id in the generated string to hash
     :return: (float) number between 0 (inclusive) and 1 (exclusive)
     """
+    return _get_hashed_percentage(tuple(object_ids), iterations)
+
+
+def get_hashed_percentages_for_object_ids(
+    object_ids_list: typing.Iterable[typing.Iterable[int]],
+) -> typing.List[float]:
+    """
+    Batched version of `get_hashed_percentage_for_object_ids`, e.g. to hash the
+    (object id, identity id) pairs for many objects (or many identities) at once.
+    Any duplicate lists of object ids are only hashed once.
 
-    to_hash = ",".join(str(id_) for id_ in list(object_ids) * iterations)
+    :param object_ids_list: list of lists of object ids to calculate the hash for
+    :return: list of floats in the same order as `object_ids_list`
+    """
+    hashed_percentages = {}
+    results = []
+    for object_ids in object_ids_list:
+        object_ids = tuple(object_ids)
+        if object_ids not in hashed_percentages:
+            hashed_percentages[object_ids] = _get_hashed_percentage(object_ids, 1)
+        results.append(hashed_percentages[object_ids])
+    return results
+
+
+def clear_hashed_percentage_cache() -> None:
+    _get_hashed_percentage.cache_clear()
+
+
+@lru_cache(maxsize=settings.HASHED_PERCENTAGE_CACHE_SIZE)
+def _get_hashed_percentage(
+    object_ids: typing.Tuple[int, ...], iterations: int
+) -> float:
+    to_hash = ",".join(str(id_) for id_ in object_ids * iterations)
     hashed_value = hashlib.md5(to_hash.encode("utf-8"))
     hashed_value_as_int = int(hashed_value.hexdigest(), base=16)
     value = (hashed_value_as_int % 9999) / 9998
@@ -24,8 +61,6 @@ def get_hashed_percentage_for_object_ids(
         # since we want a number between 0 (inclusive) and 1 (exclusive), in the
         # unlikely case that we get the exact number 1, we call the method again
         # and increase the number of iterations to ensure we get a different result
-        return get_hashed_percentage_for_object_ids(
-            object_ids=object_ids, iterations=iterations + 1
-        )
+        return _get_hashed_percentage(object_ids, iterations + 1)
 
     return value
@@ -0,0 +1,93 @@
+"""
+A process local LRU cache of the ids of identities, keyed on their environment and
+identifier, so that SDK requests for identities which are known to exist can skip
+the get_or_create query (see `IdentityManager.get_or_create_for_identifier`).
+
+Identities are only ever created or deleted (their identifier and environment don't
+change), so the ids of both existing and newly created identities are cached. An
+entry is discarded as soon as its identity is deleted in this process, and entries
+time out after `IDENTITY_ID_CACHE_TIMEOUT_SECONDS` so that deletions in other
+processes are picked up within that time.
+
+Identifiers which don't exist yet aren't cached (i.e. there is no negative caching),
+since every SDK request for an unknown identifier creates the identity, which is
+then cached like any other.
+"""
+import threading
+import time
+import typing
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+
+from django.conf import settings
+
+
+@dataclass
+class IdentityIdCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class IdentityIdCache:
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+
+        # {(environment id, identifier): (identity id, expires at)}
+        self._entries: typing.OrderedDict[
+            typing.Tuple[int, str], typing.Tuple[int, float]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = IdentityIdCacheStats()
+
+    def get(self, environment_id: int, identifier: str) -> typing.Optional[int]:
+        key = (environment_id, identifier)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return entry[0]
+
+            if entry:
+                del self._entries[key]
+            self._stats.misses += 1
+            return None
+
+    def set(self, environment_id: int, identifier: str, identity_id: int) -> None:
+        key = (environment_id, identifier)
+        with self._lock:
+            self._entries[key] = (identity_id, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def delete(self, environment_id: int, identifier: str) -> None:
+        with self._lock:
+            self._entries.pop((environment_id, identifier), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> IdentityIdCacheStats:
+        with self._lock:
+            return IdentityIdCacheStats(
+                **{f.name: getattr(self._stats, f.name) for f in fields(self._stats)}
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+identity_id_cache = IdentityIdCache(
+    max_size=settings.IDENTITY_ID_CACHE_MAX_SIZE,
+    timeout=settings.IDENTITY_ID_CACHE_TIMEOUT_SECONDS,
+)
@@ -1,6 +1,133 @@
+import typing
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Manager
 
+from environments.identities.identity_id_cache import identity_id_cache
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from environments.models import Environment
+
+T = typing.TypeVar("T")
+
 
 class IdentityManager(Manager):
     def get_by_natural_key(self, identifier, environment_api_key):
         return self.get(identifier=identifier, environment__api_key=environment_api_key)
+
+    def get_or_create_for_identifier(
+        self, environment: "Environment", identifier: str
+    ) -> typing.Tuple["Identity", bool]:
+        """
+        Equivalent to `get_or_create`, except that the ids of identities are cached
+        in the process (when `IDENTITY_ID_CACHE_ENABLED`), so that identities which
+        are known to exist are built without querying the database.
+
+        Note that identities built from the cache don't have a created_date.
+
+        :return: the identity (with the given environment) and whether it was created
+        """
+        if not settings.IDENTITY_ID_CACHE_ENABLED:
+            identity, created = self.get_or_create(
+                identifier=identifier, environment=environment
+            )
+            identity.environment = environment
+            return identity, created
+
+        identity_id = identity_id_cache.get(environment.id, identifier)
+        if identity_id is not None:
+            identity = self.model(
+                id=identity_id, identifier=identifier, environment=environment
+            )
+            identity._state.adding = False
+            identity._state.db = self.db
+            return identity, False
+
+        identity, created = self.get_or_create(
+            identifier=identifier, environment=environment
+        )
+        identity.environment = environment
+        identity_id_cache.set(environment.id, identifier, identity.id)
+        return identity, created
+
+    def write_for_identifier(
+        self,
+        environment: "Environment",
+        identifier: str,
+        write: typing.Callable[["Identity", bool], T],
+    ) -> typing.Tuple["Identity", T]:
+        """
+        Get (or create) the identity using `get_or_create_for_identifier`, and write
+        to it by calling `write` with the identity and whether it was created.
+
+        If the identity was built from a cached id, but has since been deleted (by
+        another process), the write fails with an IntegrityError, in which case the id
+        is evicted from the cache and the write is retried with the identity
+        retrieved from (or created in) the database.
+
+        :return: the identity and the result of the write
+        """
+        identity, created = self.get_or_create_for_identifier(environment, identifier)
+        # identities built from the cache are the only ones without a created_date
+        if identity.created_date is not None:
+            return identity, write(identity, created)
+
+        try:
+            # the foreign key constraints are checked when the transaction commits
+            with transaction.atomic():
+                return identity, write(identity, created)
+        except IntegrityError:
+            identity_id_cache.delete(environment.id, identifier)
+            identity, created = self.get_or_create_for_identifier(
+                environment, identifier
+            )
+            return identity, write(identity, created)
+
+    def get_or_create_for_identifiers(
+        self,
+        environment: "Environment",
+        identifiers: typing.Iterable[str],
+        identifiers_to_create: typing.Optional[typing.Iterable[str]] = None,
+    ) -> typing.Dict[str, "Identity"]:
+        """
+        Get the identities with the given identifiers in the environment, creating
+        any which don't exist, using a fixed number of queries.
+
+        :param identifiers_to_create: the identifiers of the identities to create if
+            they don't exist, if not all of them
+        :return: the identities, keyed on their identifier (excluding any which
+            don't exist and weren't created)
+        """
+        identifiers = set(identifiers)
+        identities = {
+            identity.identifier: identity
+            for identity in self.filter(
+                environment=environment, identifier__in=identifiers
+            )
+        }
+
+        missing_identifiers = identifiers.difference(identities)
+        if identifiers_to_create is not None:
+            missing_identifiers.intersection_update(identifiers_to_create)
+        if missing_identifiers:
+            # ignore conflicts in case another request has created the identity in
+            # the meantime, which means we need to retrieve them again to get the ids
+            self.bulk_create(
+                [
+                    self.model(identifier=identifier, environment=environment)
+                    for identifier in missing_identifiers
+                ],
+                ignore_conflicts=True,
+            )
+            identities.update(
+                {
+                    identity.identifier: identity
+                    for identity in self.filter(
+                        environment=environment, identifier__in=missing_identifiers
+                    )
+                }
+            )
+
+        return identities
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:02
+
+from django.db import migrations
+
+from core.migration_helpers import PostgresOnlyRunSQL
+
+TRIGRAM_INDEX_NAME = "environments_identity_upper_identifier_trgm_idx"
+
+
+def create_trigram_index(apps, schema_editor):
+    # the trigram index requires the pg_trgm extension, which may not be available
+    # (or the database user may not be allowed to create it), in which case the
+    # substring searches just don't use an index
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm';")
+        if cursor.fetchone() is None:
+            return
+
+        cursor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{TRIGRAM_INDEX_NAME}" '
+            'ON "environments_identity" USING gin (UPPER("identifier"::text) gin_trgm_ops);'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{TRIGRAM_INDEX_NAME}";')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("identities", "0002_alter_identity_index_together"),
+    ]
+
+    # Note that these indexes are only added to postgres (concurrently, to avoid any
+    # downtime) and aren't part of the model state since they use operator classes
+    # on expressions. See environments/identities/search.py.
+    operations = [
+        # (the statement is passed in a list so that it isn't split)
+        PostgresOnlyRunSQL(
+            [
+                """
+                DO $$
+                BEGIN
+                    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                EXCEPTION
+                    WHEN insufficient_privilege OR undefined_file THEN
+                        RAISE WARNING 'Unable to create the pg_trgm extension: %', SQLERRM;
+                END
+                $$;
+                """
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        PostgresOnlyRunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "environments_identity_environment_id_upper_identifier_idx" '
+            'ON "environments_identity" ("environment_id", UPPER("identifier"::text) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "environments_identity_environment_id_upper_identifier_idx";',
+        ),
+        migrations.RunPython(create_trigram_index, reverse_code=drop_trigram_index),
+    ]
@@ -1,15 +1,21 @@
 import typing
 
+from django.conf import settings
 from django.db import models
-from django.db.models import Prefetch, Q
+from django.db.models import Q
 from django.utils import timezone
 
 from environments.dynamodb import DynamoIdentityWrapper
 from environments.identities.managers import IdentityManager
-from environments.identities.traits.models import Trait
+from environments.identities.traits.models import Trait, TraitKey
 from environments.models import Environment
+from environments.snapshots import (
+    get_environment_snapshot,
+    get_feature_states_queryset,
+    get_highest_priority_feature_states,
+)
 from features.models import FeatureState
-from features.multivariate.models import MultivariateFeatureStateValue
+from segments.evaluator import build_trait_index, get_compiled_segments
 from segments.models import Segment
 
 
@@ -51,6 +57,20 @@ class Identity(models.Model):
         :return: (list) flags for an identity with the correct values based on
             identity / segment priorities
         """
+        if settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT:
+            identity_flags = self._get_all_feature_states_from_snapshot(traits)
+        else:
+            identity_flags = self._get_all_feature_states_from_db(traits)
+
+        if self.environment.get_hide_disabled_flags() is True:
+            # filter out any flags that are disabled
+            return [flag for flag in identity_flags if flag.enabled]
+
+        return identity_flags
+
+    def _get_all_feature_states_from_db(
+        self, traits: typing.List[Trait] = None
+    ) -> typing.List[FeatureState]:
         segments = self.get_segments(traits=traits, overrides_only=True)
 
         # define sub queries
@@ -76,43 +96,33 @@ class Identity(models.Model):
             )
         )
 
-        select_related_args = [
-            "feature",
-            "feature_state_value",
-            "feature_segment",
-            "feature_segment__segment",
-            "identity",
-        ]
+        all_flags = get_feature_states_queryset().filter(full_query)
 
-        all_flags = (
-            FeatureState.objects.select_related(*select_related_args)
-            .prefetch_related(
-                Prefetch(
-                    "multivariate_feature_state_values",
-                    queryset=MultivariateFeatureStateValue.objects.select_related(
-                        "multivariate_feature_option"
-                    ),
-                )
-            )
-            .filter(full_query)
-        )
+        # build a list with the highest priority flag for each feature for the
+        # given identity.
+        return get_highest_priority_feature_states(all_flags)
 
-        # iterate over all the flags and build a dictionary keyed on feature with the highest priority flag
-        # for the given identity as the value.
-        identity_flags = {}
-        for flag in all_flags:
-            if flag.feature_id not in identity_flags:
-                identity_flags[flag.feature_id] = flag
-            else:
-                current_flag = identity_flags[flag.feature_id]
-                if flag > current_flag:
-                    identity_flags[flag.feature_id] = flag
+    def _get_all_feature_states_from_snapshot(
+        self, traits: typing.List[Trait] = None
+    ) -> typing.List[FeatureState]:
+        snapshot = get_environment_snapshot(self.environment)
 
-        if self.environment.get_hide_disabled_flags() is True:
-            # filter out any flags that are disabled
-            return [value for value in identity_flags.values() if value.enabled]
+        # the environment snapshot contains everything except the identity's own
+        # overrides so that's the only thing we need to query here (as well as the
+        # traits, if they haven't already been retrieved).
+        identity_feature_states = get_feature_states_queryset().filter(
+            identity=self, environment=self.environment, version__isnull=False
+        )
+        trait_index = build_trait_index(
+            self.identity_traits.all() if traits is None else traits
+        )
 
-        return list(identity_flags.values())
+        return snapshot.get_identity_feature_states(
+            environment=self.environment,
+            identity_id=self.id,
+            trait_index=trait_index,
+            identity_feature_states=identity_feature_states,
+        )
 
     def get_segments(
         self, traits: typing.List[Trait] = None, overrides_only: bool = False
@@ -124,19 +134,17 @@ class Identity(models.Model):
         :param overrides_only: only retrieve the segments which have a valid override in the environment
         :return: List of matching segments
         """
-        matching_segments = []
-        traits = self.identity_traits.all() if traits is None else traits
-
-        if overrides_only:
-            all_segments = self.environment.get_segments_from_cache()
-        else:
-            all_segments = self.environment.project.get_segments_from_cache()
-
-        for segment in all_segments:
-            if segment.does_identity_match(self, traits=traits):
-                matching_segments.append(segment)
+        trait_index = build_trait_index(
+            self.identity_traits.all() if traits is None else traits
+        )
 
-        return matching_segments
+        return [
+            compiled_segment.segment
+            for compiled_segment in get_compiled_segments(
+                self.environment, overrides_only=overrides_only
+            )
+            if compiled_segment.does_identity_match(self.id, trait_index)
+        ]
 
     def get_all_user_traits(self):
         # this is pointless, we should probably replace all uses with the below code
@@ -173,61 +181,18 @@ class Identity(models.Model):
 
         if persist:
             Trait.objects.bulk_create(trait_models)
+            TraitKey.objects.record_usage(
+                {(self.environment_id, trait.trait_key): 1 for trait in trait_models}
+            )
 
         return trait_models
 
-    def update_traits(self, trait_data_items):
+    def update_traits(self, trait_data_items) -> typing.List[Trait]:
         """
         Given a list of traits, update any that already exist and create any new ones.
         Return the full list of traits for the given identity after these changes.
 
         :param trait_data_items: list of dictionaries validated by TraitSerializerFull
-        :return: queryset of updated trait models
+        :return: list of updated trait models
         """
-        current_traits = {t.trait_key: t for t in self.identity_traits.all()}
-
-        keys_to_delete = []
-        new_traits = []
-        updated_traits = []
-
-        for trait_data_item in trait_data_items:
-            trait_key = trait_data_item["trait_key"]
-            trait_value = trait_data_item["trait_value"]
-
-            if trait_value is None:
-                # build a list of trait keys to delete having been nulled by the
-                # input data
-                keys_to_delete.append(trait_key)
-                continue
-
-            trait_value_data = Trait.generate_trait_value_data(trait_value)
-
-            if trait_key in current_traits:
-                current_trait = current_traits[trait_key]
-                # Don't update the trait if the value hasn't changed
-                if current_trait.trait_value == trait_value:
-                    continue
-
-                for attr, value in trait_value_data.items():
-                    setattr(current_trait, attr, value)
-                updated_traits.append(current_trait)
-            else:
-                new_traits.append(
-                    Trait(**trait_value_data, trait_key=trait_key, identity=self)
-                )
-
-        # delete the traits that had their keys set to None
-        if keys_to_delete:
-            self.identity_traits.filter(trait_key__in=keys_to_delete).delete()
-
-        Trait.objects.bulk_update(updated_traits, fields=Trait.BULK_UPDATE_FIELDS)
-
-        # use ignore_conflicts to handle race conditions which result in IntegrityError if another request
-        # has added a particular trait_key for the identity while this method has been determining what to
-        # update or create.
-        # See: https://github.com/Flagsmith/flagsmith/issues/370
-        Trait.objects.bulk_create(new_traits, ignore_conflicts=True)
-
-        # return the full list of traits for this identity by refreshing from the db
-        # TODO: handle this in the above logic to avoid a second hit to the DB
-        return self.identity_traits.all()
+        return Trait.objects.bulk_update_traits({self: trait_data_items})
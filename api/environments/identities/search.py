@@ -0,0 +1,52 @@
+"""
+Search for identities by identifier, using the indexes added (on postgres) in
+identities/0003_add_identifier_search_indexes.
+
+The search mode is chosen by the shape of the query:
+
+    "foo"   exact match
+    foo*    case insensitive prefix match (B-tree index on UPPER(identifier))
+    foo     case insensitive substring match (trigram GIN index on UPPER(identifier))
+
+Note that a trailing * was previously matched literally, as part of a substring
+search, so "foo*" no longer matches e.g. "my_foo*".
+
+Substring searches for queries shorter than a trigram (3 characters) can't use the
+trigram index, and nor can any substring searches if the pg_trgm extension couldn't
+be created by the migration (it must then be created by a superuser, before running
+the migration again), so they're carried out without an index. Other databases
+don't have the indexes, but support the same searches.
+"""
+import enum
+import typing
+
+from django.db.models import QuerySet
+
+
+class IdentifierSearchMode(enum.Enum):
+    EXACT = "EXACT"
+    PREFIX = "PREFIX"
+    SUBSTRING = "SUBSTRING"
+
+
+def parse_identifier_search_query(
+    search_query: str,
+) -> typing.Tuple[IdentifierSearchMode, str]:
+    if search_query.startswith('"') and search_query.endswith('"'):
+        # Quoted searches should do an exact match just like Google
+        return IdentifierSearchMode.EXACT, search_query.replace('"', "")
+
+    if search_query.endswith("*"):
+        return IdentifierSearchMode.PREFIX, search_query.rstrip("*")
+
+    return IdentifierSearchMode.SUBSTRING, search_query
+
+
+def search_identities(queryset: QuerySet, search_query: str) -> QuerySet:
+    search_mode, identifier = parse_identifier_search_query(search_query)
+
+    if search_mode == IdentifierSearchMode.EXACT:
+        return queryset.filter(identifier__exact=identifier)
+    if search_mode == IdentifierSearchMode.PREFIX:
+        return queryset.filter(identifier__istartswith=identifier)
+    return queryset.filter(identifier__icontains=identifier)
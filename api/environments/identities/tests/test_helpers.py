@@ -1,8 +1,10 @@
+import hashlib
 import itertools
 from unittest import mock
 
 from environments.identities.helpers import (
     get_hashed_percentage_for_object_ids,
+    get_hashed_percentages_for_object_ids,
 )
 
 
@@ -122,3 +124,52 @@ def test_get_hashed_percentage_does_not_return_1(mock_hashlib):
     # the second call, with a string (in bytes) that contains each object id twice
     expected_bytes_2 = ",".join(str(id_) for id_ in object_ids * 2).encode("utf-8")
     assert call_list[1][0][0] == expected_bytes_2
+
+
+def _get_hashed_percentage_without_cache(object_ids, iterations=1):
+    # the original implementation, used to verify that the values never change
+    to_hash = ",".join(str(id_) for id_ in list(object_ids) * iterations)
+    hashed_value = hashlib.md5(to_hash.encode("utf-8"))
+    value = (int(hashed_value.hexdigest(), base=16) % 9999) / 9998
+    if value == 1:
+        return _get_hashed_percentage_without_cache(object_ids, iterations + 1)
+    return value
+
+
+def test_hashed_percentages_are_identical_to_uncached_values():
+    # Given
+    object_id_pairs = list(itertools.product(range(1, 101), range(1000, 1100)))
+
+    # When
+    single_values = [
+        get_hashed_percentage_for_object_ids(pair) for pair in object_id_pairs
+    ]
+    batched_values = get_hashed_percentages_for_object_ids(object_id_pairs)
+
+    # Then
+    expected_values = [
+        _get_hashed_percentage_without_cache(pair) for pair in object_id_pairs
+    ]
+    assert single_values == expected_values
+    assert batched_values == expected_values
+
+
+@mock.patch("environments.identities.helpers.hashlib.md5", wraps=hashlib.md5)
+def test_hashed_percentages_are_only_calculated_once_for_the_same_object_ids(
+    mock_md5,
+):
+    # Given
+    object_ids = [12, 93]
+    other_object_ids = [12, 94]
+
+    # When
+    value = get_hashed_percentage_for_object_ids(object_ids)
+    cached_value = get_hashed_percentage_for_object_ids(tuple(object_ids))
+    batched_values = get_hashed_percentages_for_object_ids(
+        [object_ids, other_object_ids, other_object_ids]
+    )
+
+    # Then
+    assert value == cached_value == batched_values[0]
+    assert batched_values[1] == batched_values[2]
+    assert mock_md5.call_count == 2
@@ -0,0 +1,72 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from environments.identities.traits.models import Trait, TraitKey
+from environments.models import Environment
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate the registry of trait keys for each environment from its traits, "
+        "correcting any drift in the usage counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--environment",
+            type=int,
+            dest="environment_id",
+            help="Only backfill the trait keys of the environment with the given id",
+        )
+
+    def handle(self, *args, environment_id: int = None, **options):
+        environments = Environment.objects.order_by("id")
+        if environment_id:
+            environments = environments.filter(id=environment_id)
+
+        num_environments = num_trait_keys = 0
+        for environment_id in environments.values_list("id", flat=True).iterator():
+            num_environments += 1
+            num_trait_keys += self._backfill_trait_keys(environment_id)
+
+        self.stdout.write(
+            f"Backfilled {num_trait_keys} trait keys for {num_environments} "
+            f"environments."
+        )
+
+    def _backfill_trait_keys(self, environment_id: int) -> int:
+        trait_keys = (
+            Trait.objects.filter(identity__environment_id=environment_id)
+            .order_by()
+            .values("trait_key")
+            .annotate(usage_count=Count("id"), last_seen=Max("created_date"))
+        )
+
+        with transaction.atomic():
+            # keep the last seen times recorded when the traits were updated
+            last_seen = dict(
+                TraitKey.objects.filter(environment_id=environment_id).values_list(
+                    "key", "last_seen"
+                )
+            )
+            TraitKey.objects.filter(environment_id=environment_id).delete()
+            created_trait_keys = TraitKey.objects.bulk_create(
+                [
+                    TraitKey(
+                        environment_id=environment_id,
+                        key=trait_key["trait_key"],
+                        usage_count=trait_key["usage_count"],
+                        last_seen=max(
+                            trait_key["last_seen"],
+                            last_seen.get(
+                                trait_key["trait_key"], trait_key["last_seen"]
+                            ),
+                        ),
+                    )
+                    for trait_key in trait_keys
+                ],
+                batch_size=1000,
+            )
+
+        return len(created_trait_keys)
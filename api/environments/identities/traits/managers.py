@@ -0,0 +1,594 @@
+import typing
+from collections import defaultdict
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from core.constants import INTEGER
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Manager, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from environments.identities.traits.models import Trait
+
+# maximum number of traits to write in a single upsert statement (to stay well
+# within the limit on the number of parameters in a query)
+UPSERT_BATCH_SIZE = 1000
+
+
+class TraitManager(Manager):
+    def bulk_update_traits(
+        self,
+        identity_trait_items: typing.Dict["Identity", typing.List[dict]],
+        written_at: typing.Dict[typing.Tuple[int, str], datetime] = None,
+    ) -> typing.List["Trait"]:
+        """
+        Given a list of traits for each identity, update any that already exist,
+        create any new ones and delete any which have a null value (see
+        `Identity.update_traits`), using a fixed number of queries regardless of
+        the number of identities.
+
+        :param identity_trait_items: the trait data items (as validated by
+            TraitSerializerFull) for each identity
+        :param written_at: the time each (identity id, trait key) was written, if
+            the writes are being applied later. Any traits which have been written
+            since then aren't updated or deleted.
+        :return: the full list of traits for the given identities after the changes,
+            merged with the existing traits in memory rather than retrieved again
+        """
+        from environments.identities.traits.models import TraitKey
+
+        merged_traits, traits_to_delete, traits_to_upsert = self._merge_traits(
+            identity_trait_items,
+            # unchanged traits are still written so that their updated date is
+            # moved on
+            write_unchanged=written_at is not None,
+        )
+
+        # the change in the number of traits using each key in each environment
+        environment_ids = {
+            identity.id: identity.environment_id for identity in identity_trait_items
+        }
+        trait_key_usage = defaultdict(int)
+
+        if traits_to_delete:
+            self.filter(
+                self._get_unchanged_since_filter(traits_to_delete, written_at)
+            ).delete()
+            for trait in traits_to_delete:
+                trait_key_usage[
+                    (environment_ids[trait.identity_id], trait.trait_key)
+                ] -= 1
+
+        if traits_to_upsert:
+            for trait in self.bulk_upsert(traits_to_upsert, written_at):
+                trait_key_usage[
+                    (environment_ids[trait.identity_id], trait.trait_key)
+                ] += 1
+
+        TraitKey.objects.record_usage(trait_key_usage)
+
+        return self._sort_traits(merged_traits, identity_trait_items)
+
+    def merge_traits(
+        self, identity_trait_items: typing.Dict["Identity", typing.List[dict]]
+    ) -> typing.List["Trait"]:
+        """
+        Get the traits that `bulk_update_traits` would result in, without writing
+        them to the database. Any new traits won't have an id.
+        """
+        merged_traits, *_ = self._merge_traits(identity_trait_items)
+        return self._sort_traits(merged_traits, identity_trait_items)
+
+    def _merge_traits(
+        self,
+        identity_trait_items: typing.Dict["Identity", typing.List[dict]],
+        write_unchanged: bool = False,
+    ) -> typing.Tuple[typing.List["Trait"], typing.List["Trait"], typing.List["Trait"]]:
+        """
+        Merge the trait data items with the existing traits of each identity.
+
+        :return: the merged traits, the traits to delete and the traits to create
+            or update
+        """
+        traits = {
+            (trait.identity_id, trait.trait_key): trait
+            for trait in self._get_existing_traits(identity_trait_items)
+        }
+
+        # if a trait is included more than once, the last value is used
+        trait_values = {
+            (identity.id, trait_data_item["trait_key"]): trait_data_item["trait_value"]
+            for identity, trait_data_items in identity_trait_items.items()
+            for trait_data_item in trait_data_items
+        }
+
+        traits_to_delete = []
+        traits_to_upsert = []
+        for key, trait_value in trait_values.items():
+            identity_id, trait_key = key
+            current_trait = traits.get(key)
+            if trait_value is None:
+                if current_trait:
+                    traits_to_delete.append(current_trait)
+                    del traits[key]
+                continue
+
+            trait = self.model(
+                **{
+                    **dict.fromkeys(self.model.BULK_UPDATE_FIELDS),
+                    **self.model.generate_trait_value_data(trait_value),
+                },
+                identity_id=identity_id,
+                trait_key=trait_key,
+            )
+            if current_trait:
+                # Don't update the trait if the value hasn't changed
+                if (
+                    not write_unchanged
+                    and current_trait.value_type == trait.value_type
+                    and current_trait.trait_value == trait.trait_value
+                ):
+                    continue
+
+                for field in self.model.BULK_UPDATE_FIELDS:
+                    setattr(current_trait, field, getattr(trait, field))
+                trait = current_trait
+
+            traits[key] = trait
+            traits_to_upsert.append(trait)
+
+        return list(traits.values()), traits_to_delete, traits_to_upsert
+
+    @staticmethod
+    def _sort_traits(
+        traits: typing.List["Trait"], identities: typing.Iterable["Identity"]
+    ) -> typing.List["Trait"]:
+        # return the traits grouped by identity, in the order the identities were
+        # given (and then in the order they were created)
+        identities = {identity.id: identity for identity in identities}
+        identity_order = {identity_id: i for i, identity_id in enumerate(identities)}
+        sorted_traits = sorted(
+            traits,
+            key=lambda trait: (
+                identity_order[trait.identity_id],
+                trait.id is None,
+                trait.id or 0,
+            ),
+        )
+        for trait in sorted_traits:
+            trait.identity = identities[trait.identity_id]
+        return sorted_traits
+
+    def _get_existing_traits(
+        self, identities: typing.Iterable["Identity"]
+    ) -> typing.Iterable["Trait"]:
+        # use the identities' traits if they've already been retrieved
+        if all(_has_prefetched_traits(identity) for identity in identities):
+            return [
+                trait
+                for identity in identities
+                for trait in identity.identity_traits.all()
+            ]
+        return self.filter(identity__in=identities)
+
+    def bulk_upsert(
+        self,
+        traits: typing.List["Trait"],
+        written_at: typing.Dict[typing.Tuple[int, str], datetime] = None,
+    ) -> typing.List["Trait"]:
+        """
+        Create or update the given traits (by identity and trait key), e.g. if
+        another request has added a trait with the same key in the meantime. The
+        traits are updated with the ids of any created traits.
+
+        :param written_at: the time each (identity id, trait key) was written, if
+            the writes are being applied later. Any traits which have been written
+            since then aren't updated.
+        :return: the traits which were created (rather than updated)
+        """
+        now = timezone.now()
+        for trait in traits:
+            trait.updated_date = (
+                written_at[(trait.identity_id, trait.trait_key)] if written_at else now
+            )
+        update_fields = [*self.model.BULK_UPDATE_FIELDS, "updated_date"]
+
+        if connection.vendor != "postgresql":
+            # other databases don't support the upsert, so any new traits are
+            # inserted (ignoring those which have been created by another request in
+            # the meantime) and then all of the traits are updated by id (other than
+            # any which have been written since, although that isn't atomic)
+            existing_traits = [trait for trait in traits if trait.id]
+            new_traits = [trait for trait in traits if not trait.id]
+            created_traits, updated_dates = [], {}
+            if new_traits:
+                self.bulk_create(new_traits, ignore_conflicts=True)
+                created_traits, updated_dates = self._set_created_trait_ids(new_traits)
+
+            traits_to_update = [trait for trait in traits if trait.id]
+            if written_at:
+                if existing_traits:
+                    updated_dates.update(
+                        self.filter(
+                            id__in=[trait.id for trait in existing_traits]
+                        ).values_list("id", "updated_date")
+                    )
+                traits_to_update = [
+                    trait
+                    for trait in traits_to_update
+                    if trait.id in updated_dates
+                    and (
+                        updated_dates[trait.id] is None
+                        or updated_dates[trait.id] <= trait.updated_date
+                    )
+                ]
+            self.bulk_update(traits_to_update, fields=update_fields)
+            return created_traits
+
+        fields = ["identity_id", "trait_key", *update_fields]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(field) for field in fields)
+        update_columns = ", ".join(
+            "{0} = EXCLUDED.{0}".format(connection.ops.quote_name(field))
+            for field in update_fields
+        )
+        where = (
+            f"WHERE {table}.updated_date IS NULL "
+            f"OR {table}.updated_date <= EXCLUDED.updated_date "
+            if written_at
+            else ""
+        )
+
+        created_traits = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(traits), UPSERT_BATCH_SIZE):
+                end = start + UPSERT_BATCH_SIZE
+                batch = traits[start:end]
+                placeholders = ", ".join(
+                    ["(%s)" % ", ".join(["%s"] * (len(fields) + 1))] * len(batch)
+                )
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns}, created_date) "
+                    f"VALUES {placeholders} "
+                    f"ON CONFLICT (trait_key, identity_id) DO UPDATE "
+                    f"SET {update_columns} "
+                    f"{where}"
+                    # xmax is only 0 for rows which have been inserted (rather
+                    # than updated) by the statement
+                    f"RETURNING id, identity_id, trait_key, xmax = 0",
+                    [
+                        value
+                        for trait in batch
+                        for value in (
+                            *(getattr(trait, field) for field in fields),
+                            now,
+                        )
+                    ],
+                )
+                traits_by_key = {
+                    (trait.identity_id, trait.trait_key): trait for trait in batch
+                }
+                for trait_id, identity_id, trait_key, created in cursor.fetchall():
+                    trait = traits_by_key[(identity_id, trait_key)]
+                    trait.id = trait.id or trait_id
+                    if trait.created_date is None:
+                        trait.created_date = now
+                    if created:
+                        created_traits.append(trait)
+
+        return created_traits
+
+    @staticmethod
+    def _get_unchanged_since_filter(
+        traits: typing.List["Trait"],
+        written_at: typing.Optional[typing.Dict[typing.Tuple[int, str], datetime]],
+    ) -> Q:
+        # filter the given traits to those which haven't been written since the
+        # given times (if any)
+        if not written_at:
+            return Q(id__in=[trait.id for trait in traits])
+        return reduce(
+            or_,
+            (
+                Q(id=trait.id)
+                & (
+                    Q(updated_date__isnull=True)
+                    | Q(
+                        updated_date__lte=written_at[
+                            (trait.identity_id, trait.trait_key)
+                        ]
+                    )
+                )
+                for trait in traits
+            ),
+        )
+
+    def _set_created_trait_ids(
+        self, traits: typing.List["Trait"]
+    ) -> typing.Tuple[
+        typing.List["Trait"], typing.Dict[int, typing.Optional[datetime]]
+    ]:
+        """
+        bulk_create doesn't set the ids when ignoring conflicts, so they're
+        retrieved (along with the created dates) using a single query.
+
+        :return: the traits which were created (i.e. those whose created date is
+            the one set by bulk_create, rather than by another request), and the
+            updated date of each trait in the database
+        """
+        traits_by_key = {
+            (trait.identity_id, trait.trait_key): trait for trait in traits
+        }
+        rows = self.filter(
+            identity_id__in={trait.identity_id for trait in traits},
+            trait_key__in={trait.trait_key for trait in traits},
+        ).values_list("id", "identity_id", "trait_key", "created_date", "updated_date")
+
+        created_traits, updated_dates = [], {}
+        for trait_id, identity_id, trait_key, created_date, updated_date in rows:
+            trait = traits_by_key.get((identity_id, trait_key))
+            if trait:
+                if trait.created_date == created_date:
+                    created_traits.append(trait)
+                trait.id = trait_id
+                trait.created_date = created_date
+                updated_dates[trait_id] = updated_date
+        return created_traits, updated_dates
+
+    def increment_values(
+        self, identity_increments: typing.Dict["Identity", typing.Dict[str, int]]
+    ) -> typing.List["Trait"]:
+        """
+        Atomically increment the values of the given integer traits of each
+        identity, creating any which don't exist with the value they're incremented
+        by. Where supported, all of the increments are applied in a single query.
+
+        :param identity_increments: the amount to increment each trait (by key) by,
+            for each identity
+        :return: the incremented traits. Any traits which exist but don't have an
+            integer value aren't incremented, and aren't returned.
+        """
+        from environments.identities.traits.models import TraitKey
+
+        identities = {identity.id: identity for identity in identity_increments}
+        increments = {
+            (identity.id, trait_key): increment_by
+            for identity, trait_increments in identity_increments.items()
+            for trait_key, increment_by in trait_increments.items()
+        }
+
+        if connection.vendor == "postgresql":
+            traits, created = self._upsert_increments(increments)
+        else:
+            traits, created = self._increment_values(increments)
+
+        for trait in traits:
+            trait.identity = identities[trait.identity_id]
+
+        TraitKey.objects.record_usage(
+            {
+                (identities[identity_id].environment_id, trait_key): 1
+                for identity_id, trait_key in created
+            }
+        )
+
+        return traits
+
+    def _upsert_increments(
+        self, increments: typing.Dict[typing.Tuple[int, str], int]
+    ) -> typing.Tuple[typing.List["Trait"], typing.List[typing.Tuple[int, str]]]:
+        now = timezone.now()
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        # sorted so that concurrent increments lock the rows in the same order
+        keys = sorted(increments)
+
+        traits, created = [], []
+        with connection.cursor() as cursor:
+            for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+                end = start + UPSERT_BATCH_SIZE
+                batch = keys[start:end]
+                placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))
+                # xmax is only 0 for rows which have been inserted (rather than
+                # updated) by the statement
+                cursor.execute(
+                    f"INSERT INTO {table} "
+                    f"(identity_id, trait_key, value_type, integer_value, "
+                    f"created_date, updated_date) "
+                    f"VALUES {placeholders} "
+                    f"ON CONFLICT (trait_key, identity_id) DO UPDATE "
+                    f"SET integer_value = "
+                    f"COALESCE({table}.integer_value, 0) + EXCLUDED.integer_value, "
+                    f"updated_date = EXCLUDED.updated_date "
+                    f"WHERE {table}.value_type = %s "
+                    f"RETURNING id, identity_id, trait_key, integer_value, "
+                    f"created_date, xmax = 0",
+                    [
+                        *(
+                            value
+                            for identity_id, trait_key in batch
+                            for value in (
+                                identity_id,
+                                trait_key,
+                                INTEGER,
+                                increments[(identity_id, trait_key)],
+                                now,
+                                now,
+                            )
+                        ),
+                        INTEGER,
+                    ],
+                )
+                for row in cursor.fetchall():
+                    *trait_fields, is_created = row
+                    traits.append(self._build_integer_trait(*trait_fields))
+                    if is_created:
+                        created.append((row[1], row[2]))
+
+        return traits, created
+
+    def _increment_values(
+        self, increments: typing.Dict[typing.Tuple[int, str], int]
+    ) -> typing.Tuple[typing.List["Trait"], typing.List[typing.Tuple[int, str]]]:
+        # other databases don't support the upsert, so each trait is incremented
+        # with an UPDATE, and created if the UPDATE didn't match any rows. The trait
+        # keys of any created traits are recorded when they're saved.
+        traits = []
+        now = timezone.now()
+        for (identity_id, trait_key), increment_by in increments.items():
+            integer_traits = self.filter(
+                identity_id=identity_id, trait_key=trait_key, value_type=INTEGER
+            )
+            incremented_value = Coalesce(F("integer_value"), 0) + increment_by
+            if not integer_traits.update(
+                integer_value=incremented_value, updated_date=now
+            ):
+                trait, created = self.get_or_create(
+                    identity_id=identity_id,
+                    trait_key=trait_key,
+                    defaults={"value_type": INTEGER, "integer_value": increment_by},
+                )
+                if created:
+                    traits.append(trait)
+                    continue
+                # the trait was either created by another request in the meantime
+                # or isn't an integer
+                if not integer_traits.update(
+                    integer_value=incremented_value, updated_date=now
+                ):
+                    continue
+
+            traits.append(integer_traits.get())
+
+        return traits, []
+
+    def _build_integer_trait(
+        self,
+        trait_id: int,
+        identity_id: int,
+        trait_key: str,
+        integer_value: int,
+        created_date: datetime,
+    ) -> "Trait":
+        trait = self.model(
+            id=trait_id,
+            identity_id=identity_id,
+            trait_key=trait_key,
+            value_type=INTEGER,
+            integer_value=integer_value,
+            created_date=created_date,
+        )
+        trait._state.adding = False
+        return trait
+
+
+def _has_prefetched_traits(identity: "Identity") -> bool:
+    return "identity_traits" in getattr(identity, "_prefetched_objects_cache", {})
+
+
+class TraitKeyManager(Manager):
+    def record_usage(self, trait_key_usage: typing.Dict[typing.Tuple[int, str], int]):
+        """
+        Record the changes in the usage of the trait keys in each environment (if
+        `USE_TRAIT_KEY_REGISTRY` is enabled), using a single query for each of the
+        keys which were created and those which were deleted.
+
+        :param trait_key_usage: the change in the number of traits using each
+            (environment id, trait key). Keys which haven't changed are ignored.
+        """
+        if not settings.USE_TRAIT_KEY_REGISTRY:
+            return
+
+        created = sorted(key for key, change in trait_key_usage.items() if change > 0)
+        deleted = {
+            key: -change for key, change in trait_key_usage.items() if change < 0
+        }
+
+        if created:
+            self._upsert(created, trait_key_usage)
+
+        if deleted:
+            self.filter(
+                reduce(
+                    or_,
+                    (Q(environment_id=e, key=k) for e, k in deleted),
+                )
+            ).update(
+                usage_count=Greatest(
+                    F("usage_count")
+                    - Case(
+                        *(
+                            When(environment_id=e, key=k, then=Value(change))
+                            for (e, k), change in deleted.items()
+                        ),
+                        output_field=IntegerField(),
+                    ),
+                    Value(0),
+                )
+            )
+
+    def _upsert(
+        self,
+        keys: typing.List[typing.Tuple[int, str]],
+        trait_key_usage: typing.Dict[typing.Tuple[int, str], int],
+    ) -> None:
+        now = timezone.now()
+
+        if connection.vendor != "postgresql":
+            # other databases don't support the upsert, so any keys which don't
+            # exist are created (without any usage) before updating them
+            self.bulk_create(
+                [
+                    self.model(
+                        environment_id=environment_id,
+                        key=key,
+                        usage_count=0,
+                        last_seen=now,
+                    )
+                    for environment_id, key in keys
+                ],
+                ignore_conflicts=True,
+            )
+            self.filter(
+                reduce(or_, (Q(environment_id=e, key=k) for e, k in keys))
+            ).update(
+                usage_count=F("usage_count")
+                + Case(
+                    *(
+                        When(
+                            environment_id=e, key=k, then=Value(trait_key_usage[(e, k)])
+                        )
+                        for e, k in keys
+                    ),
+                    output_field=IntegerField(),
+                ),
+                last_seen=now,
+            )
+            return
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(keys))
+        with connection.cursor() as cursor:
+            # the keys are sorted so that concurrent upserts lock the rows in the
+            # same order
+            cursor.execute(
+                f"INSERT INTO {table} (environment_id, key, usage_count, last_seen) "
+                f"VALUES {placeholders} "
+                f"ON CONFLICT (environment_id, key) DO UPDATE "
+                f"SET usage_count = {table}.usage_count + EXCLUDED.usage_count, "
+                f"last_seen = EXCLUDED.last_seen",
+                [
+                    value
+                    for environment_id, key in keys
+                    for value in (
+                        environment_id,
+                        key,
+                        trait_key_usage[(environment_id, key)],
+                        now,
+                    )
+                ],
+            )
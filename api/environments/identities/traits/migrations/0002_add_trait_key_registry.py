@@ -0,0 +1,29 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('environments', '0027_auto_20230106_0626'),
+        ('traits', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraitKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200)),
+                ('usage_count', models.PositiveIntegerField(default=0)),
+                ('last_seen', models.DateTimeField()),
+                ('environment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trait_keys', to='environments.environment')),
+            ],
+            options={
+                'ordering': ['key'],
+                'unique_together': {('environment', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('environments', '0027_auto_20230106_0626'),
+        ('traits', '0002_add_trait_key_registry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraitDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('IN_PROGRESS', 'In Progress'), ('COMPLETE', 'Complete'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('last_deleted_trait_id', models.IntegerField(default=0)),
+                ('num_deleted_traits', models.PositiveIntegerField(default=0)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('completed_date', models.DateTimeField(blank=True, null=True)),
+                ('environment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trait_deletions', to='environments.environment')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traits', '0003_add_trait_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trait',
+            name='updated_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,8 +3,13 @@ import typing
 from core.constants import BOOLEAN, FLOAT, INTEGER, STRING
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.utils import timezone
 
 from environments.identities.traits.exceptions import TraitPersistenceError
+from environments.identities.traits.managers import (
+    TraitKeyManager,
+    TraitManager,
+)
 
 
 class Trait(models.Model):
@@ -37,6 +42,12 @@ class Trait(models.Model):
     float_value = models.FloatField(null=True, blank=True)
 
     created_date = models.DateTimeField("DateCreated", auto_now_add=True)
+    # the time the value was last written, so that writes which are applied out of
+    # order (see environments/identities/traits/write_behind.py) don't overwrite
+    # a newer value
+    updated_date = models.DateTimeField(null=True, blank=True)
+
+    objects = TraitManager()
 
     class Meta:
         verbose_name_plural = "User Traits"
@@ -121,4 +132,78 @@ class Trait(models.Model):
                 "Not possible to persist traits for this organisation."
             )
 
-        return super(Trait, self).save(*args, **kwargs)
+        created = self._state.adding
+        self.updated_date = timezone.now()
+        super(Trait, self).save(*args, **kwargs)
+        if created:
+            TraitKey.objects.record_usage(
+                {(self.identity.environment_id, self.trait_key): 1}
+            )
+
+
+class TraitKey(models.Model):
+    """
+    A registry of the trait keys used by the identities in each environment,
+    maintained as the traits are written so that the keys can be listed without
+    scanning all of the traits in the environment.
+
+    Note that the usage counts are approximate (e.g. they aren't decremented when
+    identities are deleted), see the backfilltraitkeys management command.
+    """
+
+    environment = models.ForeignKey(
+        "environments.Environment", related_name="trait_keys", on_delete=models.CASCADE
+    )
+    key = models.CharField(max_length=200)
+    usage_count = models.PositiveIntegerField(default=0)
+    last_seen = models.DateTimeField()
+
+    objects = TraitKeyManager()
+
+    class Meta:
+        unique_together = ("environment", "key")
+        ordering = ["key"]
+
+    def __str__(self):
+        return "Environment: %s - %s" % (self.environment_id, self.key)
+
+
+class TraitDeletionStatus(models.TextChoices):
+    PENDING = "PENDING"
+    IN_PROGRESS = "IN_PROGRESS"
+    COMPLETE = "COMPLETE"
+    FAILED = "FAILED"
+
+
+class TraitDeletion(models.Model):
+    """
+    A request to delete all of the traits with the given key in an environment,
+    which is carried out in chunks by the task processor (see
+    environments/identities/traits/tasks.py).
+    """
+
+    environment = models.ForeignKey(
+        "environments.Environment",
+        related_name="trait_deletions",
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(max_length=200)
+    status = models.CharField(
+        max_length=20,
+        choices=TraitDeletionStatus.choices,
+        default=TraitDeletionStatus.PENDING,
+    )
+
+    # the id of the last trait deleted, so that the deletion can be resumed
+    last_deleted_trait_id = models.IntegerField(default=0)
+    num_deleted_traits = models.PositiveIntegerField(default=0)
+
+    created_date = models.DateTimeField(auto_now_add=True)
+    completed_date = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return "Environment: %s - %s (%s)" % (
+            self.environment_id,
+            self.key,
+            self.status,
+        )
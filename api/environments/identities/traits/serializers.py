@@ -1,10 +1,14 @@
-from core.constants import INTEGER
 from rest_framework import exceptions, serializers
 
 from environments.identities.models import Identity
 from environments.identities.serializers import IdentitySerializer
 from environments.identities.traits.fields import TraitValueField
-from environments.identities.traits.models import Trait
+from environments.identities.traits.models import (
+    Trait,
+    TraitDeletion,
+    TraitKey,
+)
+from environments.identities.traits.tasks import delete_environment_traits
 
 
 class TraitSerializerFull(serializers.ModelSerializer):
@@ -43,29 +47,24 @@ class IncrementTraitValueSerializer(serializers.Serializer):
         }
 
     def create(self, validated_data):
-        trait, _ = Trait.objects.get_or_create(
-            **self._build_query_data(validated_data),
-            defaults=self._build_default_data(),
+        identity, _ = Identity.objects.get_or_create(
+            identifier=validated_data.get("identifier"),
+            environment=self.context.get("request").environment,
         )
 
-        if trait.value_type != INTEGER:
+        # the trait is incremented (or created) atomically by the database, so
+        # that concurrent increments aren't lost
+        traits = Trait.objects.increment_values(
+            {
+                identity: {
+                    validated_data.get("trait_key"): validated_data.get("increment_by")
+                }
+            }
+        )
+        if not traits:
             raise exceptions.ValidationError("Trait is not an integer.")
 
-        trait.integer_value += validated_data.get("increment_by")
-        trait.save()
-        return trait
-
-    def _build_query_data(self, validated_data):
-        identity_data = {
-            "identifier": validated_data.get("identifier"),
-            "environment": self.context.get("request").environment,
-        }
-        identity, _ = Identity.objects.get_or_create(**identity_data)
-
-        return {"trait_key": validated_data.get("trait_key"), "identity": identity}
-
-    def _build_default_data(self):
-        return {"value_type": INTEGER, "integer_value": 0}
+        return traits[0]
 
     def validate(self, attrs):
         request = self.context["request"]
@@ -83,11 +82,30 @@ class TraitKeysSerializer(serializers.Serializer):
 class DeleteAllTraitKeysSerializer(serializers.Serializer):
     key = serializers.CharField()
 
-    def delete(self):
+    def delete(self) -> TraitDeletion:
         environment = self.context.get("environment")
-        Trait.objects.filter(
-            identity__environment=environment, trait_key=self.validated_data.get("key")
+        TraitKey.objects.filter(
+            environment=environment, key=self.validated_data.get("key")
         ).delete()
+        trait_deletion = TraitDeletion.objects.create(
+            environment=environment, key=self.validated_data.get("key")
+        )
+        delete_environment_traits.delay(kwargs={"trait_deletion_id": trait_deletion.id})
+        return trait_deletion
+
+
+class TraitDeletionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TraitDeletion
+        fields = (
+            "id",
+            "key",
+            "status",
+            "num_deleted_traits",
+            "created_date",
+            "completed_date",
+        )
+        read_only_fields = fields
 
 
 class TraitSerializer(serializers.ModelSerializer):
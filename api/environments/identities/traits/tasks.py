@@ -0,0 +1,98 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from environments.identities.traits.models import (
+    Trait,
+    TraitDeletion,
+    TraitDeletionStatus,
+    TraitKey,
+)
+from task_processor.decorators import register_task_handler
+from task_processor.task_run_method import TaskRunMethod
+
+logger = logging.getLogger(__name__)
+
+
+@register_task_handler()
+def delete_environment_traits(trait_deletion_id: int) -> None:
+    """
+    Delete the traits with the key of the given trait deletion in chunks, ordered
+    by id, so that each chunk is deleted in a short transaction. The progress is
+    recorded after each chunk so that the deletion can be polled, and resumed if
+    the task is retried.
+
+    Each run of the task deletes a single chunk and schedules the task again to
+    delete the next one, so that a task processor thread isn't held for the whole
+    deletion.
+    """
+    trait_deletion = TraitDeletion.objects.get(id=trait_deletion_id)
+    if trait_deletion.status == TraitDeletionStatus.COMPLETE:
+        return
+
+    if trait_deletion.status != TraitDeletionStatus.IN_PROGRESS:
+        trait_deletion.status = TraitDeletionStatus.IN_PROGRESS
+        trait_deletion.save(update_fields=["status"])
+
+    try:
+        has_more_traits = _delete_chunk(trait_deletion)
+        # tasks can only be scheduled to run later by the task processor, so
+        # otherwise the remaining chunks are deleted by this run of the task
+        while (
+            has_more_traits and settings.TASK_RUN_METHOD != TaskRunMethod.TASK_PROCESSOR
+        ):
+            time.sleep(settings.TRAIT_DELETION_CHUNK_DELAY_SECONDS)
+            has_more_traits = _delete_chunk(trait_deletion)
+    except Exception:
+        logger.exception("Failed to delete traits for %s", trait_deletion)
+        trait_deletion.status = TraitDeletionStatus.FAILED
+        trait_deletion.save(update_fields=["status"])
+        raise
+
+    if has_more_traits:
+        delete_environment_traits.delay(
+            kwargs={"trait_deletion_id": trait_deletion_id},
+            delay_until=timezone.now()
+            + timedelta(seconds=settings.TRAIT_DELETION_CHUNK_DELAY_SECONDS),
+        )
+        return
+
+    # any trait keys recorded whilst the traits were being deleted are removed too
+    TraitKey.objects.filter(
+        environment_id=trait_deletion.environment_id, key=trait_deletion.key
+    ).delete()
+
+    trait_deletion.status = TraitDeletionStatus.COMPLETE
+    trait_deletion.completed_date = timezone.now()
+    trait_deletion.save(update_fields=["status", "completed_date"])
+
+
+def _delete_chunk(trait_deletion: TraitDeletion) -> bool:
+    """
+    :return: whether there may be more traits to delete
+    """
+    trait_ids = list(
+        Trait.objects.filter(
+            identity__environment_id=trait_deletion.environment_id,
+            trait_key=trait_deletion.key,
+            id__gt=trait_deletion.last_deleted_trait_id,
+        )
+        .order_by("id")
+        .values_list("id", flat=True)[: settings.TRAIT_DELETION_CHUNK_SIZE]
+    )
+    if not trait_ids:
+        return False
+
+    with transaction.atomic():
+        Trait.objects.filter(id__in=trait_ids).delete()
+        trait_deletion.last_deleted_trait_id = trait_ids[-1]
+        trait_deletion.num_deleted_traits += len(trait_ids)
+        trait_deletion.save(
+            update_fields=["last_deleted_trait_id", "num_deleted_traits"]
+        )
+
+    return len(trait_ids) == settings.TRAIT_DELETION_CHUNK_SIZE
@@ -1,6 +1,5 @@
 from django.conf import settings
 from django.core.exceptions import BadRequest
-from django.db.models import Q
 from django.utils.decorators import method_decorator
 from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
@@ -15,7 +14,7 @@ from edge_api.identities.edge_request_forwarder import (
 )
 from environments.authentication import EnvironmentKeyAuthentication
 from environments.identities.models import Identity
-from environments.identities.traits.models import Trait
+from environments.identities.traits.models import Trait, TraitKey
 from environments.identities.traits.serializers import (
     IncrementTraitValueSerializer,
     TraitSerializer,
@@ -120,10 +119,19 @@ class TraitViewSet(viewsets.ModelViewSet):
                 trait_key=trait.trait_key,
                 identity__environment=trait.identity.environment,
             ).delete()
+            TraitKey.objects.filter(
+                environment=trait.identity.environment, key=trait.trait_key
+            ).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         else:
             return super(TraitViewSet, self).destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        TraitKey.objects.record_usage(
+            {(instance.identity.environment_id, instance.trait_key): -1}
+        )
+
 
 class SDKTraitsDeprecated(SDKAPIView):
     # API to handle /api/v1/identities/<identifier>/traits/<trait_key> endpoints
@@ -267,27 +275,16 @@ class SDKTraits(mixins.CreateModelMixin, viewsets.GenericViewSet):
                 raise BadRequest("Unable to set traits with client key.")
 
             # endpoint allows users to delete existing traits by sending null values
-            # for the trait value so we need to filter those out here
-            traits = []
-            delete_filter_query = Q()
-
-            for trait in request.data:
-                if trait.get("trait_value") is None:
-                    delete_filter_query = delete_filter_query | Q(
-                        trait_key=trait.get("trait_key"),
-                        identity__identifier=trait["identity"]["identifier"],
-                        identity__environment=request.environment,
-                    )
-                else:
-                    traits.append(trait)
-
-            if delete_filter_query:
-                Trait.objects.filter(delete_filter_query).delete()
-
-            serializer = self.get_serializer(data=traits, many=True)
+            # for the trait value, which are deleted (along with the other changes)
+            # when the serializer is saved, but aren't included in the response
+            serializer = self.get_serializer(data=request.data, many=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
 
+            traits = [
+                trait for trait in request.data if trait.get("trait_value") is not None
+            ]
+
             if settings.EDGE_API_URL and request.environment.project.enable_dynamo_db:
                 forward_trait_requests.delay(
                     args=(
@@ -302,7 +299,14 @@ class SDKTraits(mixins.CreateModelMixin, viewsets.GenericViewSet):
                 request.environment,
                 [trait["identity"]["identifier"] for trait in traits],
             )
-            return Response(serializer.data, status=200)
+            return Response(
+                [
+                    trait
+                    for trait in serializer.data
+                    if trait["trait_value"] is not None
+                ],
+                status=200,
+            )
 
         except (TypeError, AttributeError) as excinfo:
             logger.error("Invalid request data: %s" % str(excinfo))
@@ -0,0 +1,278 @@
+"""
+Write behind persistence of the traits set when identifying (see
+`TRAIT_WRITE_BEHIND_ENABLED`).
+
+Rather than writing the traits before the flags are returned, the flags are
+evaluated using the traits merged in memory, and the writes are buffered in the
+process, keeping only the last write for each identity and trait key. The buffer is
+flushed to the task processor as a single task when it reaches
+`TRAIT_WRITE_BEHIND_BATCH_SIZE` writes, or when its oldest write has been buffered
+for `TRAIT_WRITE_BEHIND_MAX_DELAY_SECONDS`, and the task applies all of the writes
+using a fixed number of queries.
+
+Note that this means the traits are only durable once they've been flushed, and
+that requests served by other processes may not see them until they've been
+persisted. The buffer is also flushed when the process exits, so the writes are
+only lost if the process is killed (or crashes) before they're flushed.
+
+Each flush is persisted by its own task, and the tasks may be run out of order
+(e.g. when a task is retried after failing, or by concurrent task processor
+threads), so each write includes the time it was made, and traits which have been
+written since then (see `Trait.updated_date`) aren't updated or deleted by it.
+
+The stats of the persisted writes are recorded by the task processor in a cache
+shared with the processes buffering the writes (see
+`TRAIT_WRITE_BEHIND_STATS_CACHE_BACKEND`).
+"""
+import atexit
+import logging
+import threading
+import time
+import typing
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from task_processor.decorators import register_task_handler
+
+logger = logging.getLogger(__name__)
+
+trait_write_behind_stats_cache = caches[settings.TRAIT_WRITE_BEHIND_STATS_CACHE_NAME]
+
+PERSISTED_WRITES_CACHE_KEY = "persisted_writes"
+LAST_FLUSH_LAG_CACHE_KEY = "last_flush_lag_seconds"
+MAX_FLUSH_LAG_CACHE_KEY = "max_flush_lag_seconds"
+
+
+@dataclass
+class TraitWriteBehindStats:
+    # writes added to the buffer and those which replaced a buffered write
+    buffered_writes: int = 0
+    coalesced_writes: int = 0
+    # writes flushed to the task processor, and those persisted by it (for all
+    # processes)
+    flushes: int = 0
+    flushed_writes: int = 0
+    persisted_writes: int = 0
+    # time between a write being buffered and it being persisted
+    last_flush_lag_seconds: float = 0.0
+    max_flush_lag_seconds: float = 0.0
+
+
+class TraitWriteBuffer:
+    def __init__(self, batch_size: int, max_delay_seconds: float):
+        self.batch_size = batch_size
+        self.max_delay_seconds = max_delay_seconds
+
+        # {identity id: {trait key: (trait value, time buffered, time written)}}
+        self._writes: typing.Dict[
+            int, typing.Dict[str, typing.Tuple[typing.Any, float, float]]
+        ] = defaultdict(dict)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._timer: typing.Optional[threading.Timer] = None
+        self._stats = TraitWriteBehindStats()
+        self._stats_lock = threading.Lock()
+
+    def add(
+        self, identity_trait_items: typing.Dict[Identity, typing.List[dict]]
+    ) -> None:
+        """
+        Buffer the given trait data items (as validated by TraitSerializerFull) to
+        be written to the traits of each identity.
+        """
+        now = time.time()
+        with self._lock:
+            for identity, trait_data_items in identity_trait_items.items():
+                identity_writes = self._writes[identity.id]
+                for trait_data_item in trait_data_items:
+                    self._add_write(identity_writes, trait_data_item, now)
+
+            is_full = self._size >= self.batch_size
+            if not is_full and self._size and self._timer is None:
+                self._timer = threading.Timer(
+                    self.max_delay_seconds, self._flush_from_timer
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+        if is_full:
+            self.flush()
+
+    def get_trait_data_items(self, identity: Identity) -> typing.List[dict]:
+        """
+        Get the writes to the identity's traits which are yet to be flushed, so
+        that they can be merged with the persisted traits.
+        """
+        with self._lock:
+            return [
+                {"trait_key": trait_key, "trait_value": trait_value}
+                for trait_key, (trait_value, *_) in self._writes.get(
+                    identity.id, {}
+                ).items()
+            ]
+
+    def flush(self) -> None:
+        with self._lock:
+            writes, self._writes, self._size = self._writes, defaultdict(dict), 0
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+        # [identity id, trait key, trait value, time buffered, time written]
+        serialized_writes = [
+            [identity_id, trait_key, *write]
+            for identity_id, identity_writes in writes.items()
+            for trait_key, write in identity_writes.items()
+        ]
+        if not serialized_writes:
+            return
+
+        persist_trait_writes.delay(kwargs={"writes": serialized_writes})
+        self._increment("flushes")
+        self._increment("flushed_writes", len(serialized_writes))
+
+    def get_stats(self) -> TraitWriteBehindStats:
+        """
+        Get the stats of the writes buffered by this process, along with those of
+        the writes persisted by the task processor (for all processes).
+        """
+        with self._stats_lock:
+            stats = TraitWriteBehindStats(
+                **{f.name: getattr(self._stats, f.name) for f in fields(self._stats)}
+            )
+
+        persisted_stats = trait_write_behind_stats_cache.get_many(
+            [
+                PERSISTED_WRITES_CACHE_KEY,
+                LAST_FLUSH_LAG_CACHE_KEY,
+                MAX_FLUSH_LAG_CACHE_KEY,
+            ]
+        )
+        stats.persisted_writes = persisted_stats.get(PERSISTED_WRITES_CACHE_KEY, 0)
+        stats.last_flush_lag_seconds = persisted_stats.get(
+            LAST_FLUSH_LAG_CACHE_KEY, 0.0
+        )
+        stats.max_flush_lag_seconds = persisted_stats.get(MAX_FLUSH_LAG_CACHE_KEY, 0.0)
+        return stats
+
+    def _flush_from_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush trait writes.")
+        finally:
+            # the timer runs in its own thread, so it has its own connection
+            connection.close()
+
+    def flush_at_exit(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush trait writes at exit.")
+
+    def _add_write(
+        self,
+        identity_writes: typing.Dict[str, typing.Tuple[typing.Any, float, float]],
+        trait_data_item: dict,
+        now: float,
+    ) -> None:
+        trait_key = trait_data_item["trait_key"]
+        buffered_write = identity_writes.get(trait_key)
+        # keep the time of the first buffered write so that coalescing doesn't
+        # hide the lag
+        identity_writes[trait_key] = (
+            trait_data_item["trait_value"],
+            buffered_write[1] if buffered_write else now,
+            now,
+        )
+        if buffered_write:
+            self._increment("coalesced_writes")
+        else:
+            self._size += 1
+            self._increment("buffered_writes")
+
+    def _increment(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self._stats, stat, getattr(self._stats, stat) + amount)
+
+
+trait_write_buffer = TraitWriteBuffer(
+    batch_size=settings.TRAIT_WRITE_BEHIND_BATCH_SIZE,
+    max_delay_seconds=settings.TRAIT_WRITE_BEHIND_MAX_DELAY_SECONDS,
+)
+# e.g. when a worker is restarted or replaced during a deployment
+atexit.register(trait_write_buffer.flush_at_exit)
+
+
+def merge_traits(
+    identity_trait_items: typing.Dict[Identity, typing.List[dict]]
+) -> typing.List[Trait]:
+    """
+    Equivalent to `Trait.objects.bulk_update_traits` except that the changes are
+    buffered to be persisted later rather than written before returning.
+
+    :return: the full list of traits for the given identities after the changes
+        (including any which are yet to be flushed). Any new traits won't have an id.
+    """
+    traits = Trait.objects.merge_traits(
+        {
+            identity: [
+                *trait_write_buffer.get_trait_data_items(identity),
+                *trait_data_items,
+            ]
+            for identity, trait_data_items in identity_trait_items.items()
+        }
+    )
+    trait_write_buffer.add(identity_trait_items)
+    return traits
+
+
+@register_task_handler()
+def persist_trait_writes(writes: typing.List[list]) -> None:
+    identity_trait_items = defaultdict(list)
+    written_at = {}
+    for identity_id, trait_key, trait_value, _, written_at_timestamp in writes:
+        identity_trait_items[identity_id].append(
+            {"trait_key": trait_key, "trait_value": trait_value}
+        )
+        written_at[(identity_id, trait_key)] = datetime.fromtimestamp(
+            written_at_timestamp, tz=timezone.utc
+        )
+
+    # any identities which have since been deleted are ignored
+    Trait.objects.bulk_update_traits(
+        {
+            identity: identity_trait_items[identity.id]
+            for identity in Identity.objects.filter(id__in=identity_trait_items)
+        },
+        written_at=written_at,
+    )
+    record_persisted_writes([write[3] for write in writes])
+
+
+def record_persisted_writes(buffered_at: typing.List[float]) -> None:
+    """
+    Record the stats of the persisted writes in the shared cache, so that they're
+    visible to the processes which buffered them rather than just to the task
+    processor.
+    """
+    lag = time.time() - min(buffered_at)
+
+    trait_write_behind_stats_cache.add(PERSISTED_WRITES_CACHE_KEY, 0)
+    trait_write_behind_stats_cache.incr(PERSISTED_WRITES_CACHE_KEY, len(buffered_at))
+    # the maximum lag isn't updated atomically, so concurrent tasks may
+    # (occasionally) under report it
+    max_lag = trait_write_behind_stats_cache.get(MAX_FLUSH_LAG_CACHE_KEY, 0.0)
+    trait_write_behind_stats_cache.set_many(
+        {LAST_FLUSH_LAG_CACHE_KEY: lag, MAX_FLUSH_LAG_CACHE_KEY: max(max_lag, lag)}
+    )
+
+    logger.info("Persisted %d trait writes with a lag of %.3fs", len(buffered_at), lag)
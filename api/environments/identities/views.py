@@ -1,6 +1,8 @@
 from collections import namedtuple
 
+from core.renderers import SDKRenderersMixin
 from django.conf import settings
+from django.db.models import prefetch_related_objects
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from drf_yasg2.utils import swagger_auto_schema
@@ -8,9 +10,15 @@ from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from app.pagination import CustomPagination
-from edge_api.identities.edge_request_forwarder import forward_identity_request
+from app.pagination import CustomKeysetPagination
+from edge_api.identities.edge_request_forwarder import (
+    forward_identity_request,
+    forward_identity_requests,
+)
+from environments.api_keys import SERVER_API_KEY_PREFIX
+from environments.authentication import EnvironmentKeyAuthentication
 from environments.identities.models import Identity
+from environments.identities.search import search_identities
 from environments.identities.serializers import (
     IdentitySerializer,
     SDKIdentitiesQuerySerializer,
@@ -26,19 +34,22 @@ from environments.permissions.permissions import NestedEnvironmentPermissions
 from environments.sdk.serializers import (
     IdentifyWithTraitsSerializer,
     IdentitySerializerWithTraitsAndSegments,
+    SDKBulkIdentifyResponseItemSerializer,
+    SDKBulkIdentifySerializer,
 )
-from features.serializers import FeatureStateSerializerFull
-from integrations.integration import (
-    IDENTITY_INTEGRATIONS,
-    identify_integrations,
+from features.sdk_serialization import (
+    serialize_feature_state,
+    serialize_feature_states,
 )
+from integrations.integration import identify_integrations
+from sse import send_identity_update_messages
 from sse.decorators import generate_identity_update_message
 from util.views import SDKAPIView
 
 
 class IdentityViewSet(viewsets.ModelViewSet):
     serializer_class = IdentitySerializer
-    pagination_class = CustomPagination
+    pagination_class = CustomKeysetPagination
 
     def get_queryset(self):
         environment = self.get_environment_from_request()
@@ -46,14 +57,7 @@ class IdentityViewSet(viewsets.ModelViewSet):
 
         search_query = self.request.query_params.get("q")
         if search_query:
-            if search_query.startswith('"') and search_query.endswith('"'):
-                # Quoted searches should do an exact match just like Google
-                queryset = queryset.filter(
-                    identifier__exact=search_query.replace('"', "")
-                )
-            else:
-                # Otherwise do a fuzzy search
-                queryset = queryset.filter(identifier__icontains=search_query)
+            queryset = search_identities(queryset, search_query)
 
         # change the default order by to avoid performance issues with pagination
         # when environments have small number (<page_size) of records
@@ -144,7 +148,7 @@ class SDKIdentitiesDeprecated(SDKAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class SDKIdentities(SDKAPIView):
+class SDKIdentities(SDKRenderersMixin, SDKAPIView):
     serializer_class = IdentifyWithTraitsSerializer
     pagination_class = None  # set here to ensure documentation is correct
 
@@ -166,18 +170,12 @@ class SDKIdentities(SDKAPIView):
                 {"detail": "Missing identifier"}
             )  # TODO: add 400 status - will this break the clients?
 
-        identity, _ = (
-            Identity.objects.select_related(
-                "environment",
-                "environment__project",
-                *[
-                    f"environment__{integration['relation_name']}"
-                    for integration in IDENTITY_INTEGRATIONS
-                ],
-            )
-            .prefetch_related("identity_traits")
-            .get_or_create(identifier=identifier, environment=request.environment)
+        # the identity uses the request's environment, which has already been
+        # retrieved along with its project and integrations
+        identity, _ = Identity.objects.get_or_create_for_identifier(
+            request.environment, identifier
         )
+        prefetch_related_objects([identity], "identity_traits")
         if settings.EDGE_API_URL and request.environment.project.enable_dynamo_db:
             forward_identity_request.delay(
                 args=(
@@ -229,19 +227,22 @@ class SDKIdentities(SDKAPIView):
 
         # we need to serialize the response again to ensure that the
         # trait values are serialized correctly
-        response_serializer = IdentifyWithTraitsSerializer(
-            instance=instance,
-            context={"identity": instance.get("identity")},  # todo: improve this
+        return Response(
+            {
+                "traits": TraitSerializerBasic(instance["traits"], many=True).data,
+                "flags": serialize_feature_states(
+                    instance["flags"], identity=instance["identity"]
+                ),
+            }
         )
-        return Response(response_serializer.data)
 
     def _get_single_feature_state_response(self, identity, feature_name):
         for feature_state in identity.get_all_feature_states():
             if feature_state.feature.name == feature_name:
-                serializer = FeatureStateSerializerFull(
-                    feature_state, context={"identity": identity}
+                return Response(
+                    data=serialize_feature_state(feature_state, identity=identity),
+                    status=status.HTTP_200_OK,
                 )
-                return Response(data=serializer.data, status=status.HTTP_200_OK)
 
         return Response(
             {"detail": "Given feature not found"}, status=status.HTTP_404_NOT_FOUND
@@ -256,8 +257,8 @@ class SDKIdentities(SDKAPIView):
         :return: Response containing lists of both serialized flags and traits
         """
         all_feature_states = identity.get_all_feature_states()
-        serialized_flags = FeatureStateSerializerFull(
-            all_feature_states, many=True, context={"identity": identity}
+        serialized_flags = serialize_feature_states(
+            all_feature_states, identity=identity
         )
         serialized_traits = TraitSerializerBasic(
             identity.identity_traits.all(), many=True
@@ -265,6 +266,69 @@ class SDKIdentities(SDKAPIView):
 
         identify_integrations(identity, all_feature_states)
 
-        response = {"flags": serialized_flags.data, "traits": serialized_traits.data}
+        response = {"flags": serialized_flags, "traits": serialized_traits.data}
 
         return Response(data=response, status=status.HTTP_200_OK)
+
+
+class SDKBulkIdentities(SDKRenderersMixin, SDKAPIView):
+    """
+    Identify multiple identities (optionally with traits) in a single request.
+
+    Only available to server side keys. The response is in the form:
+    {"identities": [{"identifier", "flags", "traits"}]}
+    """
+
+    serializer_class = SDKBulkIdentifySerializer
+    pagination_class = None  # set here to ensure documentation is correct
+
+    def get_authenticators(self):
+        return [EnvironmentKeyAuthentication(required_key_prefix=SERVER_API_KEY_PREFIX)]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if hasattr(self.request, "environment"):
+            # only set it if the request has the attribute to ensure that the
+            # documentation works correctly still
+            context["environment"] = self.request.environment
+        return context
+
+    @swagger_auto_schema(
+        request_body=SDKBulkIdentifySerializer(),
+        responses={200: SDKBulkIdentifyResponseItemSerializer(many=True)},
+        operation_id="bulk_identify_users",
+    )
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # all of the identities are evaluated before responding, so that any errors
+        # result in an error response rather than a truncated one
+        results = list(serializer.save())
+
+        if settings.EDGE_API_URL and request.environment.project.enable_dynamo_db:
+            forward_identity_requests.delay(
+                args=(
+                    request.method,
+                    dict(request.headers),
+                    request.environment.project.id,
+                ),
+                kwargs={"payload": request.data["identities"]},
+            )
+
+        if request.environment.project.organisation.persist_trait_data:
+            send_identity_update_messages(
+                request.environment,
+                [
+                    item["identifier"]
+                    for item in serializer.validated_data["identities"]
+                    if item.get("traits")
+                ],
+            )
+
+        return Response(
+            {
+                "identities": SDKBulkIdentifyResponseItemSerializer(
+                    results, many=True
+                ).data
+            }
+        )
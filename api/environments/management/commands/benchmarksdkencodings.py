@@ -0,0 +1,82 @@
+import gzip
+import json
+import timeit
+import typing
+
+import msgpack
+from core.renderers import MsgPackRenderer
+from django.core.management.base import BaseCommand, CommandError
+from flag_engine.api.document_builders import build_environment_document
+from rest_framework.renderers import JSONRenderer
+
+from environments.models import Environment
+from features.models import FeatureState
+from features.serializers import FeatureStateSerializerFull
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the payload size, encode time and decode time of the JSON and "
+        "msgpack encodings of the SDK payloads for an environment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "environment", type=int, help="Id of the environment to benchmark"
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100,
+            help="Number of times to encode and decode each payload",
+        )
+
+    def handle(self, *args, environment: int, iterations: int, **options):
+        try:
+            environment = Environment.objects.filter_for_document_builder(
+                id=environment
+            ).get()
+        except Environment.DoesNotExist:
+            raise CommandError(f"Environment {environment} does not exist")
+
+        payloads = {
+            "environment-document": build_environment_document(environment),
+            "flags": FeatureStateSerializerFull(
+                FeatureState.get_environment_flags_list(environment_id=environment.id),
+                many=True,
+            ).data,
+        }
+
+        self.stdout.write(
+            f"{'payload':<22}{'encoding':<10}{'size (bytes)':>14}"
+            f"{'gzip size':>12}{'encode (ms)':>14}{'decode (ms)':>14}"
+        )
+        for name, data in payloads.items():
+            for result in self._benchmark(data, iterations):
+                self.stdout.write(
+                    f"{name:<22}{result['encoding']:<10}{result['size']:>14}"
+                    f"{result['gzip_size']:>12}{result['encode_ms']:>14.3f}"
+                    f"{result['decode_ms']:>14.3f}"
+                )
+
+    def _benchmark(self, data: typing.Any, iterations: int) -> typing.List[dict]:
+        results = []
+        for encoding, encode, decode in (
+            ("json", JSONRenderer().render, json.loads),
+            ("msgpack", MsgPackRenderer().render, msgpack.unpackb),
+        ):
+            content = encode(data)
+            results.append(
+                {
+                    "encoding": encoding,
+                    "size": len(content),
+                    "gzip_size": len(gzip.compress(content)),
+                    "encode_ms": self._time(lambda: encode(data), iterations),
+                    "decode_ms": self._time(lambda: decode(content), iterations),
+                }
+            )
+        return results
+
+    @staticmethod
+    def _time(func: typing.Callable[[], typing.Any], iterations: int) -> float:
+        return timeit.timeit(func, number=iterations) / iterations * 1000
@@ -0,0 +1,106 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management import BaseCommand
+from flag_engine.api.document_builders import build_environment_document
+
+from environments.document_patching import environment_documents_match
+from environments.models import (
+    Environment,
+    environment_document_cache,
+    environment_wrapper,
+)
+from projects.models import Project
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the environment documents in dynamodb and the environment document "
+        "cache, reporting any which were inconsistent (e.g. due to a missed patch)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            type=int,
+            dest="project_id",
+            help="Only check the environments in the project with the given id",
+        )
+
+    def handle(self, *args, project_id: int = None, **options):
+        check_dynamo = environment_wrapper.is_enabled
+        check_cache = settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS > 0
+        if not (check_dynamo or check_cache):
+            self.stdout.write(
+                "Neither dynamodb nor the environment document cache are enabled."
+            )
+            return
+
+        projects = Project.objects.all()
+        if project_id:
+            projects = projects.filter(id=project_id)
+        if not check_cache:
+            # only the documents of the projects using dynamodb need checking
+            projects = projects.filter(enable_dynamo_db=True)
+
+        num_checked = num_inconsistent = 0
+        for project in projects.iterator():
+            for environment in Environment.objects.filter_for_document_builder(
+                project=project
+            ):
+                num_checked += 1
+                if not self._check_environment_documents(
+                    environment,
+                    check_dynamo=check_dynamo and project.enable_dynamo_db,
+                    check_cache=check_cache,
+                ):
+                    num_inconsistent += 1
+
+        self.stdout.write(
+            f"Checked {num_checked} environments, rebuilt the documents for "
+            f"{num_inconsistent} inconsistent environments."
+        )
+
+    def _check_environment_documents(
+        self, environment: Environment, check_dynamo: bool, check_cache: bool
+    ) -> bool:
+        document = None
+        is_consistent = True
+
+        if check_dynamo:
+            try:
+                dynamo_document = environment_wrapper.get_item(environment.api_key)
+            except ObjectDoesNotExist:
+                dynamo_document = None
+
+            document = build_environment_document(environment)
+            if not (
+                dynamo_document
+                and environment_documents_match(dynamo_document, document)
+            ):
+                logger.warning(
+                    "Environment document for environment %d in dynamodb is "
+                    "inconsistent.",
+                    environment.id,
+                )
+                environment_wrapper.write_environment_document(document)
+                is_consistent = False
+
+        if check_cache:
+            # there's nothing to check if the document isn't cached
+            cached_document = environment_document_cache.get(environment.api_key)
+            if cached_document:
+                document = document or build_environment_document(environment)
+                if not environment_documents_match(cached_document, document):
+                    logger.warning(
+                        "Cached environment document for environment %d is "
+                        "inconsistent.",
+                        environment.id,
+                    )
+                    environment_document_cache.set(environment.api_key, document)
+                    is_consistent = False
+
+        return is_consistent
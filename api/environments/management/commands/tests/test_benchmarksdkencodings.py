@@ -0,0 +1,20 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+
+def test_benchmarksdkencodings(environment, feature):
+    # Given
+    out = StringIO()
+
+    # When
+    call_command("benchmarksdkencodings", environment.id, iterations=1, stdout=out)
+
+    # Then
+    lines = out.getvalue().splitlines()
+    assert [line.split()[:2] for line in lines[1:]] == [
+        ["environment-document", "json"],
+        ["environment-document", "msgpack"],
+        ["flags", "json"],
+        ["flags", "msgpack"],
+    ]
@@ -4,17 +4,32 @@ from __future__ import unicode_literals
 import logging
 import typing
 from copy import deepcopy
+from functools import partial
 
 import boto3
+from core.cache_versions import (
+    ENVIRONMENT,
+    PROJECT,
+    get_environment_version,
+    get_versions,
+    increment_environment_versions,
+)
 from core.models import abstract_base_auditable_model_factory
 from core.request_origin import RequestOrigin
+from core.two_tier_cache import TwoTierCache
 from django.conf import settings
 from django.core.cache import caches
 from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
-from django_lifecycle import AFTER_CREATE, AFTER_SAVE, LifecycleModel, hook
+from django_lifecycle import (
+    AFTER_CREATE,
+    AFTER_DELETE,
+    AFTER_SAVE,
+    LifecycleModel,
+    hook,
+)
 from flag_engine.api.document_builders import (
     build_environment_api_key_document,
     build_environment_document,
@@ -32,6 +47,10 @@ from environments.api_keys import (
     generate_client_api_key,
     generate_server_api_key,
 )
+from environments.document_patching import (
+    EnvironmentDocumentChange,
+    patch_environment_document,
+)
 from environments.dynamodb import DynamoEnvironmentWrapper
 from environments.exceptions import EnvironmentHeaderNotPresentError
 from environments.managers import EnvironmentManager
@@ -43,6 +62,11 @@ from webhooks.models import AbstractBaseWebhookModel
 logger = logging.getLogger(__name__)
 
 environment_cache = caches[settings.ENVIRONMENT_CACHE_LOCATION]
+environment_two_tier_cache = TwoTierCache(
+    environment_cache,
+    max_size=settings.ENVIRONMENT_LOCAL_CACHE_SIZE,
+    timeout=settings.ENVIRONMENT_CACHE_SECONDS,
+)
 environment_document_cache = caches[settings.ENVIRONMENT_DOCUMENT_CACHE_LOCATION]
 environment_segments_cache = caches[settings.ENVIRONMENT_SEGMENTS_CACHE_NAME]
 
@@ -163,34 +187,29 @@ class Environment(
                 logger.warning("Requested environment with null api_key.")
                 return None
 
-            environment = environment_cache.get(api_key)
-            if not environment:
-                select_related_args = (
-                    "project",
-                    "project__organisation",
-                    "mixpanel_config",
-                    "segment_config",
-                    "amplitude_config",
-                    "heap_config",
-                    "dynatrace_config",
-                )
-                environment = (
-                    cls.objects.select_related(*select_related_args)
-                    .filter(Q(api_key=api_key) | Q(api_keys__key=api_key))
-                    .distinct()
-                    .defer("description")
-                    .get()
-                )
-                environment_cache.set(api_key, environment, timeout=60)
-            return environment
+            return environment_two_tier_cache.get(
+                api_key,
+                load=partial(cls._get_environment_for_cache, api_key),
+                get_version=cls._get_cache_versions,
+            )
         except cls.DoesNotExist:
             logger.info("Environment with api_key %s does not exist" % api_key)
 
     @classmethod
-    def write_environments_to_dynamodb(cls, environments_filter: Q) -> None:
+    def write_environments_to_dynamodb(
+        cls,
+        environments_filter: Q,
+        change: typing.Optional[EnvironmentDocumentChange] = None,
+    ) -> None:
+        """
+        Write the documents for the given environments to dynamodb, either in full
+        or, if a change is given, by patching the existing documents.
+        """
         # use a list to make sure the entire qs is evaluated up front
         environments = list(
-            Environment.objects.filter_for_document_builder(environments_filter)
+            Environment.objects.filter(environments_filter)
+            if change
+            else Environment.objects.filter_for_document_builder(environments_filter)
         )
 
         if not environments:
@@ -207,7 +226,38 @@ class Environment(
         if not all([project, project.enable_dynamo_db, environment_wrapper.is_enabled]):
             return
 
-        environment_wrapper.write_environments(environments)
+        if change:
+            environment_wrapper.patch_environments(environments, change)
+        else:
+            environment_wrapper.write_environments(environments)
+
+    @classmethod
+    def update_cached_environment_documents(
+        cls,
+        environments_filter: Q,
+        change: typing.Optional[EnvironmentDocumentChange] = None,
+    ) -> None:
+        """
+        Patch the cached documents for the given environments with the given change,
+        or, if there is no change, delete them so that they're rebuilt in full.
+        """
+        for environment in Environment.objects.filter(environments_filter):
+            document = environment_document_cache.get(environment.api_key)
+            if not document:
+                continue
+
+            if change:
+                updated_at = document.get("updated_at")
+                document = patch_environment_document(document, environment, change)
+                # the cache doesn't support conditional writes, so we check that the
+                # document hasn't been replaced (e.g. by another patch) while it was
+                # being patched, and if it has, it's rebuilt in full instead
+                cached_document = environment_document_cache.get(environment.api_key)
+                if cached_document and cached_document.get("updated_at") == updated_at:
+                    environment_document_cache.set(environment.api_key, document)
+                    continue
+
+            environment_document_cache.delete(environment.api_key)
 
     def get_feature_state(
         self, feature_id: int, filter_kwargs: dict = None
@@ -239,7 +289,8 @@ class Environment(
         """
         Get any segments that have been overridden in this environment.
         """
-        segments = environment_segments_cache.get(self.id)
+        version = get_environment_version(self.id)
+        segments = environment_segments_cache.get(self.id, version=version)
         if not segments:
             segments = list(
                 Segment.objects.filter(
@@ -252,7 +303,7 @@ class Environment(
                     "rules__rules__rules",
                 )
             )
-            environment_segments_cache.set(self.id, segments)
+            environment_segments_cache.set(self.id, segments, version=version)
         return segments
 
     @classmethod
@@ -261,6 +312,11 @@ class Environment(
             return cls._get_environment_document_from_cache(api_key)
         return cls._get_environment_document_from_db(api_key)
 
+    @hook(AFTER_SAVE)
+    @hook(AFTER_DELETE)
+    def increment_cache_version(self):
+        increment_environment_versions([self.id])
+
     def get_create_log_message(self, history_instance) -> typing.Optional[str]:
         return ENVIRONMENT_CREATED_MESSAGE % self.name
 
@@ -273,6 +329,33 @@ class Environment(
 
         return self.project.hide_disabled_flags
 
+    @classmethod
+    def _get_environment_for_cache(cls, api_key: str) -> "Environment":
+        select_related_args = (
+            "project",
+            "project__organisation",
+            "mixpanel_config",
+            "segment_config",
+            "amplitude_config",
+            "heap_config",
+            "dynatrace_config",
+            "webhook_config",
+            "rudderstack_config",
+        )
+        return (
+            cls.objects.select_related(*select_related_args)
+            .filter(Q(api_key=api_key) | Q(api_keys__key=api_key))
+            .distinct()
+            .defer("description")
+            .get()
+        )
+
+    @staticmethod
+    def _get_cache_versions(environment: "Environment") -> typing.Tuple[int, ...]:
+        return get_versions(
+            (ENVIRONMENT, environment.id), (PROJECT, environment.project_id)
+        )
+
     @classmethod
     def _get_environment_document_from_cache(cls, api_key: str) -> dict:
         environment_document = environment_document_cache.get(api_key)
@@ -384,6 +467,12 @@ class EnvironmentAPIKey(LifecycleModel):
     def is_valid(self) -> bool:
         return self.active and (not self.expires_at or self.expires_at > timezone.now())
 
+    @hook(AFTER_SAVE)
+    @hook(AFTER_DELETE)
+    def increment_environment_cache_version(self):
+        # environments are cached by each of their api keys
+        increment_environment_versions([self.environment_id])
+
     @hook(AFTER_SAVE)
     def send_to_dynamo(self):
         if not dynamo_api_key_table:
@@ -0,0 +1,67 @@
+"""
+Support for conditional GET requests to the SDK endpoints which only change when
+the environment does (i.e. the environment flags and the environment document).
+
+The ETag of a response is derived from the `Environment.updated_at` of the content
+and the options used to serve it, so a request can be answered with a 304 using
+only the (authenticated) environment, without building the response body.
+"""
+import hashlib
+import typing
+from datetime import datetime
+
+from core.constants import FLAGSMITH_UPDATED_AT_HEADER
+from django.http import HttpRequest, HttpResponseNotModified
+from django.utils.cache import parse_etags
+
+if typing.TYPE_CHECKING:
+    from environments.models import Environment
+
+
+def get_environment_etag(
+    environment: "Environment",
+    *options: str,
+    updated_at: typing.Optional[datetime] = None,
+) -> str:
+    """
+    Get a strong ETag for content generated from the given environment.
+
+    :param environment: the environment the content was generated from
+    :param options: anything else that affects the content, e.g. the endpoint name
+    :param updated_at: the version of the environment that the content was
+        generated from, if different from `environment.updated_at` (e.g. if the
+        content came from a cache)
+    """
+    updated_at = updated_at or environment.updated_at
+    to_hash = ":".join((environment.api_key, str(updated_at.timestamp()), *options))
+    return '"%s"' % hashlib.sha1(to_hash.encode("utf-8")).hexdigest()
+
+
+def etag_matches(request: HttpRequest, etag: str) -> bool:
+    """
+    Check whether the given ETag matches the If-None-Match header of the request.
+    Since the content is the same regardless of the content encoding, weak
+    comparison is used (see RFC 7232, section 3.2), which also allows for the
+    ETag being weakened by `GZipMiddleware`.
+    """
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+
+    etags = parse_etags(if_none_match)
+    return "*" in etags or _strip_weak_indicator(etag) in map(
+        _strip_weak_indicator, etags
+    )
+
+
+def get_not_modified_response(
+    environment: "Environment", etag: str
+) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    response[FLAGSMITH_UPDATED_AT_HEADER] = str(environment.updated_at.timestamp())
+    return response
+
+
+def _strip_weak_indicator(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
@@ -2,17 +2,25 @@ import typing
 from collections import defaultdict
 
 from core.constants import BOOLEAN, FLOAT, INTEGER, STRING
+from django.conf import settings
 from rest_framework import serializers
 
 from environments.identities.models import Identity
 from environments.identities.serializers import (
     IdentifierOnlyIdentitySerializer,
 )
+from environments.identities.traits import write_behind
 from environments.identities.traits.fields import TraitValueField
 from environments.identities.traits.models import Trait
 from environments.identities.traits.serializers import TraitSerializerBasic
+from environments.snapshots import (
+    get_environment_snapshot,
+    get_feature_states_queryset,
+)
+from features.sdk_serialization import serialize_feature_states
 from features.serializers import FeatureStateSerializerFull
 from integrations.integration import identify_integrations
+from segments.evaluator import build_trait_index
 from segments.serializers import SegmentSerializerBasic
 
 
@@ -26,8 +34,15 @@ class SDKCreateUpdateTraitSerializer(serializers.ModelSerializer):
         fields = ("identity", "trait_value", "trait_key")
 
     def create(self, validated_data):
-        identity = self._get_identity(validated_data["identity"]["identifier"])
+        return Identity.objects.write_for_identifier(
+            self.context["environment"],
+            validated_data["identity"]["identifier"],
+            lambda identity, _: self._update_or_create_trait(identity, validated_data),
+        )[1]
 
+    def _update_or_create_trait(
+        self, identity: Identity, validated_data: dict
+    ) -> Trait:
         trait_key = validated_data["trait_key"]
         trait_value = validated_data["trait_value"]["value"]
         trait_value_type = validated_data["trait_value"]["type"]
@@ -53,11 +68,6 @@ class SDKCreateUpdateTraitSerializer(serializers.ModelSerializer):
             )
         return attrs
 
-    def _get_identity(self, identifier):
-        return Identity.objects.get_or_create(
-            identifier=identifier, environment=self.context["environment"]
-        )[0]
-
 
 class SDKBulkCreateUpdateTraitSerializer(SDKCreateUpdateTraitSerializer):
     trait_value = TraitValueField(allow_null=True)
@@ -74,14 +84,28 @@ class SDKBulkCreateUpdateTraitSerializer(SDKCreateUpdateTraitSerializer):
 
             def save(self, **kwargs):
                 identity_trait_items = self._build_identifier_trait_items_dictionary()
-                modified_traits = []
-                for identifier, trait_data_items in identity_trait_items.items():
-                    identity, _ = Identity.objects.get_or_create(
-                        identifier=identifier,
-                        environment=self.context["request"].environment,
-                    )
-                    modified_traits.extend(identity.update_traits(trait_data_items))
-                return modified_traits
+                # identities aren't created just to delete their traits
+                identities = Identity.objects.get_or_create_for_identifiers(
+                    self.context["request"].environment,
+                    identity_trait_items,
+                    identifiers_to_create=[
+                        identifier
+                        for identifier, trait_data_items in identity_trait_items.items()
+                        if any(
+                            trait_data_item["trait_value"] is not None
+                            for trait_data_item in trait_data_items
+                        )
+                    ],
+                )
+                return Trait.objects.bulk_update_traits(
+                    {
+                        identities[identifier]: trait_data_items
+                        for identifier, trait_data_items in (
+                            identity_trait_items.items()
+                        )
+                        if identifier in identities
+                    }
+                )
 
             def _build_identifier_trait_items_dictionary(
                 self,
@@ -124,24 +148,12 @@ class IdentifyWithTraitsSerializer(serializers.Serializer):
         Create the identity with the associated traits
         (optionally store traits if flag set on org)
         """
-        environment = self.context["environment"]
-        identity, created = Identity.objects.get_or_create(
-            identifier=self.validated_data["identifier"], environment=environment
+        identity, trait_models = Identity.objects.write_for_identifier(
+            self.context["environment"],
+            self.validated_data["identifier"],
+            self._write_traits,
         )
 
-        trait_data_items = self.validated_data.get("traits", [])
-
-        if not created and environment.project.organisation.persist_trait_data:
-            # if this is an update and we're persisting traits, then we need to
-            # partially update any traits and return the full list
-            trait_models = identity.update_traits(trait_data_items)
-        else:
-            # generate traits for the identity and store them if configured to do so
-            trait_models = identity.generate_traits(
-                trait_data_items,
-                persist=environment.project.organisation.persist_trait_data,
-            )
-
         all_feature_states = identity.get_all_feature_states(traits=trait_models)
         identify_integrations(identity, all_feature_states, trait_models)
 
@@ -151,6 +163,25 @@ class IdentifyWithTraitsSerializer(serializers.Serializer):
             "flags": all_feature_states,
         }
 
+    def _write_traits(self, identity: Identity, created: bool) -> typing.List[Trait]:
+        trait_data_items = self.validated_data.get("traits", [])
+
+        environment = self.context["environment"]
+        persist_trait_data = environment.project.organisation.persist_trait_data
+        if persist_trait_data and settings.TRAIT_WRITE_BEHIND_ENABLED:
+            # evaluate the flags using the merged traits and persist them later
+            return write_behind.merge_traits({identity: trait_data_items})
+        elif not created and persist_trait_data:
+            # if this is an update and we're persisting traits, then we need to
+            # partially update any traits and return the full list
+            return identity.update_traits(trait_data_items)
+        else:
+            # generate traits for the identity and store them if configured to do so
+            return identity.generate_traits(
+                trait_data_items,
+                persist=persist_trait_data,
+            )
+
     def validate_traits(self, traits: typing.List[dict] = None):
         request = self.context["request"]
         if traits and not request.environment.trait_persistence_allowed(request):
@@ -158,3 +189,185 @@ class IdentifyWithTraitsSerializer(serializers.Serializer):
                 "Setting traits not allowed with client key."
             )
         return traits
+
+
+class SDKBulkIdentifyItemSerializer(serializers.Serializer):
+    identifier = serializers.CharField(required=True)
+    traits = TraitSerializerBasic(required=False, many=True)
+
+
+class SDKBulkIdentifyResponseItemSerializer(serializers.Serializer):
+    identifier = serializers.CharField(source="identity.identifier")
+    flags = serializers.SerializerMethodField()
+    traits = TraitSerializerBasic(many=True)
+
+    def get_flags(self, instance) -> typing.List[dict]:
+        return serialize_feature_states(
+            instance["flags"], identity=instance["identity"]
+        )
+
+
+class SDKBulkIdentifySerializer(serializers.Serializer):
+    identities = SDKBulkIdentifyItemSerializer(many=True, allow_empty=False)
+
+    def validate_identities(self, identities: typing.List[dict]) -> typing.List[dict]:
+        if len(identities) > settings.BULK_IDENTIFY_MAX_IDENTITIES:
+            raise serializers.ValidationError(
+                "Cannot identify more than %d identities in a single request."
+                % settings.BULK_IDENTIFY_MAX_IDENTITIES
+            )
+
+        identifiers = [item["identifier"] for item in identities]
+        if len(set(identifiers)) != len(identifiers):
+            raise serializers.ValidationError("Identifiers must be unique.")
+
+        return identities
+
+    def save(self, **kwargs) -> typing.Iterator[dict]:
+        """
+        Get or create all of the identities (and update their traits if the
+        organisation persists trait data) using a fixed number of queries,
+        regardless of the number of identities.
+
+        Returns a generator which lazily evaluates the flags for each identity, in
+        the order they were given. If `EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT`
+        is set, they're evaluated using a single snapshot of the environment (and
+        so also using a fixed number of queries), otherwise they're evaluated in
+        the same way as a single identity.
+        """
+        environment = self.context["environment"]
+        items = self.validated_data["identities"]
+
+        identities = self._get_or_create_identities(
+            [item["identifier"] for item in items]
+        )
+        trait_data_items = {
+            item["identifier"]: item.get("traits", []) for item in items
+        }
+        if environment.project.organisation.persist_trait_data:
+            traits = self._update_traits(identities, trait_data_items)
+        else:
+            traits = {
+                identifier: identity.generate_traits(trait_data_items[identifier])
+                for identifier, identity in identities.items()
+            }
+
+        identities = [identities[item["identifier"]] for item in items]
+        if settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT:
+            return self._evaluate_identities_from_snapshot(identities, traits)
+        return self._evaluate_identities(identities, traits)
+
+    def _evaluate_identities(
+        self,
+        identities: typing.List[Identity],
+        traits: typing.Dict[str, typing.List[Trait]],
+    ) -> typing.Iterator[dict]:
+        for identity in identities:
+            identity_traits = traits[identity.identifier]
+            flags = identity.get_all_feature_states(traits=identity_traits)
+            identify_integrations(identity, flags, identity_traits)
+
+            yield {"identity": identity, "traits": identity_traits, "flags": flags}
+
+    def _evaluate_identities_from_snapshot(
+        self,
+        identities: typing.List[Identity],
+        traits: typing.Dict[str, typing.List[Trait]],
+    ) -> typing.Iterator[dict]:
+        environment = self.context["environment"]
+        snapshot = get_environment_snapshot(environment)
+        hide_disabled_flags = environment.get_hide_disabled_flags() is True
+
+        identity_feature_states = defaultdict(list)
+        for feature_state in get_feature_states_queryset().filter(
+            identity__in=identities,
+            environment=environment,
+            version__isnull=False,
+        ):
+            identity_feature_states[feature_state.identity_id].append(feature_state)
+
+        for identity in identities:
+            identity_traits = traits[identity.identifier]
+
+            flags = snapshot.get_identity_feature_states(
+                environment=environment,
+                identity_id=identity.id,
+                trait_index=build_trait_index(identity_traits),
+                identity_feature_states=identity_feature_states[identity.id],
+            )
+            if hide_disabled_flags:
+                flags = [flag for flag in flags if flag.enabled]
+
+            identify_integrations(identity, flags, identity_traits)
+
+            yield {"identity": identity, "traits": identity_traits, "flags": flags}
+
+    def _get_or_create_identities(
+        self, identifiers: typing.List[str]
+    ) -> typing.Dict[str, Identity]:
+        environment = self.context["environment"]
+
+        def _get_identities(identifiers_: typing.List[str]) -> typing.List[Identity]:
+            return list(
+                Identity.objects.filter(
+                    environment=environment, identifier__in=identifiers_
+                ).prefetch_related("identity_traits")
+            )
+
+        identities = {
+            identity.identifier: identity for identity in _get_identities(identifiers)
+        }
+        missing_identifiers = [i for i in identifiers if i not in identities]
+        if missing_identifiers:
+            # use ignore_conflicts to handle any identities created by concurrent
+            # requests and retrieve them again since bulk_create doesn't set the ids.
+            Identity.objects.bulk_create(
+                [
+                    Identity(identifier=identifier, environment=environment)
+                    for identifier in missing_identifiers
+                ],
+                ignore_conflicts=True,
+            )
+            identities.update(
+                (identity.identifier, identity)
+                for identity in _get_identities(missing_identifiers)
+            )
+
+        for identity in identities.values():
+            # avoid a query for each identity when accessing the environment
+            identity.environment = environment
+
+        return identities
+
+    @staticmethod
+    def _update_traits(
+        identities: typing.Dict[str, Identity],
+        trait_data_items: typing.Dict[str, typing.List[dict]],
+    ) -> typing.Dict[str, typing.List[Trait]]:
+        """
+        Equivalent to calling `Identity.update_traits` for each identity but using
+        a single query for each of the deletes and upserts (or, if write behind is
+        enabled, buffering them to be persisted later).
+        """
+        update_traits = (
+            write_behind.merge_traits
+            if settings.TRAIT_WRITE_BEHIND_ENABLED
+            else Trait.objects.bulk_update_traits
+        )
+        traits = {identifier: [] for identifier in identities}
+        for trait in update_traits(
+            {
+                identity: trait_data_items[identifier]
+                for identifier, identity in identities.items()
+            }
+        ):
+            traits[trait.identity.identifier].append(trait)
+        return traits
+
+
+class SDKEnvironmentDocumentQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(
+        required=False,
+        help_text="The updated_at of the environment document held by the client. "
+        "If provided, only the changes since then are returned, where possible.",
+    )
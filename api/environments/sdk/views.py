@@ -1,25 +1,85 @@
-from core.constants import FLAGSMITH_UPDATED_AT_HEADER
-from django.http import HttpRequest
+import typing
+from datetime import datetime
+
+from core.constants import (
+    FLAGSMITH_DOCUMENT_DELTA_HEADER,
+    FLAGSMITH_UPDATED_AT_HEADER,
+)
+from core.renderers import SDKRenderersMixin
+from django.http import HttpRequest, HttpResponse
+from django.utils.dateparse import parse_datetime
+from drf_yasg2.utils import swagger_auto_schema
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from environments.authentication import EnvironmentKeyAuthentication
+from environments.document_patching import (
+    get_environment_document_change_since,
+    get_environment_document_delta,
+)
 from environments.models import Environment
 from environments.permissions.permissions import EnvironmentKeyPermissions
+from environments.sdk.etags import (
+    etag_matches,
+    get_environment_etag,
+    get_not_modified_response,
+)
+from environments.sdk.serializers import SDKEnvironmentDocumentQuerySerializer
+
+ENVIRONMENT_DOCUMENT_ETAG_OPTION = "environment-document"
 
 
-class SDKEnvironmentAPIView(APIView):
+class SDKEnvironmentAPIView(SDKRenderersMixin, APIView):
     permission_classes = (EnvironmentKeyPermissions,)
 
     def get_authenticators(self):
         return [EnvironmentKeyAuthentication(required_key_prefix="ser.")]
 
-    def get(self, request: HttpRequest) -> Response:
-        environment_document = Environment.get_environment_document(
-            request.environment.api_key
+    @swagger_auto_schema(query_serializer=SDKEnvironmentDocumentQuerySerializer())
+    def get(self, request: HttpRequest) -> HttpResponse:
+        environment = request.environment
+        etag = self._get_etag(environment)
+        if etag_matches(request, etag):
+            return get_not_modified_response(environment, etag)
+
+        query_serializer = SDKEnvironmentDocumentQuerySerializer(
+            data=request.query_params
         )
-        updated_at = self.request.environment.updated_at
+        query_serializer.is_valid(raise_exception=True)
+        since = query_serializer.validated_data.get("since")
+        if since:
+            change = get_environment_document_change_since(environment, since)
+            if change:
+                return Response(
+                    get_environment_document_delta(environment, change),
+                    headers={
+                        FLAGSMITH_UPDATED_AT_HEADER: environment.updated_at.timestamp(),
+                        FLAGSMITH_DOCUMENT_DELTA_HEADER: "true",
+                    },
+                )
+
+        # otherwise, fall back to the full document
+        environment_document = Environment.get_environment_document(environment.api_key)
+        updated_at = environment.updated_at
         return Response(
             environment_document,
-            headers={FLAGSMITH_UPDATED_AT_HEADER: updated_at.timestamp()},
+            headers={
+                FLAGSMITH_UPDATED_AT_HEADER: updated_at.timestamp(),
+                # the document may have come from a cache, so the ETag must be
+                # generated from the version of the environment in the document
+                "ETag": self._get_etag(
+                    environment,
+                    updated_at=parse_datetime(environment_document["updated_at"]),
+                ),
+            },
+        )
+
+    def _get_etag(
+        self, environment: Environment, updated_at: typing.Optional[datetime] = None
+    ) -> str:
+        return get_environment_etag(
+            environment,
+            ENVIRONMENT_DOCUMENT_ETAG_OPTION,
+            self.request.accepted_renderer.format,
+            updated_at=updated_at,
         )
@@ -0,0 +1,64 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from environments.identities.identity_id_cache import identity_id_cache
+from environments.identities.models import Identity
+from environments.snapshots import (
+    clear_environment_snapshots,
+    delete_environment_snapshots,
+)
+from features.models import (
+    Feature,
+    FeatureSegment,
+    FeatureState,
+    FeatureStateValue,
+)
+from features.multivariate.models import (
+    MultivariateFeatureOption,
+    MultivariateFeatureStateValue,
+)
+
+
+@receiver(post_save, sender=FeatureSegment)
+@receiver(post_delete, sender=FeatureSegment)
+@receiver(post_save, sender=FeatureState)
+@receiver(post_delete, sender=FeatureState)
+def delete_environment_snapshot(sender, instance, **kwargs):
+    # The snapshots are also invalidated when the environment's updated_at is bumped
+    # by the resulting audit log, which happens asynchronously.
+    delete_environment_snapshots(environment_id=instance.environment_id)
+
+
+@receiver(post_save, sender=FeatureStateValue)
+@receiver(post_save, sender=MultivariateFeatureStateValue)
+@receiver(post_delete, sender=MultivariateFeatureStateValue)
+def delete_feature_state_environment_snapshot(sender, instance, **kwargs):
+    try:
+        environment_id = instance.feature_state.environment_id
+    except ObjectDoesNotExist:
+        clear_environment_snapshots()
+    else:
+        delete_environment_snapshots(environment_id=environment_id)
+
+
+@receiver(post_save, sender=Feature)
+@receiver(post_delete, sender=Feature)
+def delete_project_environment_snapshots(sender, instance, **kwargs):
+    delete_environment_snapshots(project_id=instance.project_id)
+
+
+@receiver(post_save, sender=MultivariateFeatureOption)
+@receiver(post_delete, sender=MultivariateFeatureOption)
+def delete_feature_project_environment_snapshots(sender, instance, **kwargs):
+    try:
+        project_id = instance.feature.project_id
+    except ObjectDoesNotExist:
+        clear_environment_snapshots()
+    else:
+        delete_environment_snapshots(project_id=project_id)
+
+
+@receiver(post_delete, sender=Identity)
+def delete_cached_identity_id(sender, instance: Identity, **kwargs):
+    identity_id_cache.delete(instance.environment_id, instance.identifier)
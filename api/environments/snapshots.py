@@ -0,0 +1,280 @@
+"""
+Immutable, in memory snapshots of the data required to evaluate the flags for the
+(non-edge) identities in an environment.
+
+A snapshot is built once per version of an environment (as per
+`Environment.updated_at`) and contains the environment default feature states and
+the segment overrides (with their multivariate values). Evaluating the flags for an
+identity then only requires the identity's own overrides and traits to be retrieved
+from the database.
+
+Snapshots are shared between requests (and threads), so the feature states are
+stored as the plain field values of the models, from which new model instances are
+built for each evaluation, rather than as model instances which could be modified.
+"""
+import threading
+import typing
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Model, Prefetch, Q
+from django.utils import timezone
+
+from features.models import FeatureState
+from features.multivariate.models import MultivariateFeatureStateValue
+from segments.evaluator import TraitIndex, get_compiled_segments
+
+if typing.TYPE_CHECKING:
+    from environments.models import Environment
+
+
+def get_feature_states_queryset():
+    return FeatureState.objects.select_related(
+        "feature",
+        "feature_state_value",
+        "feature_segment",
+        "feature_segment__segment",
+        "identity",
+    ).prefetch_related(
+        Prefetch(
+            "multivariate_feature_state_values",
+            queryset=MultivariateFeatureStateValue.objects.select_related(
+                "multivariate_feature_option"
+            ),
+        )
+    )
+
+
+def get_highest_priority_feature_states(
+    feature_states: typing.Iterable[FeatureState],
+) -> typing.List[FeatureState]:
+    """
+    Given a collection of feature states for an identity, return the highest
+    priority feature state for each feature (see `FeatureState.__gt__`).
+    """
+    highest_priority_feature_states = {}
+    for feature_state in feature_states:
+        current_feature_state = highest_priority_feature_states.get(
+            feature_state.feature_id
+        )
+        if current_feature_state is None or feature_state > current_feature_state:
+            highest_priority_feature_states[feature_state.feature_id] = feature_state
+
+    return list(highest_priority_feature_states.values())
+
+
+@dataclass(frozen=True)
+class FrozenModel:
+    """
+    The field values of a model instance, and of the related instances which were
+    retrieved with it (using select_related and prefetch_related), from which
+    equivalent model instances can be built without querying the database.
+    """
+
+    model: typing.Type[Model]
+    db: str
+    # (attname, value) for each of the model's concrete fields, in order
+    values: typing.Tuple[typing.Tuple[str, typing.Any], ...]
+    related: typing.Tuple[typing.Tuple[str, typing.Optional["FrozenModel"]], ...]
+    prefetched: typing.Tuple[typing.Tuple[str, typing.Tuple["FrozenModel", ...]], ...]
+    # the names of the related fields which refer back to the parent instance, e.g.
+    # the feature state of a (prefetched) multivariate feature state value
+    parent_fields: typing.Tuple[str, ...] = ()
+
+    @classmethod
+    def freeze(cls, instance: Model, parent: Model = None) -> "FrozenModel":
+        related = []
+        parent_fields = []
+        for name, related_instance in instance._state.fields_cache.items():
+            if parent is not None and related_instance is parent:
+                parent_fields.append(name)
+            else:
+                related.append(
+                    (
+                        name,
+                        cls.freeze(related_instance, instance)
+                        if related_instance is not None
+                        else None,
+                    )
+                )
+
+        return cls(
+            model=type(instance),
+            db=instance._state.db,
+            values=tuple(
+                (field.attname, getattr(instance, field.attname))
+                for field in instance._meta.concrete_fields
+            ),
+            related=tuple(related),
+            prefetched=tuple(
+                (name, tuple(cls.freeze(obj, instance) for obj in queryset))
+                for name, queryset in getattr(
+                    instance, "_prefetched_objects_cache", {}
+                ).items()
+            ),
+            parent_fields=tuple(parent_fields),
+        )
+
+    def get_value(self, attname: str) -> typing.Any:
+        return next(value for name, value in self.values if name == attname)
+
+    def thaw(self, parent: Model = None) -> Model:
+        instance = self.model.from_db(
+            self.db,
+            [name for name, _ in self.values],
+            [value for _, value in self.values],
+        )
+
+        for name, frozen_model in self.related:
+            instance._state.fields_cache[name] = (
+                frozen_model.thaw(instance) if frozen_model is not None else None
+            )
+        for name in self.parent_fields:
+            instance._state.fields_cache[name] = parent
+
+        if self.prefetched:
+            instance._prefetched_objects_cache = {}
+        for name, frozen_models in self.prefetched:
+            # emulate prefetch_related, see django.db.models.query.prefetch_one_level
+            queryset = getattr(instance, name).get_queryset()
+            queryset._result_cache = [fm.thaw(instance) for fm in frozen_models]
+            queryset._prefetch_done = True
+            instance._prefetched_objects_cache[name] = queryset
+
+        return instance
+
+
+def _is_live(feature_state: FrozenModel, now: datetime) -> bool:
+    live_from = feature_state.get_value("live_from")
+    return live_from is not None and live_from <= now
+
+
+@dataclass(frozen=True)
+class EnvironmentSnapshot:
+    environment_id: int
+    project_id: int
+    updated_at: datetime
+
+    # all versions of the environment default feature states, and the feature
+    # states for each of the segment overrides (keyed on segment id). Note that
+    # versions which aren't live yet are included since they can become live
+    # without the environment being updated.
+    environment_feature_states: typing.Tuple[FrozenModel, ...]
+    segment_feature_states: typing.Dict[int, typing.Tuple[FrozenModel, ...]]
+
+    @classmethod
+    def build(cls, environment: "Environment") -> "EnvironmentSnapshot":
+        environment_feature_states = []
+        segment_feature_states = defaultdict(list)
+
+        for feature_state in get_feature_states_queryset().filter(
+            Q(feature_segment=None) | Q(feature_segment__environment=environment),
+            environment=environment,
+            identity=None,
+            version__isnull=False,
+        ):
+            frozen_feature_state = FrozenModel.freeze(feature_state)
+            if feature_state.feature_segment_id:
+                segment_feature_states[feature_state.feature_segment.segment_id].append(
+                    frozen_feature_state
+                )
+            else:
+                environment_feature_states.append(frozen_feature_state)
+
+        return cls(
+            environment_id=environment.id,
+            project_id=environment.project_id,
+            updated_at=environment.updated_at,
+            environment_feature_states=tuple(environment_feature_states),
+            segment_feature_states={
+                segment_id: tuple(feature_states)
+                for segment_id, feature_states in segment_feature_states.items()
+            },
+        )
+
+    def get_identity_feature_states(
+        self,
+        environment: "Environment",
+        identity_id: int,
+        trait_index: TraitIndex,
+        identity_feature_states: typing.Iterable[FeatureState],
+    ) -> typing.List[FeatureState]:
+        """
+        Get the highest priority feature state for each feature for an identity.
+
+        :param environment: the environment the snapshot was built for
+        :param identity_id: id of the identity to evaluate
+        :param trait_index: the identity's traits, see `build_trait_index`
+        :param identity_feature_states: the identity's own overrides
+        """
+        now = timezone.now()
+
+        frozen_feature_states = [
+            fs for fs in self.environment_feature_states if _is_live(fs, now)
+        ]
+        for compiled_segment in get_compiled_segments(environment, overrides_only=True):
+            if compiled_segment.id not in self.segment_feature_states:
+                continue
+            if compiled_segment.does_identity_match(identity_id, trait_index):
+                frozen_feature_states.extend(
+                    fs
+                    for fs in self.segment_feature_states[compiled_segment.id]
+                    if _is_live(fs, now)
+                )
+
+        feature_states = [fs.thaw() for fs in frozen_feature_states]
+        feature_states.extend(
+            fs
+            for fs in identity_feature_states
+            if fs.live_from is not None and fs.live_from <= now
+        )
+
+        # sort the feature states to return the flags in the same order as if
+        # they were retrieved from the database
+        return get_highest_priority_feature_states(
+            sorted(feature_states, key=lambda fs: fs.id)
+        )
+
+
+# Process local LRU cache of environment snapshots, in the form:
+# {environment_id: snapshot}
+_environment_snapshots: typing.OrderedDict[int, EnvironmentSnapshot] = OrderedDict()
+_environment_snapshots_lock = threading.Lock()
+
+
+def get_environment_snapshot(environment: "Environment") -> EnvironmentSnapshot:
+    with _environment_snapshots_lock:
+        snapshot = _environment_snapshots.get(environment.id)
+        if snapshot and snapshot.updated_at >= environment.updated_at:
+            _environment_snapshots.move_to_end(environment.id)
+            return snapshot
+
+    snapshot = EnvironmentSnapshot.build(environment)
+    with _environment_snapshots_lock:
+        _environment_snapshots[environment.id] = snapshot
+        _environment_snapshots.move_to_end(environment.id)
+        while len(_environment_snapshots) > settings.ENVIRONMENT_SNAPSHOT_CACHE_SIZE:
+            _environment_snapshots.popitem(last=False)
+    return snapshot
+
+
+def delete_environment_snapshots(
+    environment_id: int = None, project_id: int = None
+) -> None:
+    """
+    Delete the cached snapshots of the given environment, or of all of the
+    environments in the given project.
+    """
+    with _environment_snapshots_lock:
+        for snapshot in list(_environment_snapshots.values()):
+            if snapshot.environment_id == environment_id or (
+                snapshot.project_id == project_id
+            ):
+                del _environment_snapshots[snapshot.environment_id]
+
+
+def clear_environment_snapshots() -> None:
+    with _environment_snapshots_lock:
+        _environment_snapshots.clear()
@@ -1,6 +1,14 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
 from environments.dynamodb import DynamoEnvironmentWrapper
 from environments.models import Environment
 from task_processor.decorators import register_task_handler
+from task_processor.models import Task
+from task_processor.task_run_method import TaskRunMethod
 
 
 @register_task_handler()
@@ -9,3 +17,40 @@ def rebuild_environment_document(environment_id: int):
     if wrapper.is_enabled:
         environment = Environment.objects.get(id=environment_id)
         wrapper.write_environment(environment)
+
+
+@register_task_handler()
+def check_environment_documents():
+    """
+    Rebuild any patched environment documents which are inconsistent, and schedule
+    the next check.
+    """
+    try:
+        call_command("checkenvironmentdocuments")
+    finally:
+        schedule_environment_documents_check()
+
+
+def schedule_environment_documents_check() -> None:
+    """
+    Schedule the periodic check of the patched environment documents (see
+    `CHECK_ENVIRONMENT_DOCUMENTS_INTERVAL_SECONDS`), unless it's already scheduled.
+    """
+    if not (
+        settings.PATCH_ENVIRONMENT_DOCUMENTS
+        and settings.TASK_RUN_METHOD == TaskRunMethod.TASK_PROCESSOR
+    ):
+        return
+
+    now = timezone.now()
+    if Task.objects.filter(
+        task_identifier=check_environment_documents.task_identifier,
+        scheduled_for__gt=now,
+        completed=False,
+    ).exists():
+        return
+
+    check_environment_documents.delay(
+        delay_until=now
+        + timedelta(seconds=settings.CHECK_ENVIRONMENT_DOCUMENTS_INTERVAL_SECONDS)
+    )
@@ -3,6 +3,7 @@ from unittest import mock
 
 import pytest
 from core.constants import STRING
+from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
 from flag_engine.api.document_builders import (
@@ -16,6 +17,7 @@ from environments.models import (
     Environment,
     EnvironmentAPIKey,
     environment_cache,
+    environment_two_tier_cache,
 )
 from features.feature_types import MULTIVARIATE
 from features.models import Feature, FeatureState
@@ -175,7 +177,7 @@ class EnvironmentTestCase(TestCase):
             == 10
         )
 
-    @mock.patch("environments.models.environment_cache")
+    @mock.patch.object(environment_two_tier_cache, "shared_cache")
     def test_get_from_cache_stores_environment_in_cache_on_success(self, mock_cache):
         # Given
         self.environment.save()
@@ -187,7 +189,9 @@ class EnvironmentTestCase(TestCase):
         # Then
         assert environment == self.environment
         mock_cache.set.assert_called_with(
-            self.environment.api_key, self.environment, timeout=60
+            self.environment.api_key,
+            (mock.ANY, self.environment),
+            timeout=settings.ENVIRONMENT_CACHE_SECONDS,
         )
 
     def test_get_from_cache_returns_None_if_no_matching_environment(self):
@@ -327,7 +331,8 @@ def test_get_from_cache_sets_the_cache_correctly_with_environment_api_key(
     assert returned_environment == environment
 
     # and
-    assert environment == environment_cache.get(environment_api_key.key)
+    _, cached_environment = environment_cache.get(environment_api_key.key)
+    assert cached_environment == environment
 
 
 def test_updated_at_gets_updated_when_environment_audit_log_created(environment):
@@ -189,7 +189,7 @@ class EnvironmentTestCase(TestCase):
         response = self.client.post(url, data={"key": trait_key})
 
         # Then
-        assert response.status_code == status.HTTP_200_OK
+        assert response.status_code == status.HTTP_202_ACCEPTED
 
         assert not Trait.objects.filter(
             identity=identity_one_environment_one, trait_key=trait_key
@@ -3,6 +3,8 @@ from __future__ import unicode_literals
 
 import logging
 
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
@@ -27,9 +29,10 @@ from projects.models import Project
 from webhooks.mixins import TriggerSampleWebhookMixin
 from webhooks.webhooks import WebhookType
 
-from .identities.traits.models import Trait
+from .identities.traits.models import Trait, TraitDeletion, TraitKey
 from .identities.traits.serializers import (
     DeleteAllTraitKeysSerializer,
+    TraitDeletionSerializer,
     TraitKeysSerializer,
 )
 from .models import Environment, EnvironmentAPIKey, Webhook
@@ -72,6 +75,8 @@ class EnvironmentViewSet(viewsets.ModelViewSet):
             return TraitKeysSerializer
         if self.action == "delete_traits":
             return DeleteAllTraitKeysSerializer
+        if self.action == "trait_deletion":
+            return TraitDeletionSerializer
         if self.action == "clone":
             return CloneEnvironmentSerializer
         elif self.action in ("create", "update", "partial_update"):
@@ -115,15 +120,22 @@ class EnvironmentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["GET"], url_path="trait-keys")
     def trait_keys(self, request, *args, **kwargs):
-        keys = [
-            trait_key
-            for trait_key in Trait.objects.filter(
-                identity__environment=self.get_object()
+        if settings.USE_TRAIT_KEY_REGISTRY:
+            keys = list(
+                TraitKey.objects.filter(
+                    environment=self.get_object(), usage_count__gt=0
+                ).values_list("key", flat=True)
             )
-            .order_by()
-            .values_list("trait_key", flat=True)
-            .distinct()
-        ]
+        else:
+            keys = [
+                trait_key
+                for trait_key in Trait.objects.filter(
+                    identity__environment=self.get_object()
+                )
+                .order_by()
+                .values_list("trait_key", flat=True)
+                .distinct()
+            ]
 
         data = {"keys": keys}
 
@@ -149,18 +161,33 @@ class EnvironmentViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(responses={202: TraitDeletionSerializer})
     @action(detail=True, methods=["POST"], url_path="delete-traits")
     def delete_traits(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            serializer.delete()
-            return Response(status=status.HTTP_200_OK)
+            trait_deletion = serializer.delete()
+            return Response(
+                TraitDeletionSerializer(instance=trait_deletion).data,
+                status=status.HTTP_202_ACCEPTED,
+            )
         else:
             return Response(
                 {"detail": "Couldn't delete trait keys."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+    @action(
+        detail=True,
+        methods=["GET"],
+        url_path=r"trait-deletions/(?P<trait_deletion_id>\d+)",
+    )
+    def trait_deletion(self, request, trait_deletion_id: str, *args, **kwargs):
+        trait_deletion = get_object_or_404(
+            TraitDeletion, id=trait_deletion_id, environment=self.get_object()
+        )
+        return Response(self.get_serializer(instance=trait_deletion).data)
+
     @swagger_auto_schema(responses={200: PermissionModelSerializer})
     @action(detail=False, methods=["GET"])
     def permissions(self, *args, **kwargs):
@@ -0,0 +1,94 @@
+"""
+Cache of the rendered response body of the SDK flags endpoint.
+
+The cached entries are the bytes returned to the client (and, if gzip compression
+is enabled, the compressed bytes) so that a cache hit requires no serialization or
+rendering. Each entry records the `Environment.updated_at` it was rendered for and
+is only served to requests for the same (or an older) version of the environment.
+
+The msgpack encoding of the body is added to the entry the first time it's
+requested (see `add_msgpack_content`).
+"""
+import json
+import typing
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+from core.renderers import MsgPackRenderer
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.text import compress_string
+
+if typing.TYPE_CHECKING:
+    from environments.models import Environment
+
+flags_cache = caches[settings.FLAGS_CACHE_LOCATION]
+
+
+@dataclass(frozen=True)
+class RenderedFlags:
+    updated_at: datetime
+    content: bytes
+    gzip_content: typing.Optional[bytes] = None
+    msgpack_content: typing.Optional[bytes] = None
+
+
+def get_rendered_flags(environment: "Environment") -> typing.Optional[RenderedFlags]:
+    rendered_flags = flags_cache.get(_get_cache_key(environment))
+    if rendered_flags and rendered_flags.updated_at >= environment.updated_at:
+        return rendered_flags
+    return None
+
+
+def set_rendered_flags(environment: "Environment", content: bytes) -> RenderedFlags:
+    rendered_flags = RenderedFlags(
+        updated_at=environment.updated_at,
+        content=content,
+        gzip_content=compress_string(content)
+        if settings.ENABLE_GZIP_COMPRESSION
+        else None,
+    )
+    _set_cache_entry(environment, rendered_flags)
+    return rendered_flags
+
+
+def add_msgpack_content(
+    environment: "Environment", rendered_flags: RenderedFlags
+) -> RenderedFlags:
+    """
+    Add the msgpack encoding of the rendered flags to the cache entry. This is
+    converted from the JSON content so that the flags don't need to be retrieved
+    again.
+    """
+    rendered_flags = replace(
+        rendered_flags,
+        msgpack_content=MsgPackRenderer().render(json.loads(rendered_flags.content)),
+    )
+    _set_cache_entry(environment, rendered_flags)
+    return rendered_flags
+
+
+def delete_rendered_flags(environment_api_keys: typing.Iterable[str]) -> None:
+    flags_cache.delete_many(
+        [
+            _get_cache_key_for_api_key(api_key, hide_disabled_flags)
+            for api_key in environment_api_keys
+            for hide_disabled_flags in (True, False)
+        ]
+    )
+
+
+def _set_cache_entry(environment: "Environment", rendered_flags: RenderedFlags) -> None:
+    flags_cache.set(
+        _get_cache_key(environment), rendered_flags, settings.CACHE_FLAGS_SECONDS
+    )
+
+
+def _get_cache_key(environment: "Environment") -> str:
+    return _get_cache_key_for_api_key(
+        environment.api_key, environment.get_hide_disabled_flags() is True
+    )
+
+
+def _get_cache_key_for_api_key(api_key: str, hide_disabled_flags: bool) -> str:
+    return f"{api_key}:{'hide-disabled' if hide_disabled_flags else 'all'}"
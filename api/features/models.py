@@ -49,6 +49,7 @@ from features.feature_states.models import AbstractBaseFeatureValueModel
 from features.feature_types import MULTIVARIATE, STANDARD
 from features.helpers import get_correctly_typed_value
 from features.managers import FeatureSegmentManager
+from features.multivariate.allocation import MultivariateAllocationTable
 from features.multivariate.models import MultivariateFeatureStateValue
 from features.utils import (
     get_boolean_from_string,
@@ -501,6 +502,28 @@ class FeatureState(
     def get_feature_state_value(self, identity: "Identity" = None) -> typing.Any:
         return self.get_feature_state_value_by_id(getattr(identity, "id", None))
 
+    def get_multivariate_allocation_table(self) -> MultivariateAllocationTable:
+        """
+        Get the allocation table for the multivariate feature state values.
+
+        If the multivariate_feature_state_values have been prefetched, the table is
+        cached on the instance (as the prefetched values are) so that it is only
+        built once, e.g. when evaluating a batch of identities, rather than every
+        time a value is retrieved.
+        """
+        allocation_table = getattr(self, "_multivariate_allocation_table", None)
+        if allocation_table is not None:
+            return allocation_table
+
+        allocation_table = MultivariateAllocationTable.build(
+            self.multivariate_feature_state_values.all()
+        )
+        if "multivariate_feature_state_values" in getattr(
+            self, "_prefetched_objects_cache", {}
+        ):
+            self._multivariate_allocation_table = allocation_table
+        return allocation_table
+
     def get_feature_state_value_defaults(self) -> dict:
         if (
             self.feature.initial_value is None
@@ -521,27 +544,20 @@ class FeatureState(
     def get_multivariate_feature_state_value(
         self, identity_id: int
     ) -> AbstractBaseFeatureValueModel:
-        # the multivariate_feature_state_values should be prefetched at this point
-        # so we just convert them to a list and use python operations from here to
-        # avoid further queries to the DB
-        mv_options = list(self.multivariate_feature_state_values.all())
-
         percentage_value = (
             get_hashed_percentage_for_object_ids([self.id, identity_id]) * 100
         )
 
-        # Iterate over the mv options in order of id (so we get the same value each
-        # time) to determine the correct value to return to the identity based on
-        # the percentage allocations of the multivariate options. This gives us a
+        # The allocation table orders the mv options by id (so we get the same value
+        # each time) to determine the correct value to return to the identity based
+        # on the percentage allocations of the multivariate options. This gives us a
         # way to ensure that the same value is returned every time we use the same
         # percentage value.
-        start_percentage = 0
-        for mv_option in sorted(mv_options, key=lambda o: o.id):
-            limit = getattr(mv_option, "percentage_allocation", 0) + start_percentage
-            if start_percentage <= percentage_value < limit:
-                return mv_option.multivariate_feature_option
-
-            start_percentage = limit
+        mv_option = self.get_multivariate_allocation_table().get_option(
+            percentage_value
+        )
+        if mv_option is not None:
+            return mv_option
 
         # if none of the percentage allocations match the percentage value we got for
         # the identity, then we just return the default feature state value (or None
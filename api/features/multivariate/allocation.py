@@ -0,0 +1,58 @@
+import bisect
+import itertools
+import typing
+from dataclasses import dataclass
+
+if typing.TYPE_CHECKING:
+    from features.multivariate.models import (
+        MultivariateFeatureOption,
+        MultivariateFeatureStateValue,
+    )
+
+
+@dataclass(frozen=True)
+class MultivariateAllocationTable:
+    """
+    The multivariate options of a feature state, ordered by the id of their
+    multivariate feature state value, alongside the cumulative percentage
+    allocation of each option. e.g. allocations of 30, 30 and 40 give the limits
+    (30, 60, 100).
+
+    An identity with a percentage value, p, is allocated the first option whose
+    limit is greater than p, which is found using a binary search.
+    """
+
+    limits: typing.Tuple[float, ...]
+    options: typing.Tuple["MultivariateFeatureOption", ...]
+
+    @classmethod
+    def build(
+        cls,
+        multivariate_feature_state_values: typing.Iterable[
+            "MultivariateFeatureStateValue"
+        ],
+    ) -> "MultivariateAllocationTable":
+        ordered_values = sorted(multivariate_feature_state_values, key=lambda v: v.id)
+        return cls(
+            limits=tuple(
+                itertools.accumulate(
+                    getattr(mv_value, "percentage_allocation", 0)
+                    for mv_value in ordered_values
+                )
+            ),
+            options=tuple(
+                mv_value.multivariate_feature_option for mv_value in ordered_values
+            ),
+        )
+
+    def get_option(
+        self, percentage_value: float
+    ) -> typing.Optional["MultivariateFeatureOption"]:
+        """
+        Get the option allocated to the given percentage value (between 0 and 100),
+        or None if the percentage value isn't covered by any of the allocations.
+        """
+        index = bisect.bisect_right(self.limits, percentage_value)
+        if index < len(self.options):
+            return self.options[index]
+        return None
@@ -0,0 +1,52 @@
+"""
+Serialization of the feature states returned to the SDKs (i.e. by the flags and
+identities endpoints) without the overhead of the DRF serializers.
+
+The output must be the same as `FeatureStateSerializerFull` (which is still used
+to document the endpoints), see test_unit_features_sdk_serialization.py.
+"""
+import typing
+
+from rest_framework import serializers
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from features.models import Feature, FeatureState
+
+_date_time_field = serializers.DateTimeField()
+
+
+def serialize_feature_states(
+    feature_states: typing.Iterable["FeatureState"],
+    identity: typing.Optional["Identity"] = None,
+) -> typing.List[dict]:
+    return [
+        serialize_feature_state(feature_state, identity=identity)
+        for feature_state in feature_states
+    ]
+
+
+def serialize_feature_state(
+    feature_state: "FeatureState", identity: typing.Optional["Identity"] = None
+) -> dict:
+    return {
+        "id": feature_state.id,
+        "feature": _serialize_feature(feature_state.feature),
+        "feature_state_value": feature_state.get_feature_state_value(identity=identity),
+        "environment": feature_state.environment_id,
+        "identity": feature_state.identity_id,
+        "feature_segment": feature_state.feature_segment_id,
+        "enabled": feature_state.enabled,
+    }
+
+
+def _serialize_feature(feature: "Feature") -> dict:
+    return {
+        "id": feature.id,
+        "name": feature.name,
+        "created_date": _date_time_field.to_representation(feature.created_date),
+        "description": feature.description,
+        "initial_value": feature.initial_value,
+        "default_enabled": feature.default_enabled,
+        "type": feature.type,
+    }
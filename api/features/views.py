@@ -1,13 +1,17 @@
 import logging
 import typing
+from datetime import datetime
 from functools import reduce
 
 from app_analytics.influxdb_wrapper import get_multiple_event_list_for_feature
 from core.constants import FLAGSMITH_UPDATED_AT_HEADER
 from core.permissions import HasMasterAPIKey
+from core.renderers import FastJSONRenderer, MsgPackRenderer, SDKRenderersMixin
 from django.conf import settings
-from django.core.cache import caches
 from django.db.models import Q, QuerySet
+from django.http import HttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from drf_yasg2 import openapi
@@ -17,10 +21,9 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import GenericAPIView, get_object_or_404
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from app.pagination import CustomPagination
+from app.pagination import CustomPagination, KeysetPageNumberPagination
 from environments.authentication import EnvironmentKeyAuthentication
 from environments.identities.models import Identity
 from environments.identities.serializers import (
@@ -31,9 +34,19 @@ from environments.permissions.permissions import (
     EnvironmentKeyPermissions,
     NestedEnvironmentPermissions,
 )
+from environments.sdk.etags import (
+    etag_matches,
+    get_environment_etag,
+    get_not_modified_response,
+)
 from projects.models import Project
 from webhooks.webhooks import WebhookEventType
 
+from .flags_cache import (
+    add_msgpack_content,
+    get_rendered_flags,
+    set_rendered_flags,
+)
 from .models import Feature, FeatureState
 from .permissions import (
     EnvironmentFeatureStatePermissions,
@@ -44,6 +57,10 @@ from .permissions import (
     MasterAPIKeyFeaturePermissions,
     MasterAPIKeyFeatureStatePermissions,
 )
+from .sdk_serialization import (
+    serialize_feature_state,
+    serialize_feature_states,
+)
 from .serializers import (
     FeatureInfluxDataSerializer,
     FeatureOwnerInputSerializer,
@@ -65,8 +82,6 @@ from .tasks import trigger_feature_state_change_webhooks
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-flags_cache = caches[settings.FLAGS_CACHE_LOCATION]
-
 
 @swagger_auto_schema(responses={200: ListCreateFeatureSerializer()}, method="get")
 @api_view(["GET"])
@@ -269,6 +284,7 @@ class BaseFeatureStateViewSet(viewsets.ModelViewSet):
     """
 
     permission_classes = [IsAuthenticated, NestedEnvironmentPermissions]
+    pagination_class = KeysetPageNumberPagination
 
     # Override serializer class to show correct information in docs
     def get_serializer_class(self):
@@ -527,11 +543,10 @@ def get_feature_state_by_uuid(request, uuid):
     return Response(serializer.data)
 
 
-class SDKFeatureStates(GenericAPIView):
+class SDKFeatureStates(SDKRenderersMixin, GenericAPIView):
     serializer_class = FeatureStateSerializerFull
     permission_classes = (EnvironmentKeyPermissions,)
     authentication_classes = (EnvironmentKeyAuthentication,)
-    renderer_classes = [JSONRenderer]
     pagination_class = None
 
     @swagger_auto_schema(
@@ -570,24 +585,23 @@ class SDKFeatureStates(GenericAPIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            return Response(self.get_serializer(feature_states[0]).data)
+            return Response(serialize_feature_state(feature_states[0]))
+
+        if self._use_etags:
+            etag = self._get_etag(request.environment)
+            if etag_matches(request, etag):
+                return get_not_modified_response(request.environment, etag)
 
         if settings.CACHE_FLAGS_SECONDS > 0:
-            data = self._get_flags_from_cache(request.environment)
-        else:
-            data = self.get_serializer(
-                FeatureState.get_environment_flags_list(
-                    environment_id=request.environment.id,
-                    additional_filters=self._additional_filters,
-                ),
-                many=True,
-            ).data
+            return self._get_flags_response_from_cache(request)
+
+        data = self._get_environment_flags_data(request.environment)
 
         updated_at = self.request.environment.updated_at
-        return Response(
-            data,
-            headers={FLAGSMITH_UPDATED_AT_HEADER: updated_at.timestamp()},
-        )
+        headers = {FLAGSMITH_UPDATED_AT_HEADER: updated_at.timestamp()}
+        if self._use_etags:
+            headers["ETag"] = self._get_etag(request.environment)
+        return Response(data, headers=headers)
 
     @property
     def _additional_filters(self) -> Q:
@@ -598,23 +612,81 @@ class SDKFeatureStates(GenericAPIView):
 
         return filters
 
-    def _get_flags_from_cache(self, environment):
-        data = flags_cache.get(environment.api_key)
-        if not data:
-            data = self.get_serializer(
-                FeatureState.get_environment_flags_list(
-                    environment_id=environment.id,
-                    additional_filters=self._additional_filters,
+    @property
+    def _use_etags(self) -> bool:
+        # conditional requests aren't supported when the whole response is cached
+        # by `cache_page` since it would also cache the 304 responses
+        return settings.GET_FLAGS_ENDPOINT_CACHE_SECONDS == 0
+
+    def _get_etag(
+        self,
+        environment: Environment,
+        updated_at: typing.Optional[datetime] = None,
+    ) -> str:
+        return get_environment_etag(
+            environment,
+            "flags",
+            "hide-disabled" if environment.get_hide_disabled_flags() else "all",
+            self.request.accepted_renderer.format,
+            updated_at=updated_at,
+        )
+
+    def _get_environment_flags_data(self, environment: Environment) -> list:
+        return serialize_feature_states(
+            FeatureState.get_environment_flags_list(
+                environment_id=environment.id,
+                additional_filters=self._additional_filters,
+            )
+        )
+
+    def _get_flags_response_from_cache(self, request) -> HttpResponse:
+        """
+        Serve the pre-rendered response body from the cache, rendering (and
+        caching) it first if there isn't one for the current version of the
+        environment.
+        """
+        environment = request.environment
+        rendered_flags = get_rendered_flags(environment)
+        if rendered_flags is None:
+            rendered_flags = set_rendered_flags(
+                environment,
+                FastJSONRenderer().render(
+                    self._get_environment_flags_data(environment)
                 ),
-                many=True,
-            ).data
-            flags_cache.set(environment.api_key, data, settings.CACHE_FLAGS_SECONDS)
+            )
+
+        is_msgpack = isinstance(request.accepted_renderer, MsgPackRenderer)
+        if is_msgpack and rendered_flags.msgpack_content is None:
+            rendered_flags = add_msgpack_content(environment, rendered_flags)
 
-        return data
+        if is_msgpack:
+            response = HttpResponse(
+                rendered_flags.msgpack_content,
+                content_type=MsgPackRenderer.media_type,
+            )
+        else:
+            response = HttpResponse(
+                rendered_flags.content, content_type="application/json"
+            )
+        if self._use_etags:
+            response["ETag"] = self._get_etag(
+                environment, updated_at=rendered_flags.updated_at
+            )
+        if rendered_flags.gzip_content is not None and not is_msgpack:
+            patch_vary_headers(response, ("Accept-Encoding",))
+            if re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+                response.content = rendered_flags.gzip_content
+                response["Content-Encoding"] = "gzip"
+                if response.has_header("ETag"):
+                    # as per GZipMiddleware, the ETag of compressed content is weak
+                    response["ETag"] = "W/" + response["ETag"]
+
+        response[FLAGSMITH_UPDATED_AT_HEADER] = str(environment.updated_at.timestamp())
+        return response
 
     def _get_flags_response_with_identifier(self, request, identifier):
-        identity, _ = Identity.objects.get_or_create(
-            identifier=identifier, environment=request.environment
+        identity, _ = Identity.objects.get_or_create_for_identifier(
+            request.environment, identifier
         )
 
         kwargs = {
@@ -1,5 +1,6 @@
 import logging
 
+from core.cache_versions import increment_environment_versions
 from core.models import AbstractBaseExportableModel
 from django.db import models
 from django.db.models import Q
@@ -38,3 +39,9 @@ class EnvironmentIntegrationModel(LifecycleModelMixin, IntegrationsModel):
             )
             return
         Environment.write_environments_to_dynamodb(Q(id=self.environment_id))
+
+    @hook(AFTER_SAVE)
+    @hook(AFTER_DELETE)
+    def increment_environment_cache_version(self):
+        if hasattr(self, "environment_id"):
+            increment_environment_versions([self.environment_id])
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from core.cache_versions import increment_project_versions
 from core.models import AbstractBaseExportableModel
 from django.conf import settings
 from django.db import models
@@ -117,6 +118,11 @@ class Organisation(LifecycleModelMixin, AbstractBaseExportableModel, SoftDeleteO
     def create_subscription(self):
         Subscription.objects.create(organisation=self)
 
+    @hook(AFTER_SAVE)
+    def increment_project_cache_versions(self):
+        # the organisation is cached alongside the environments of its projects
+        increment_project_versions(self.projects.values_list("id", flat=True))
+
 
 class UserOrganisation(models.Model):
     user = models.ForeignKey("users.FFAdminUser", on_delete=models.CASCADE)
@@ -3,12 +3,19 @@ from __future__ import unicode_literals
 
 import re
 
+from core.cache_versions import get_project_version, increment_project_versions
 from core.models import AbstractBaseExportableModel
 from django.conf import settings
 from django.core.cache import caches
 from django.db import models
 from django.utils import timezone
-from django_lifecycle import BEFORE_CREATE, LifecycleModelMixin, hook
+from django_lifecycle import (
+    AFTER_DELETE,
+    AFTER_SAVE,
+    BEFORE_CREATE,
+    LifecycleModelMixin,
+    hook,
+)
 from softdelete.models import SoftDeleteObject
 
 from organisations.models import Organisation
@@ -63,7 +70,8 @@ class Project(LifecycleModelMixin, AbstractBaseExportableModel, SoftDeleteObject
         return "Project %s" % self.name
 
     def get_segments_from_cache(self):
-        segments = project_segments_cache.get(self.id)
+        version = get_project_version(self.id)
+        segments = project_segments_cache.get(self.id, version=version)
 
         if not segments:
             # This is optimised to account for rules nested one levels deep (since we
@@ -77,7 +85,10 @@ class Project(LifecycleModelMixin, AbstractBaseExportableModel, SoftDeleteObject
                 "rules__rules__rules",
             )
             project_segments_cache.set(
-                self.id, segments, timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS
+                self.id,
+                segments,
+                timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS,
+                version=version,
             )
 
         return segments
@@ -89,6 +100,11 @@ class Project(LifecycleModelMixin, AbstractBaseExportableModel, SoftDeleteObject
             and settings.EDGE_RELEASE_DATETIME < timezone.now()
         )
 
+    @hook(AFTER_SAVE)
+    @hook(AFTER_DELETE)
+    def increment_cache_version(self):
+        increment_project_versions([self.id])
+
     @property
     def is_edge_project_by_default(self) -> bool:
         return bool(
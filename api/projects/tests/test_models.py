@@ -2,6 +2,7 @@ from datetime import timedelta
 from unittest import mock
 
 import pytest
+from core.cache_versions import get_project_version
 from django.conf import settings
 from django.utils import timezone
 
@@ -26,9 +27,13 @@ def test_get_segments_from_cache(project, monkeypatch):
     segments = project.get_segments_from_cache()
 
     # Then
-    mock_project_segments_cache.get.assert_called_with(project.id)
+    version = get_project_version(project.id)
+    mock_project_segments_cache.get.assert_called_with(project.id, version=version)
     mock_project_segments_cache.set.assert_called_with(
-        project.id, segments, timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS
+        project.id,
+        segments,
+        timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS,
+        version=version,
     )
 
 
@@ -49,7 +54,9 @@ def test_get_segments_from_cache_set_not_called(project, segments, monkeypatch):
     assert segments
 
     # And correct calls to cache are made
-    mock_project_segments_cache.get.assert_called_once_with(project.id)
+    mock_project_segments_cache.get.assert_called_once_with(
+        project.id, version=get_project_version(project.id)
+    )
     mock_project_segments_cache.set.assert_not_called()
 
 
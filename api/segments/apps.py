@@ -3,3 +3,9 @@ from core.apps import BaseAppConfig
 
 class SegmentsConfig(BaseAppConfig):
     name = "segments"
+
+    def ready(self):
+        super().ready()
+
+        # noinspection PyUnresolvedReferences
+        import segments.signals  # noqa
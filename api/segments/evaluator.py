@@ -0,0 +1,366 @@
+"""
+Compiled, immutable representations of segments used to evaluate identities in
+memory.
+
+Evaluating a segment via the model methods (e.g. `Segment.does_identity_match`)
+traverses the ORM for every rule and re-parses the value of every condition each
+time an identity is evaluated. Compiling walks the segment tree once, parsing each
+condition value into the type it will be compared against, so that evaluating an
+identity requires no further queries or parsing.
+
+The behaviour of the compiled conditions mirrors `segments.models.Condition`.
+"""
+import logging
+import operator
+import typing
+from dataclasses import dataclass
+
+import semver
+from core.constants import BOOLEAN, FLOAT, INTEGER
+from flag_engine.utils.semver import is_semver, remove_semver_suffix
+
+from environments.identities.helpers import (
+    get_hashed_percentage_for_object_ids,
+)
+from segments.models import (
+    CONTAINS,
+    EQUAL,
+    GREATER_THAN,
+    GREATER_THAN_INCLUSIVE,
+    IN,
+    IS_NOT_SET,
+    IS_SET,
+    LESS_THAN,
+    LESS_THAN_INCLUSIVE,
+    MODULO,
+    NOT_CONTAINS,
+    NOT_EQUAL,
+    PERCENTAGE_SPLIT,
+    REGEX,
+    Condition,
+    Segment,
+    SegmentRule,
+    re,
+)
+
+if typing.TYPE_CHECKING:
+    from environments.identities.traits.models import Trait
+    from environments.models import Environment
+
+logger = logging.getLogger(__name__)
+
+# Mapping of trait key to trait, used to look up the trait for each condition
+TraitIndex = typing.Dict[str, "Trait"]
+
+COMPARISON_OPERATORS = {
+    EQUAL: operator.eq,
+    GREATER_THAN: operator.gt,
+    GREATER_THAN_INCLUSIVE: operator.ge,
+    LESS_THAN: operator.lt,
+    LESS_THAN_INCLUSIVE: operator.le,
+    NOT_EQUAL: operator.ne,
+}
+BOOLEAN_OPERATORS = {EQUAL: operator.eq, NOT_EQUAL: operator.ne}
+STRING_OPERATORS = {
+    EQUAL: operator.eq,
+    NOT_EQUAL: operator.ne,
+    CONTAINS: lambda value, str_value: str_value in value,
+    NOT_CONTAINS: lambda value, str_value: str_value not in value,
+}
+
+
+@dataclass(frozen=True)
+class CompiledCondition:
+    operator: str
+    property: typing.Optional[str]
+    segment_id: int
+
+    # condition value, parsed into each of the types it may be compared against.
+    # A value of None means that the condition value could not be parsed into that
+    # type, in which case the condition never matches a trait of that type.
+    integer_value: typing.Optional[int] = None
+    float_value: typing.Optional[float] = None
+    boolean_value: typing.Optional[bool] = None
+    string_value: typing.Optional[str] = None
+    semver_value: typing.Optional[semver.VersionInfo] = None
+    is_semver: bool = False
+    regex: typing.Optional[typing.Pattern] = None
+    modulo: typing.Optional[typing.Tuple[float, float]] = None
+    in_values: typing.FrozenSet[str] = frozenset()
+    percentage_value: typing.Optional[float] = None
+
+    def does_identity_match(  # noqa: C901
+        self, identity_id: int, trait_index: TraitIndex
+    ) -> bool:
+        if self.operator == PERCENTAGE_SPLIT:
+            return (
+                self.percentage_value is not None
+                and get_hashed_percentage_for_object_ids(
+                    object_ids=[self.segment_id, identity_id]
+                )
+                <= self.percentage_value
+            )
+
+        matching_trait = trait_index.get(self.property)
+        if matching_trait is None:
+            return self.operator == IS_NOT_SET
+
+        if self.operator in (IS_SET, IS_NOT_SET):
+            return self.operator == IS_SET
+        elif self.operator == MODULO:
+            return matching_trait.value_type in (
+                INTEGER,
+                FLOAT,
+            ) and self._check_modulo(matching_trait.trait_value)
+        elif self.operator == IN:
+            return str(matching_trait.trait_value) in self.in_values
+        elif matching_trait.value_type == INTEGER:
+            return self._compare(
+                COMPARISON_OPERATORS, matching_trait.integer_value, self.integer_value
+            )
+        elif matching_trait.value_type == FLOAT:
+            return self._compare(
+                COMPARISON_OPERATORS, matching_trait.float_value, self.float_value
+            )
+        elif matching_trait.value_type == BOOLEAN:
+            return self._compare(
+                BOOLEAN_OPERATORS, matching_trait.boolean_value, self.boolean_value
+            )
+        elif self.is_semver:
+            try:
+                return self._compare(
+                    COMPARISON_OPERATORS,
+                    matching_trait.string_value,
+                    self.semver_value,
+                )
+            except ValueError:
+                # the trait value is not a valid semantic version
+                return False
+        elif self.operator == REGEX:
+            return (
+                self.regex is not None
+                and self.regex.match(matching_trait.string_value) is not None
+            )
+
+        return self._compare(
+            STRING_OPERATORS, matching_trait.string_value, self.string_value
+        )
+
+    def _compare(
+        self,
+        operators: typing.Dict[str, typing.Callable[[typing.Any, typing.Any], bool]],
+        trait_value: typing.Any,
+        condition_value: typing.Any,
+    ) -> bool:
+        compare = operators.get(self.operator)
+        if compare is None or condition_value is None:
+            return False
+        return compare(trait_value, condition_value)
+
+    def _check_modulo(self, value: typing.Union[int, float]) -> bool:
+        if self.modulo is None:
+            return False
+        divisor, remainder = self.modulo
+        return value % divisor == remainder
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    type: str
+    conditions: typing.Tuple[CompiledCondition, ...]
+    rules: typing.Tuple["CompiledRule", ...]
+
+    def does_identity_match(self, identity_id: int, trait_index: TraitIndex) -> bool:
+        matches_conditions = False
+
+        if not self.conditions:
+            matches_conditions = True
+        elif self.type == SegmentRule.ALL_RULE:
+            matches_conditions = all(
+                condition.does_identity_match(identity_id, trait_index)
+                for condition in self.conditions
+            )
+        elif self.type == SegmentRule.ANY_RULE:
+            matches_conditions = any(
+                condition.does_identity_match(identity_id, trait_index)
+                for condition in self.conditions
+            )
+        elif self.type == SegmentRule.NONE_RULE:
+            matches_conditions = not any(
+                condition.does_identity_match(identity_id, trait_index)
+                for condition in self.conditions
+            )
+
+        return matches_conditions and all(
+            rule.does_identity_match(identity_id, trait_index) for rule in self.rules
+        )
+
+
+@dataclass(frozen=True)
+class CompiledSegment:
+    segment: Segment
+    rules: typing.Tuple[CompiledRule, ...]
+
+    @property
+    def id(self) -> int:
+        return self.segment.id
+
+    def does_identity_match(self, identity_id: int, trait_index: TraitIndex) -> bool:
+        return len(self.rules) > 0 and all(
+            rule.does_identity_match(identity_id, trait_index) for rule in self.rules
+        )
+
+
+def build_trait_index(traits: typing.Iterable["Trait"]) -> TraitIndex:
+    """
+    Build the index of traits used to evaluate compiled segments. This should be
+    built once per identity evaluation rather than once per segment.
+
+    Note that, if multiple traits share a key, the first one is used.
+    """
+    trait_index = {}
+    for trait in traits:
+        trait_index.setdefault(trait.trait_key, trait)
+    return trait_index
+
+
+def compile_segment(segment: Segment) -> CompiledSegment:
+    """
+    Compile a segment (and its rules and conditions) for evaluation. To avoid
+    further queries, the rules and conditions should be prefetched.
+    """
+    return CompiledSegment(
+        segment=segment,
+        rules=tuple(compile_rule(rule, segment.id) for rule in segment.rules.all()),
+    )
+
+
+def compile_rule(rule: SegmentRule, segment_id: int) -> CompiledRule:
+    return CompiledRule(
+        type=rule.type,
+        conditions=tuple(
+            compile_condition(condition, segment_id)
+            for condition in rule.conditions.all()
+        ),
+        rules=tuple(compile_rule(child, segment_id) for child in rule.rules.all()),
+    )
+
+
+def compile_condition(condition: Condition, segment_id: int) -> CompiledCondition:
+    value = condition.value
+    condition_is_semver = value is not None and is_semver(value)
+
+    return CompiledCondition(
+        operator=condition.operator,
+        property=condition.property,
+        segment_id=segment_id,
+        integer_value=_parse(int, value),
+        float_value=_parse(float, value),
+        boolean_value=_parse_boolean(value),
+        string_value=str(value),
+        semver_value=_parse_semver(value) if condition_is_semver else None,
+        is_semver=condition_is_semver,
+        regex=_parse_regex(value) if condition.operator == REGEX else None,
+        modulo=_parse_modulo(value) if condition.operator == MODULO else None,
+        in_values=frozenset(value.split(",")) if value is not None else frozenset(),
+        percentage_value=_parse_percentage(value)
+        if condition.operator == PERCENTAGE_SPLIT
+        else None,
+    )
+
+
+def _parse(type_: typing.Callable[[str], typing.Any], value: typing.Any):
+    try:
+        return type_(str(value))
+    except ValueError:
+        return None
+
+
+def _parse_boolean(value: typing.Optional[str]) -> typing.Optional[bool]:
+    if value in ("False", "false", "0"):
+        return False
+    elif value in ("True", "true", "1"):
+        return True
+    return None
+
+
+def _parse_semver(value: str) -> typing.Optional[semver.VersionInfo]:
+    try:
+        return semver.VersionInfo.parse(remove_semver_suffix(value))
+    except ValueError:
+        return None
+
+
+def _parse_regex(value: typing.Optional[str]) -> typing.Optional[typing.Pattern]:
+    try:
+        return re.compile(str(value))
+    except re.error:
+        logger.warning("Unable to compile regex condition value '%s'", value)
+        return None
+
+
+def _parse_modulo(
+    value: typing.Optional[str],
+) -> typing.Optional[typing.Tuple[float, float]]:
+    try:
+        divisor, remainder = value.split("|")
+        return float(divisor), float(remainder)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _parse_percentage(value: typing.Optional[str]) -> typing.Optional[float]:
+    try:
+        return float(value) / 100.0
+    except (TypeError, ValueError):
+        return None
+
+
+# Process local cache of compiled segments, in the form:
+# {(environment_id, overrides_only): (updated_at, project_id, compiled_segments)}
+_compiled_segments_cache = {}
+
+
+def get_compiled_segments(
+    environment: "Environment", overrides_only: bool = False
+) -> typing.Tuple[CompiledSegment, ...]:
+    """
+    Get the compiled segments for an environment. Segments are compiled once per
+    version of the environment (as per `Environment.updated_at`, which is updated
+    whenever a segment in the project changes).
+
+    :param environment: the environment to get the compiled segments for
+    :param overrides_only: only include the segments which have an override in the
+        environment, otherwise include all segments in the environment's project
+    """
+    key = (environment.id, overrides_only)
+    cached = _compiled_segments_cache.get(key)
+    if cached and cached[0] >= environment.updated_at:
+        return cached[2]
+
+    segments = (
+        environment.get_segments_from_cache()
+        if overrides_only
+        else environment.project.get_segments_from_cache()
+    )
+    compiled_segments = tuple(compile_segment(segment) for segment in segments)
+    _compiled_segments_cache[key] = (
+        environment.updated_at,
+        environment.project_id,
+        compiled_segments,
+    )
+    return compiled_segments
+
+
+def delete_compiled_segments(environment_id: int = None, project_id: int = None):
+    """
+    Delete the cached compiled segments of the given environment, or of all of the
+    environments in the given project.
+    """
+    for key, (_, cached_project_id, _) in list(_compiled_segments_cache.items()):
+        if key[0] == environment_id or cached_project_id == project_id:
+            _compiled_segments_cache.pop(key, None)
+
+
+def clear_compiled_segments_cache() -> None:
+    _compiled_segments_cache.clear()
@@ -0,0 +1,84 @@
+import timeit
+
+from core.constants import STRING
+from django.core.management import BaseCommand, CommandParser
+
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from segments.evaluator import build_trait_index, compile_segment
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the number of segment evaluations per second using the segment "
+        "models against the compiled segments for an existing identity."
+    )
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            "environment-key",
+            type=str,
+            help="API key of the environment that the identity belongs to.",
+        )
+        parser.add_argument(
+            "identifier",
+            type=str,
+            help="Identifier of the identity to evaluate the segments for.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100,
+            help="Number of times to evaluate every segment in the project.",
+        )
+        parser.add_argument(
+            "--trait-counts",
+            type=int,
+            nargs="+",
+            default=[],
+            help="Pad the identity's traits with unsaved traits, up to each of the "
+            "given counts, to benchmark the effect of the number of traits.",
+        )
+
+    def handle(self, *args, **options):
+        identity = Identity.objects.select_related(
+            "environment", "environment__project"
+        ).get(
+            identifier=options["identifier"],
+            environment__api_key=options["environment-key"],
+        )
+        iterations = options["iterations"]
+
+        identity_traits = list(identity.identity_traits.all())
+        segments = list(identity.environment.project.get_segments_from_cache())
+        compiled_segments = [compile_segment(segment) for segment in segments]
+
+        for trait_count in options["trait_counts"] or [len(identity_traits)]:
+            # add the padding first to emulate the worst case for a linear search
+            traits = [
+                Trait(trait_key=f"padding_{i}", value_type=STRING, string_value="")
+                for i in range(trait_count - len(identity_traits))
+            ] + identity_traits
+
+            def evaluate_models():
+                for segment in segments:
+                    segment.does_identity_match(identity, traits)
+
+            def evaluate_compiled():
+                trait_index = build_trait_index(traits)
+                for compiled_segment in compiled_segments:
+                    compiled_segment.does_identity_match(identity.id, trait_index)
+
+            evaluations = iterations * len(segments)
+            self.stdout.write(
+                f"Evaluating {len(segments)} segments against {len(traits)} traits "
+                f"{iterations} times."
+            )
+            for name, func in (
+                ("models", evaluate_models),
+                ("compiled", evaluate_compiled),
+            ):
+                duration = timeit.timeit(func, number=iterations)
+                self.stdout.write(
+                    f"{name}: {evaluations / duration:.0f} evaluations per second"
+                )
@@ -0,0 +1,36 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from features.models import FeatureSegment
+from segments.evaluator import (
+    clear_compiled_segments_cache,
+    delete_compiled_segments,
+)
+from segments.models import Condition, Segment, SegmentRule
+
+
+@receiver(post_save, sender=Segment)
+@receiver(post_delete, sender=Segment)
+def delete_project_compiled_segments(sender, instance: Segment, **kwargs):
+    delete_compiled_segments(project_id=instance.project_id)
+
+
+@receiver(post_save, sender=SegmentRule)
+@receiver(post_delete, sender=SegmentRule)
+@receiver(post_save, sender=Condition)
+@receiver(post_delete, sender=Condition)
+def delete_rule_project_compiled_segments(sender, instance, **kwargs):
+    try:
+        rule = instance.rule if isinstance(instance, Condition) else instance
+        project_id = rule.get_segment().project_id
+    except ObjectDoesNotExist:
+        clear_compiled_segments_cache()
+    else:
+        delete_compiled_segments(project_id=project_id)
+
+
+@receiver(post_save, sender=FeatureSegment)
+@receiver(post_delete, sender=FeatureSegment)
+def delete_environment_compiled_segments(sender, instance: FeatureSegment, **kwargs):
+    delete_compiled_segments(environment_id=instance.environment_id)
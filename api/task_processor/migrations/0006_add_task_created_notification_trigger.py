@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:31
+
+from django.db import migrations
+
+from core.migration_helpers import PostgresOnlyRunSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_processor", "0005_update_conditional_index_conditions"),
+    ]
+
+    # Notify the task processor when tasks are created, see
+    # task_processor/notifications.py. Notifications are only delivered when the
+    # transaction is committed, and only one is delivered for each transaction.
+    operations = [
+        PostgresOnlyRunSQL(
+            """
+            CREATE OR REPLACE FUNCTION task_processor_notify_task_created()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('task_processor_task_created', '');
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER task_processor_task_created
+            AFTER INSERT ON "task_processor_task"
+            FOR EACH STATEMENT EXECUTE PROCEDURE task_processor_notify_task_created();
+            """,
+            reverse_sql="""
+            DROP TRIGGER IF EXISTS task_processor_task_created ON "task_processor_task";
+            DROP FUNCTION IF EXISTS task_processor_notify_task_created();
+            """,
+        ),
+    ]
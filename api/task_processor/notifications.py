@@ -0,0 +1,74 @@
+"""
+Wake up the task processor's threads as soon as tasks are created, rather than
+waiting for them to poll for tasks again.
+
+On postgres, a trigger (see migration 0006) sends a notification on the
+`task_processor_task_created` channel whenever tasks are created, and each thread
+LISTENs for it on its own database connection while it waits between runs. On other
+databases (or if `TASK_PROCESSOR_LISTEN_FOR_TASKS` is disabled) the threads just
+sleep between runs as before.
+"""
+import logging
+import select
+import time
+
+import psycopg2
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+TASK_CREATED_CHANNEL = "task_processor_task_created"
+
+
+class TaskNotificationListener:
+    def __init__(self):
+        # the (raw) connection we're listening on, which changes if the database
+        # connection is closed and reopened
+        self._listening_connection = None
+
+    def wait(self, timeout_seconds: float) -> bool:
+        """
+        Wait for tasks to be created, for up to the given number of seconds.
+
+        :return: whether a notification that tasks have been created was received
+        """
+        if not self.is_enabled:
+            time.sleep(timeout_seconds)
+            return False
+
+        try:
+            return self._wait_for_notification(timeout_seconds)
+        except psycopg2.Error:
+            logger.warning(
+                "Failed to listen for tasks, polling instead.", exc_info=True
+            )
+            # close the connection so that it's reopened when it's next used
+            connection.close()
+            self._listening_connection = None
+            time.sleep(timeout_seconds)
+            return False
+
+    @property
+    def is_enabled(self) -> bool:
+        return (
+            settings.TASK_PROCESSOR_LISTEN_FOR_TASKS
+            and connection.vendor == "postgresql"
+        )
+
+    def _wait_for_notification(self, timeout_seconds: float) -> bool:
+        connection.ensure_connection()
+        pg_connection = connection.connection
+        if pg_connection is not self._listening_connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {TASK_CREATED_CHANNEL}")
+            self._listening_connection = pg_connection
+
+        # notifications received while running tasks have already been collected
+        if not pg_connection.notifies:
+            if select.select([pg_connection], [], [], timeout_seconds)[0]:
+                pg_connection.poll()
+
+        notified = bool(pg_connection.notifies)
+        pg_connection.notifies.clear()
+        return notified
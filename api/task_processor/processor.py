@@ -53,6 +53,13 @@ def _run_task(task: Task) -> typing.Optional[typing.Tuple[Task, TaskRun]]:
         return
 
     task_run = TaskRun(started_at=timezone.now(), task=task)
+    if task.scheduled_for:
+        # i.e. the latency between enqueueing a task and starting to run it
+        logger.debug(
+            "Running task '%s' %.3fs after it was scheduled.",
+            task.task_identifier,
+            (task_run.started_at - task.scheduled_for).total_seconds(),
+        )
 
     try:
         task.run()
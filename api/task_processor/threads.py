@@ -1,8 +1,8 @@
-import time
 from threading import Thread
 
 from django.utils import timezone
 
+from task_processor.notifications import TaskNotificationListener
 from task_processor.processor import run_tasks
 
 
@@ -20,12 +20,14 @@ class TaskRunner(Thread):
         self.last_checked_for_tasks = None
 
         self._stopped = False
+        self._listener = TaskNotificationListener()
 
     def run(self) -> None:
         while not self._stopped:
             self.last_checked_for_tasks = timezone.now()
             run_tasks(self.queue_pop_size)
-            time.sleep(self.sleep_interval_millis / 1000)
+            # wait until tasks are created, or for the sleep interval at most
+            self._listener.wait(self.sleep_interval_millis / 1000)
 
     def stop(self):
         self._stopped = True
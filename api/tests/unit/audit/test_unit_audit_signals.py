@@ -19,7 +19,7 @@ def test_send_env_to_dynamodb_from_audit_log_with_environment(
 
     # Then
     mock_environment_model_class.write_environments_to_dynamodb.assert_called_once_with(
-        Q(id=dynamo_enabled_project_environment_one.id)
+        Q(id=dynamo_enabled_project_environment_one.id), change=None
     )
 
 
@@ -56,7 +56,7 @@ def test_send_env_to_dynamodb_from_audit_log_with_project(
 
     # Then
     mock_environment_model_class.write_environments_to_dynamodb.assert_called_once_with(
-        Q(project=dynamo_enabled_project)
+        Q(project=dynamo_enabled_project), change=None
     )
 
 
@@ -96,7 +96,7 @@ def test_send_env_to_dynamodb_from_audit_log_with_environment_and_project(
 
     # Then
     mock_environment_model_class.write_environments_to_dynamodb.assert_called_once_with(
-        Q(id=dynamo_enabled_project_environment_one.id)
+        Q(id=dynamo_enabled_project_environment_one.id), change=None
     )
 
 
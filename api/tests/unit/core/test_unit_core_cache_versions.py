@@ -0,0 +1,45 @@
+from core.cache_versions import (
+    ENVIRONMENT,
+    PROJECT,
+    cache_versions_cache,
+    get_environment_version,
+    get_project_version,
+    get_versions,
+    increment_environment_versions,
+    increment_project_versions,
+)
+
+
+def test_get_versions_returns_the_same_versions_until_incremented():
+    # Given
+    environment_version, project_version = get_versions((ENVIRONMENT, 1), (PROJECT, 1))
+
+    # When
+    increment_environment_versions([1])
+
+    # Then
+    assert get_project_version(1) == project_version
+    assert get_environment_version(1) != environment_version
+
+
+def test_increment_project_versions_does_not_affect_other_projects():
+    # Given
+    version = get_project_version(2)
+
+    # When
+    increment_project_versions([3])
+
+    # Then
+    assert get_project_version(2) == version
+
+
+def test_version_is_not_reused_if_evicted_from_cache():
+    # Given
+    version = get_environment_version(4)
+    cache_versions_cache.clear()
+
+    # When
+    increment_environment_versions([4])
+
+    # Then
+    assert get_environment_version(4) != version
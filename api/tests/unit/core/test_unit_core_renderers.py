@@ -0,0 +1,146 @@
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import msgpack
+import pytest
+from core.renderers import (
+    MSGPACK_MEDIA_TYPE,
+    FastJSONRenderer,
+    MsgPackRenderer,
+)
+from django.urls import reverse
+from django.utils import timezone
+from flag_engine.api.document_builders import build_environment_document
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from environments.models import EnvironmentAPIKey
+
+
+def test_msgpack_renderer_encodes_data_in_the_same_way_as_json():
+    # Given
+    data = {
+        "id": 1,
+        "name": "feature",
+        "enabled": True,
+        "value": None,
+        "float": 1.5,
+        "decimal": Decimal("1.5"),
+        "uuid": uuid.uuid4(),
+        "created_date": datetime(2022, 1, 1, 12, 0, 0, tzinfo=timezone.utc),
+        "nested": [{"key": "value"}],
+    }
+
+    # When
+    content = MsgPackRenderer().render(data)
+
+    # Then
+    assert msgpack.unpackb(content) == json.loads(JSONRenderer().render(data))
+
+
+def test_msgpack_renderer_encodes_environment_document_in_the_same_way_as_json(
+    environment, feature, segment_featurestate
+):
+    # Given
+    data = build_environment_document(environment)
+
+    # When
+    content = MsgPackRenderer().render(data)
+
+    # Then
+    assert msgpack.unpackb(content) == json.loads(JSONRenderer().render(data))
+
+
+def test_msgpack_renderer_renders_none_as_empty_content():
+    assert MsgPackRenderer().render(None) == b""
+
+
+@pytest.mark.parametrize("cache_flags_seconds", (0, 60))
+def test_get_flags_as_msgpack(settings, environment, feature, cache_flags_seconds):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = cache_flags_seconds
+    url = reverse("api-v1:flags")
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    json_response = client.get(url)
+
+    # When
+    response = client.get(url, HTTP_ACCEPT=MSGPACK_MEDIA_TYPE)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == MSGPACK_MEDIA_TYPE
+    assert "Accept" in response["Vary"]
+    assert msgpack.unpackb(response.content) == json_response.json()
+    assert response["ETag"] != json_response["ETag"]
+
+
+def test_get_environment_document_as_msgpack(environment, feature):
+    # Given
+    api_key = EnvironmentAPIKey.objects.create(environment=environment)
+    url = reverse("api-v1:environment-document")
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=api_key.key)
+    json_response = client.get(url)
+
+    # When
+    response = client.get(url, HTTP_ACCEPT=MSGPACK_MEDIA_TYPE)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == MSGPACK_MEDIA_TYPE
+    document = msgpack.unpackb(response.content)
+    assert document["api_key"] == environment.api_key
+    assert [fs["feature"]["id"] for fs in document["feature_states"]] == [
+        fs["feature"]["id"] for fs in json_response.json()["feature_states"]
+    ]
+
+
+def test_get_identity_flags_as_msgpack(environment, feature, identity):
+    # Given
+    url = reverse("api-v1:sdk-identities")
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+
+    # When
+    response = client.get(
+        url, {"identifier": identity.identifier}, HTTP_ACCEPT=MSGPACK_MEDIA_TYPE
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == MSGPACK_MEDIA_TYPE
+    assert "Accept" in response["Vary"]
+    assert msgpack.unpackb(response.content)["flags"][0]["feature"]["id"] == (
+        feature.id
+    )
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        {"id": 1, "enabled": True, "value": None, "list": [1, "two", 3.5]},
+        {"uuid": uuid.uuid4(), "decimal": Decimal("1.25")},
+        {"created_date": datetime(2022, 1, 1, 12, 0, 0, 123, tzinfo=timezone.utc)},
+        {"non_ascii": "ü🚀", "separators": "  "},
+        {"big_int": 2**70},
+        [],
+    ),
+)
+def test_fast_json_renderer_renders_the_same_content_as_json_renderer(data):
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_fast_json_renderer_renders_indented_content():
+    # Given
+    data = {"id": 1}
+    accepted_media_type = "application/json; indent=4"
+
+    # When
+    content = FastJSONRenderer().render(data, accepted_media_type)
+
+    # Then
+    assert content == JSONRenderer().render(data, accepted_media_type)
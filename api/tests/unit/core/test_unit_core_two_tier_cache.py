@@ -0,0 +1,154 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from core.two_tier_cache import TwoTierCache, TwoTierCacheStats
+from django.core.cache.backends.locmem import LocMemCache
+
+
+@pytest.fixture()
+def shared_cache():
+    return LocMemCache("two-tier-cache-test", {})
+
+
+@pytest.fixture()
+def two_tier_cache(shared_cache):
+    shared_cache.clear()
+    return TwoTierCache(shared_cache, max_size=2, timeout=60)
+
+
+def _get_version(value):
+    return 1
+
+
+def test_get_loads_value_once_and_then_serves_it_from_local_cache(
+    two_tier_cache, shared_cache, mocker
+):
+    # Given
+    load = mocker.MagicMock(return_value="value")
+    spy_shared_cache_get = mocker.spy(shared_cache, "get")
+
+    # When
+    values = [two_tier_cache.get("key", load, _get_version) for _ in range(3)]
+
+    # Then
+    assert values == ["value"] * 3
+    load.assert_called_once_with()
+    assert spy_shared_cache_get.call_count == 2  # initial lookup and miss recheck
+    assert two_tier_cache.get_stats() == TwoTierCacheStats(hits=2, misses=1)
+
+
+def test_get_uses_shared_cache_populated_by_another_process(
+    two_tier_cache, shared_cache, mocker
+):
+    # Given
+    TwoTierCache(shared_cache, max_size=2, timeout=60).get(
+        "key", lambda: "value", _get_version
+    )
+    load = mocker.MagicMock()
+
+    # When
+    value = two_tier_cache.get("key", load, _get_version)
+
+    # Then
+    assert value == "value"
+    load.assert_not_called()
+
+
+def test_get_refreshes_value_when_version_changes(two_tier_cache):
+    # Given
+    two_tier_cache.get("key", lambda: "value", _get_version)
+
+    # When
+    value = two_tier_cache.get("key", lambda: "new value", lambda value: 2)
+
+    # Then
+    assert value == "new value"
+    assert two_tier_cache.get("key", lambda: "", lambda value: 2) == "new value"
+    assert two_tier_cache.get_stats() == TwoTierCacheStats(
+        hits=1, misses=1, refreshes=1
+    )
+
+
+def test_get_refreshes_value_when_timed_out(two_tier_cache, shared_cache, mocker):
+    # Given
+    mock_monotonic = mocker.patch("core.two_tier_cache.time.monotonic")
+    mock_monotonic.return_value = 0
+    two_tier_cache.get("key", lambda: "value", _get_version)
+    shared_cache.clear()
+
+    # When
+    mock_monotonic.return_value = 61
+    value = two_tier_cache.get("key", lambda: "new value", _get_version)
+
+    # Then
+    assert value == "new value"
+    assert two_tier_cache.get_stats().refreshes == 1
+
+
+def test_get_evicts_least_recently_used_keys(two_tier_cache, shared_cache):
+    # Given
+    for key in ("a", "b"):
+        two_tier_cache.get(key, lambda: key, _get_version)
+    two_tier_cache.get("a", lambda: "", _get_version)
+    shared_cache.clear()
+
+    # When
+    two_tier_cache.get("c", lambda: "c", _get_version)
+
+    # Then
+    assert two_tier_cache.get("a", lambda: "reloaded", _get_version) == "a"
+    assert two_tier_cache.get("b", lambda: "reloaded", _get_version) == "reloaded"
+
+
+def test_get_serves_stale_value_while_another_thread_refreshes(two_tier_cache):
+    # Given
+    two_tier_cache.get("key", lambda: "value", _get_version)
+
+    loading = threading.Event()
+    finish_loading = threading.Event()
+
+    def load():
+        loading.set()
+        finish_loading.wait(timeout=5)
+        return "new value"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        refresh = executor.submit(two_tier_cache.get, "key", load, lambda value: 2)
+        loading.wait(timeout=5)
+
+        # When
+        stale_value = two_tier_cache.get("key", load, lambda value: 2)
+        finish_loading.set()
+
+    # Then
+    assert stale_value == "value"
+    assert refresh.result() == "new value"
+    assert two_tier_cache.get_stats() == TwoTierCacheStats(
+        stale_hits=1, misses=1, refreshes=1
+    )
+
+
+def test_get_only_loads_missing_value_once_for_concurrent_requests(two_tier_cache):
+    # Given
+    load_count = 0
+    lock = threading.Lock()
+    start = threading.Barrier(5)
+
+    def load():
+        nonlocal load_count
+        with lock:
+            load_count += 1
+        return "value"
+
+    def get():
+        start.wait(timeout=5)
+        return two_tier_cache.get("key", load, _get_version)
+
+    # When
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        values = list(executor.map(lambda _: get(), range(5)))
+
+    # Then
+    assert values == ["value"] * 5
+    assert load_count == 1
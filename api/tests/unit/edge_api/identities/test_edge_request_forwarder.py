@@ -5,6 +5,7 @@ from core.constants import FLAGSMITH_SIGNATURE_HEADER
 
 from edge_api.identities.edge_request_forwarder import (
     forward_identity_request,
+    forward_identity_requests,
     forward_trait_request,
     forward_trait_request_sync,
     forward_trait_requests,
@@ -175,3 +176,26 @@ def test_forward_trait_requests_calls_sync_function_correctly(mocker):
             mocker.call(request_method, headers, project_id, payload[1]),
         ]
     )
+
+
+def test_forward_identity_requests_calls_sync_function_correctly(mocker):
+    # Given
+    mocked_forward_identity_request = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.forward_identity_request_sync",
+        autospec=True,
+    )
+    request_method = "POST"
+    headers = {"X-Environment-Key": "test_api_key"}
+    project_id = 1
+    payload = [{"identifier": "test_user_123"}, {"identifier": "test_user_456"}]
+
+    # When
+    forward_identity_requests(request_method, headers, project_id, payload)
+
+    # Then
+    mocked_forward_identity_request.assert_has_calls(
+        [
+            mocker.call(request_method, headers, project_id, request_data=payload[0]),
+            mocker.call(request_method, headers, project_id, request_data=payload[1]),
+        ]
+    )
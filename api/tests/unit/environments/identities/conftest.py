@@ -1,4 +1,5 @@
 import pytest
+from django.db import connection
 
 from environments.identities.models import Identity
 
@@ -9,3 +10,12 @@ def identity_one(organisation_one_project_one_environment_one):
         identifier="identity_1",
         environment=organisation_one_project_one_environment_one,
     )
+
+
+@pytest.fixture()
+def num_upsert_fallback_queries():
+    """
+    The number of additional queries used to create traits on databases which don't
+    support the upserts used on postgres, see TraitManager.bulk_upsert.
+    """
+    return 0 if connection.vendor == "postgresql" else 2
@@ -1,6 +1,8 @@
 from django.utils import timezone
 
 from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from environments.identities.traits.serializers import TraitSerializerBasic
 from features.models import Feature, FeatureState
 
 
@@ -49,3 +51,31 @@ def test_identity_get_all_feature_states_gets_latest_committed_version(environme
         filter(lambda fs: fs.feature == feature, identity_feature_states)
     )
     assert identity_feature_state.get_feature_state_value() == "v2"
+
+
+def test_identity_update_traits_returns_merged_traits_without_querying_again(
+    identity, trait, django_assert_num_queries, num_upsert_fallback_queries
+):
+    # Given
+    trait_to_delete = Trait.objects.create(
+        identity=identity, trait_key="to_delete", string_value="foo"
+    )
+    trait_data_items = [
+        {"trait_key": trait.trait_key, "trait_value": "updated"},
+        {"trait_key": trait_to_delete.trait_key, "trait_value": None},
+        {"trait_key": "new_trait", "trait_value": 1},
+    ]
+
+    # When
+    with django_assert_num_queries(3 + num_upsert_fallback_queries):
+        # to retrieve the existing traits, and delete and upsert them
+        traits = identity.update_traits(trait_data_items)
+        data = TraitSerializerBasic(traits, many=True).data
+
+    # Then
+    new_trait = Trait.objects.get(identity=identity, trait_key="new_trait")
+    assert [dict(item) for item in data] == [
+        {"id": trait.id, "trait_key": trait.trait_key, "trait_value": "updated"},
+        {"id": new_trait.id, "trait_key": "new_trait", "trait_value": 1},
+    ]
+    assert [t.identity for t in traits] == [identity, identity]
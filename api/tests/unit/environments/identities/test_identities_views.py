@@ -2,6 +2,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
+from environments.identities.models import Identity
 from environments.identities.views import IdentityViewSet
 from environments.permissions.constants import (
     MANAGE_IDENTITIES,
@@ -85,3 +86,66 @@ def test_identity_view_set_get_permissions():
         "partial_update": MANAGE_IDENTITIES,
         "destroy": MANAGE_IDENTITIES,
     }
+
+
+def test_list_identities_with_cursor_paginates_by_created_date_and_id(
+    admin_client, environment
+):
+    # Given
+    identities = [
+        Identity.objects.create(identifier=f"identity_{i}", environment=environment)
+        for i in range(5)
+    ]
+    # identities with the same created date are ordered by id
+    Identity.objects.filter(id__in=[identities[1].id, identities[2].id]).update(
+        created_date=identities[1].created_date
+    )
+
+    url = "%s?page_size=2&cursor=" % reverse(
+        "api-v1:environments:environment-identities-list",
+        args=(environment.api_key,),
+    )
+
+    # When
+    identifiers = []
+    while url:
+        response = admin_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        response_json = response.json()
+        assert "count" not in response_json
+        identifiers.extend(result["identifier"] for result in response_json["results"])
+        url = response_json["next"]
+
+    # Then
+    assert identifiers == [identity.identifier for identity in identities]
+
+
+def test_list_identities_with_invalid_cursor_returns_404(admin_client, environment):
+    # Given
+    url = "%s?cursor=invalid" % reverse(
+        "api-v1:environments:environment-identities-list",
+        args=(environment.api_key,),
+    )
+
+    # When
+    response = admin_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_list_identities_without_cursor_paginates_by_page_number(
+    admin_client, environment, identity
+):
+    # Given
+    url = reverse(
+        "api-v1:environments:environment-identities-list",
+        args=(environment.api_key,),
+    )
+
+    # When
+    response = admin_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["count"] == 1
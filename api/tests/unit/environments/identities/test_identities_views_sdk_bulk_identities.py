@@ -0,0 +1,310 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from features.models import Feature, FeatureSegment, FeatureState
+
+url = reverse("api-v1:sdk-identities-bulk")
+
+
+@pytest.fixture()
+def server_side_client(environment_api_key):
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    return client
+
+
+@pytest.fixture()
+def segment_overridden_feature(environment, identity_matching_segment):
+    feature = Feature.objects.create(
+        name="segment_overridden_feature", project=environment.project
+    )
+    feature_segment = FeatureSegment.objects.create(
+        feature=feature, segment=identity_matching_segment, environment=environment
+    )
+    FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        feature_segment=feature_segment,
+        enabled=True,
+    )
+    return feature
+
+
+def _get_traits(identity_data: dict) -> dict:
+    return {
+        trait["trait_key"]: trait["trait_value"] for trait in identity_data["traits"]
+    }
+
+
+def _get_enabled_flags(identity_data: dict) -> dict:
+    return {flag["feature"]["name"]: flag["enabled"] for flag in identity_data["flags"]}
+
+
+@pytest.mark.parametrize("evaluate_from_environment_snapshot", (True, False))
+def test_bulk_identify_returns_flags_for_each_identity_in_order(
+    settings,
+    server_side_client,
+    environment,
+    identity,
+    trait,
+    feature,
+    segment_overridden_feature,
+    evaluate_from_environment_snapshot,
+):
+    # Given
+    settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT = (
+        evaluate_from_environment_snapshot
+    )
+    FeatureState.objects.create(
+        feature=feature, environment=environment, identity=identity, enabled=True
+    )
+    data = {
+        "identities": [
+            {"identifier": "new_identity"},
+            {"identifier": identity.identifier},
+            {
+                "identifier": "new_identity_in_segment",
+                "traits": [{"trait_key": trait.trait_key, "trait_value": "value1"}],
+            },
+        ]
+    }
+
+    # When
+    response = server_side_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    response_json = response.json()
+
+    assert [item["identifier"] for item in response_json["identities"]] == [
+        "new_identity",
+        identity.identifier,
+        "new_identity_in_segment",
+    ]
+    new_identity_data, identity_data, new_identity_in_segment_data = response_json[
+        "identities"
+    ]
+
+    assert _get_enabled_flags(new_identity_data) == {
+        feature.name: False,
+        segment_overridden_feature.name: False,
+    }
+    assert new_identity_data["traits"] == []
+
+    assert _get_enabled_flags(identity_data) == {
+        feature.name: True,
+        segment_overridden_feature.name: True,
+    }
+    assert _get_traits(identity_data) == {trait.trait_key: trait.trait_value}
+
+    assert _get_enabled_flags(new_identity_in_segment_data) == {
+        feature.name: False,
+        segment_overridden_feature.name: True,
+    }
+
+    # and the identities and traits have been created
+    assert Identity.objects.filter(environment=environment).count() == 3
+    assert Trait.objects.filter(
+        identity__identifier="new_identity_in_segment", trait_key=trait.trait_key
+    ).exists()
+
+
+def test_bulk_identify_updates_and_deletes_persisted_traits(
+    server_side_client, environment, identity, trait
+):
+    # Given
+    other_trait = Trait.objects.create(
+        identity=identity, trait_key="other_key", string_value="foo"
+    )
+    data = {
+        "identities": [
+            {
+                "identifier": identity.identifier,
+                "traits": [
+                    {"trait_key": trait.trait_key, "trait_value": None},
+                    {"trait_key": other_trait.trait_key, "trait_value": 10},
+                    {"trait_key": "new_key", "trait_value": True},
+                ],
+            }
+        ]
+    }
+
+    # When
+    response = server_side_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    response_json = response.json()
+    assert _get_traits(response_json["identities"][0]) == {
+        "other_key": 10,
+        "new_key": True,
+    }
+    assert {t.trait_key: t.trait_value for t in identity.identity_traits.all()} == {
+        "other_key": 10,
+        "new_key": True,
+    }
+
+
+def test_bulk_identify_does_not_persist_traits_if_organisation_does_not_allow(
+    server_side_client, organisation, environment, identity_matching_segment
+):
+    # Given
+    organisation.persist_trait_data = False
+    organisation.save()
+
+    data = {
+        "identities": [
+            {
+                "identifier": "new_identity",
+                "traits": [{"trait_key": "key1", "trait_value": "value1"}],
+            }
+        ]
+    }
+
+    # When
+    response = server_side_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    response_json = response.json()
+    assert _get_traits(response_json["identities"][0]) == {"key1": "value1"}
+    assert not Trait.objects.filter(identity__identifier="new_identity").exists()
+
+
+def test_bulk_identify_uses_a_fixed_number_of_queries(
+    settings, server_side_client, environment, feature, segment_overridden_feature
+):
+    # Given
+    settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT = True
+
+    def _bulk_identify(identifiers):
+        data = {
+            "identities": [
+                {
+                    "identifier": identifier,
+                    "traits": [{"trait_key": "key1", "trait_value": identifier}],
+                }
+                for identifier in identifiers
+            ]
+        }
+        with CaptureQueriesContext(connection) as context:
+            server_side_client.post(
+                url, data=json.dumps(data), content_type="application/json"
+            )
+        return len(context)
+
+    # populate any caches first
+    _bulk_identify(["warm_up"])
+
+    # When
+    num_queries_for_5_identities = _bulk_identify([f"a_{i}" for i in range(5)])
+    num_queries_for_50_identities = _bulk_identify([f"b_{i}" for i in range(50)])
+
+    # Then
+    assert num_queries_for_5_identities == num_queries_for_50_identities
+
+
+def test_bulk_identify_evaluates_identities_before_responding(
+    server_side_client, environment, feature, mocker
+):
+    # Given
+    mocked_identify_integrations = mocker.patch(
+        "environments.sdk.serializers.identify_integrations"
+    )
+    data = {"identities": [{"identifier": "identity_1"}, {"identifier": "identity_2"}]}
+
+    # When
+    response = server_side_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    # the response isn't streamed, so the integrations have been called (and any
+    # errors raised) before the response status was sent
+    assert not response.streaming
+    assert mocked_identify_integrations.call_count == 2
+    assert [item["identifier"] for item in response.json()["identities"]] == [
+        "identity_1",
+        "identity_2",
+    ]
+
+
+def test_bulk_identify_forwards_identity_requests_to_edge_api(
+    settings, server_side_client, environment, project, mocker
+):
+    # Given
+    settings.EDGE_API_URL = "http://edge.api"
+    project.enable_dynamo_db = True
+    project.save()
+
+    mocked_forward_identity_requests = mocker.patch(
+        "environments.identities.views.forward_identity_requests"
+    )
+    identities = [
+        {"identifier": "identity_1"},
+        {
+            "identifier": "identity_2",
+            "traits": [{"trait_key": "key", "trait_value": "value"}],
+        },
+    ]
+
+    # When
+    response = server_side_client.post(
+        url,
+        data=json.dumps({"identities": identities}),
+        content_type="application/json",
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+
+    args, kwargs = mocked_forward_identity_requests.delay.call_args
+    assert kwargs["args"][0] == "POST"
+    assert kwargs["args"][2] == project.id
+    assert kwargs["kwargs"] == {"payload": identities}
+
+
+def test_bulk_identify_is_not_available_to_client_keys(environment):
+    # Given
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    data = {"identities": [{"identifier": "identity"}]}
+
+    # When
+    response = client.post(url, data=json.dumps(data), content_type="application/json")
+
+    # Then
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.parametrize(
+    "identifiers",
+    ([], ["identity", "identity"], ["identity_1", "identity_2", "identity_3"]),
+)
+def test_bulk_identify_validates_identifiers(settings, server_side_client, identifiers):
+    # Given
+    settings.BULK_IDENTIFY_MAX_IDENTITIES = 2
+    data = {"identities": [{"identifier": identifier} for identifier in identifiers]}
+
+    # When
+    response = server_side_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not Identity.objects.exists()
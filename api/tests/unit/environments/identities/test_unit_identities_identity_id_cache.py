@@ -0,0 +1,175 @@
+import pytest
+from django.db import IntegrityError
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.identity_id_cache import (
+    IdentityIdCache,
+    identity_id_cache,
+)
+from environments.identities.models import Identity
+
+
+@pytest.fixture()
+def identity_id_cache_enabled(settings):
+    settings.IDENTITY_ID_CACHE_ENABLED = True
+    identity_id_cache.clear()
+    yield
+    identity_id_cache.clear()
+
+
+def test_identity_id_cache_evicts_least_recently_used_entries():
+    # Given
+    cache = IdentityIdCache(max_size=2, timeout=60)
+    cache.set(1, "a", 1)
+    cache.set(1, "b", 2)
+
+    # When
+    cache.get(1, "a")
+    cache.set(1, "c", 3)
+
+    # Then
+    assert cache.get(1, "a") == 1
+    assert cache.get(1, "b") is None
+    assert cache.get(1, "c") == 3
+
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (3, 1, 1)
+    assert stats.hit_rate == 0.75
+
+
+def test_identity_id_cache_does_not_return_expired_entries(mocker):
+    # Given
+    mocked_time = mocker.patch(
+        "environments.identities.identity_id_cache.time.monotonic", return_value=0
+    )
+    cache = IdentityIdCache(max_size=2, timeout=60)
+    cache.set(1, "a", 1)
+
+    # When
+    mocked_time.return_value = 61
+
+    # Then
+    assert cache.get(1, "a") is None
+    assert len(cache) == 0
+
+
+def test_get_or_create_for_identifier_uses_cached_identity_id(
+    identity_id_cache_enabled, environment, identity, django_assert_num_queries
+):
+    # Given
+    Identity.objects.get_or_create_for_identifier(environment, identity.identifier)
+
+    # When
+    with django_assert_num_queries(0):
+        cached_identity, created = Identity.objects.get_or_create_for_identifier(
+            environment, identity.identifier
+        )
+
+    # Then
+    assert cached_identity == identity
+    assert cached_identity.environment is environment
+    assert created is False
+
+
+def test_get_or_create_for_identifier_caches_created_identities(
+    identity_id_cache_enabled, environment, django_assert_num_queries
+):
+    # Given
+    identity, created = Identity.objects.get_or_create_for_identifier(
+        environment, "new_identity"
+    )
+
+    # When
+    with django_assert_num_queries(0):
+        cached_identity, _ = Identity.objects.get_or_create_for_identifier(
+            environment, "new_identity"
+        )
+
+    # Then
+    assert created is True
+    assert cached_identity.id == identity.id
+
+
+def test_deleting_identity_removes_it_from_identity_id_cache(
+    identity_id_cache_enabled, environment, identity
+):
+    # Given
+    Identity.objects.get_or_create_for_identifier(environment, identity.identifier)
+
+    # When
+    identity.delete()
+
+    # Then
+    new_identity, created = Identity.objects.get_or_create_for_identifier(
+        environment, identity.identifier
+    )
+    assert created is True
+    assert Identity.objects.filter(id=new_identity.id).exists()
+
+
+def test_deleting_identity_from_admin_api_removes_it_from_identity_id_cache(
+    identity_id_cache_enabled, admin_client, environment, identity
+):
+    # Given
+    Identity.objects.get_or_create_for_identifier(environment, identity.identifier)
+    url = reverse(
+        "api-v1:environments:environment-identities-detail",
+        args=(environment.api_key, identity.id),
+    )
+
+    # When
+    response = admin_client.delete(url)
+
+    # Then
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert identity_id_cache.get(environment.id, identity.identifier) is None
+
+
+def test_bulk_deleting_identities_removes_them_from_identity_id_cache(
+    identity_id_cache_enabled, environment, identity
+):
+    # Given
+    Identity.objects.get_or_create_for_identifier(environment, identity.identifier)
+
+    # When
+    Identity.objects.filter(environment=environment).delete()
+
+    # Then
+    assert identity_id_cache.get(environment.id, identity.identifier) is None
+
+
+def test_write_for_identifier_retries_write_if_cached_identity_has_been_deleted(
+    identity_id_cache_enabled, environment, identity, mocker
+):
+    # Given
+    identity_id_cache.set(environment.id, identity.identifier, identity.id + 1)
+    write = mocker.MagicMock(side_effect=[IntegrityError, "written"])
+
+    # When
+    written_identity, result = Identity.objects.write_for_identifier(
+        environment, identity.identifier, write
+    )
+
+    # Then
+    assert result == "written"
+    assert written_identity.id == identity.id
+    assert [call.args[0].id for call in write.call_args_list] == [
+        identity.id + 1,
+        identity.id,
+    ]
+    assert identity_id_cache.get(environment.id, identity.identifier) == identity.id
+
+
+def test_write_for_identifier_does_not_retry_write_for_identity_from_database(
+    identity_id_cache_enabled, environment, identity, mocker
+):
+    # Given
+    write = mocker.MagicMock(side_effect=IntegrityError)
+
+    # When
+    with pytest.raises(IntegrityError):
+        Identity.objects.write_for_identifier(environment, identity.identifier, write)
+
+    # Then
+    write.assert_called_once_with(identity, False)
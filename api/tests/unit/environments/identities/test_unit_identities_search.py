@@ -0,0 +1,78 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.models import Identity
+from environments.identities.search import (
+    IdentifierSearchMode,
+    parse_identifier_search_query,
+)
+
+
+@pytest.mark.parametrize(
+    "search_query, expected_search_mode, expected_identifier",
+    (
+        ('"user"', IdentifierSearchMode.EXACT, "user"),
+        ("user*", IdentifierSearchMode.PREFIX, "user"),
+        ("us", IdentifierSearchMode.SUBSTRING, "us"),
+        ("user", IdentifierSearchMode.SUBSTRING, "user"),
+    ),
+)
+def test_parse_identifier_search_query(
+    search_query, expected_search_mode, expected_identifier
+):
+    assert parse_identifier_search_query(search_query) == (
+        expected_search_mode,
+        expected_identifier,
+    )
+
+
+@pytest.mark.parametrize(
+    "search_query, expected_identifiers",
+    (
+        ("USER*", ["user_1", "user_2"]),
+        ("er_", ["user_1", "user_2", "other_user_1"]),
+        ("_1", ["user_1", "other_user_1"]),
+    ),
+)
+def test_search_identities(
+    admin_client, environment, search_query, expected_identifiers
+):
+    # Given
+    for identifier in ("user_1", "user_2", "other_user_1"):
+        Identity.objects.create(identifier=identifier, environment=environment)
+
+    url = reverse(
+        "api-v1:environments:environment-identities-list",
+        args=[environment.api_key],
+    )
+
+    # When
+    response = admin_client.get(url, data={"q": search_query})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [result["identifier"] for result in response.json()["results"]] == (
+        expected_identifiers
+    )
+
+
+def test_search_identities_with_trailing_wildcard_is_a_prefix_search(
+    admin_client, environment
+):
+    # Given
+    # previously, "user*" was a substring search for the literal "user*"
+    for identifier in ("user_1", "other_user*"):
+        Identity.objects.create(identifier=identifier, environment=environment)
+
+    url = reverse(
+        "api-v1:environments:environment-identities-list",
+        args=[environment.api_key],
+    )
+
+    # When
+    response = admin_client.get(url, data={"q": "user*"})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [result["identifier"] for result in response.json()["results"]] == ["user_1"]
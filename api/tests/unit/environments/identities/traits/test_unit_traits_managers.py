@@ -0,0 +1,57 @@
+from core.constants import INTEGER, STRING
+
+from environments.identities.traits.models import Trait, TraitKey
+
+
+def test_increment_values_increments_and_creates_traits_for_many_identities(
+    settings, environment, identity
+):
+    # Given
+    settings.USE_TRAIT_KEY_REGISTRY = True
+    another_identity = environment.identities.create(identifier="another")
+    Trait.objects.create(
+        identity=identity, trait_key="visits", value_type=INTEGER, integer_value=2
+    )
+
+    # When
+    traits = Trait.objects.increment_values(
+        {
+            identity: {"visits": 3, "score": -1},
+            another_identity: {"visits": 1},
+        }
+    )
+
+    # Then
+    assert {
+        (trait.identity.identifier, trait.trait_key): trait.integer_value
+        for trait in traits
+    } == {
+        (identity.identifier, "visits"): 5,
+        (identity.identifier, "score"): -1,
+        (another_identity.identifier, "visits"): 1,
+    }
+    assert Trait.objects.get(identity=identity, trait_key="visits").integer_value == 5
+    assert dict(
+        TraitKey.objects.filter(environment=environment).values_list(
+            "key", "usage_count"
+        )
+    ) == {"visits": 2, "score": 1}
+
+
+def test_increment_values_does_not_increment_traits_which_are_not_integers(
+    identity,
+):
+    # Given
+    trait = Trait.objects.create(
+        identity=identity, trait_key="name", value_type=STRING, string_value="foo"
+    )
+
+    # When
+    traits = Trait.objects.increment_values({identity: {"name": 1}})
+
+    # Then
+    assert traits == []
+    trait.refresh_from_db()
+    assert trait.value_type == STRING
+    assert trait.string_value == "foo"
+    assert trait.integer_value is None
@@ -1,11 +1,13 @@
+import pytest
 from core.constants import STRING
 
+from environments.identities.models import Identity
 from environments.identities.traits.models import Trait
 from environments.sdk.serializers import SDKBulkCreateUpdateTraitSerializer
 
 
 def test_bulk_create_update_serializer_save_many(
-    identity, django_assert_num_queries, mocker
+    identity, django_assert_num_queries, num_upsert_fallback_queries, mocker
 ):
     # Given
     # an identity with a trait to update
@@ -48,7 +50,7 @@ def test_bulk_create_update_serializer_save_many(
     mocked_request = mocker.MagicMock(environment=identity.environment)
 
     # When
-    with django_assert_num_queries(6):
+    with django_assert_num_queries(4 + num_upsert_fallback_queries):
         serializer = SDKBulkCreateUpdateTraitSerializer(
             data=data,
             many=True,
@@ -63,3 +65,164 @@ def test_bulk_create_update_serializer_save_many(
         identity.identity_traits.get(trait_key=trait_key_to_update).trait_value
         == updated_trait_value
     )
+
+
+def test_bulk_create_update_serializer_does_not_create_identities_to_delete_traits(
+    environment, identity, trait, mocker
+):
+    # Given
+    data = [
+        {
+            "trait_key": trait.trait_key,
+            "trait_value": None,
+            "identity": {"identifier": identity.identifier},
+        },
+        {
+            "trait_key": trait.trait_key,
+            "trait_value": None,
+            "identity": {"identifier": "unknown"},
+        },
+    ]
+    mocked_request = mocker.MagicMock(environment=environment)
+
+    # When
+    serializer = SDKBulkCreateUpdateTraitSerializer(
+        data=data,
+        many=True,
+        context={"environment": environment, "request": mocked_request},
+    )
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+    # Then
+    assert not Identity.objects.filter(identifier="unknown").exists()
+    assert not identity.identity_traits.exists()
+
+
+@pytest.mark.parametrize("num_identities", (1, 10))
+def test_bulk_create_update_serializer_save_many_uses_fixed_number_of_queries(
+    environment,
+    django_assert_num_queries,
+    num_upsert_fallback_queries,
+    mocker,
+    num_identities,
+):
+    # Given
+    # some existing identities with traits to update and delete
+    existing_identities = [
+        Identity.objects.create(identifier=f"existing_{i}", environment=environment)
+        for i in range(num_identities)
+    ]
+    for identity in existing_identities:
+        for trait_key in ("to-update", "to-delete"):
+            Trait.objects.create(
+                identity=identity,
+                trait_key=trait_key,
+                string_value="value",
+                value_type=STRING,
+            )
+
+    # and some data which should update and delete those traits, and create some
+    # new identities with traits
+    data = []
+    for identity in existing_identities:
+        identity_data = {"identifier": identity.identifier}
+        data += [
+            {"trait_key": "to-update", "trait_value": 1, "identity": identity_data},
+            {"trait_key": "to-delete", "trait_value": None, "identity": identity_data},
+        ]
+    data += [
+        {
+            "trait_key": "new-trait",
+            "trait_value": True,
+            "identity": {"identifier": f"new_{i}"},
+        }
+        for i in range(num_identities)
+    ]
+
+    mocked_request = mocker.MagicMock(environment=environment)
+
+    # When
+    with django_assert_num_queries(6 + num_upsert_fallback_queries):
+        serializer = SDKBulkCreateUpdateTraitSerializer(
+            data=data,
+            many=True,
+            context={"environment": environment, "request": mocked_request},
+        )
+        serializer.is_valid(raise_exception=True)
+        traits = serializer.save()
+
+    # Then
+    assert {
+        (trait.identity.identifier, trait.trait_key, trait.trait_value)
+        for trait in traits
+    } == {
+        *((f"existing_{i}", "to-update", 1) for i in range(num_identities)),
+        *((f"new_{i}", "new-trait", True) for i in range(num_identities)),
+    }
+    assert Trait.objects.filter(identity__environment=environment).count() == (
+        num_identities * 2
+    )
+
+
+def test_bulk_update_traits_uses_the_last_value_for_duplicate_trait_keys(identity):
+    # When
+    Trait.objects.bulk_update_traits(
+        {
+            identity: [
+                {"trait_key": "foo", "trait_value": "first"},
+                {"trait_key": "foo", "trait_value": "last"},
+            ]
+        }
+    )
+
+    # Then
+    assert identity.identity_traits.get(trait_key="foo").trait_value == "last"
+
+
+def test_bulk_upsert_updates_traits_created_by_another_request(identity):
+    # Given
+    # a trait which was created after the existing traits were retrieved
+    existing_trait = Trait.objects.create(
+        identity=identity, trait_key="foo", integer_value=1, value_type="int"
+    )
+
+    # When
+    Trait.objects.bulk_upsert(
+        [
+            Trait(
+                identity=identity,
+                trait_key="foo",
+                **Trait.generate_trait_value_data("bar"),
+            ),
+            Trait(
+                identity=identity, trait_key="baz", **Trait.generate_trait_value_data(2)
+            ),
+        ]
+    )
+
+    # Then
+    existing_trait.refresh_from_db()
+    assert existing_trait.trait_value == "bar"
+    assert existing_trait.integer_value is None
+    assert identity.identity_traits.get(trait_key="baz").trait_value == 2
+
+
+def test_bulk_update_traits_does_not_write_unchanged_traits(
+    identity, django_assert_num_queries
+):
+    # Given
+    Trait.objects.create(
+        identity=identity, trait_key="foo", integer_value=1, value_type="int"
+    )
+
+    # When
+    with django_assert_num_queries(1):
+        # to retrieve the existing traits
+        Trait.objects.bulk_update_traits(
+            {
+                identity: [
+                    {"trait_key": "foo", "trait_value": {"type": "int", "value": 1}}
+                ]
+            }
+        )
@@ -0,0 +1,150 @@
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.traits.models import (
+    Trait,
+    TraitDeletion,
+    TraitDeletionStatus,
+)
+from environments.identities.traits.tasks import delete_environment_traits
+from task_processor.models import Task
+from task_processor.task_run_method import TaskRunMethod
+
+
+def test_delete_environment_traits_deletes_traits_in_chunks(
+    settings, mocker, environment, identity, trait
+):
+    # Given
+    settings.TRAIT_DELETION_CHUNK_SIZE = 2
+    mocked_sleep = mocker.patch("environments.identities.traits.tasks.time.sleep")
+
+    identities = [
+        identity,
+        *(environment.identities.create(identifier=f"identity_{i}") for i in range(4)),
+    ]
+    for _identity in identities[1:]:
+        Trait.objects.create(
+            identity=_identity, trait_key=trait.trait_key, string_value="foo"
+        )
+    Trait.objects.create(identity=identity, trait_key="other", string_value="foo")
+
+    trait_deletion = TraitDeletion.objects.create(
+        environment=environment, key=trait.trait_key
+    )
+
+    # When
+    delete_environment_traits(trait_deletion_id=trait_deletion.id)
+
+    # Then
+    assert list(
+        Trait.objects.filter(identity__environment=environment).values_list(
+            "trait_key", flat=True
+        )
+    ) == ["other"]
+
+    trait_deletion.refresh_from_db()
+    assert trait_deletion.status == TraitDeletionStatus.COMPLETE
+    assert trait_deletion.num_deleted_traits == 5
+    assert trait_deletion.completed_date is not None
+
+    # the last chunk wasn't full, so there was only a delay after the first 2 chunks
+    assert mocked_sleep.call_count == 2
+
+
+def test_delete_environment_traits_schedules_a_task_for_each_chunk(
+    settings, mocker, environment, identity, trait
+):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    settings.TRAIT_DELETION_CHUNK_SIZE = 1
+    settings.TRAIT_DELETION_CHUNK_DELAY_SECONDS = 10
+    mocked_sleep = mocker.patch("environments.identities.traits.tasks.time.sleep")
+
+    another_identity = environment.identities.create(identifier="another")
+    Trait.objects.create(
+        identity=another_identity, trait_key=trait.trait_key, string_value="foo"
+    )
+    trait_deletion = TraitDeletion.objects.create(
+        environment=environment, key=trait.trait_key
+    )
+
+    # When
+    delete_environment_traits(trait_deletion_id=trait_deletion.id)
+
+    # Then
+    # only the first chunk has been deleted, and the task has been scheduled to
+    # delete the next chunk after the delay
+    trait_deletion.refresh_from_db()
+    assert trait_deletion.status == TraitDeletionStatus.IN_PROGRESS
+    assert trait_deletion.num_deleted_traits == 1
+    mocked_sleep.assert_not_called()
+
+    task = Task.objects.get(task_identifier=delete_environment_traits.task_identifier)
+    assert task.kwargs == {"trait_deletion_id": trait_deletion.id}
+    assert 0 < (task.scheduled_for - task.created_at).total_seconds() <= 10
+
+    # When
+    # the scheduled tasks are run
+    delete_environment_traits(trait_deletion_id=trait_deletion.id)
+    delete_environment_traits(trait_deletion_id=trait_deletion.id)
+
+    # Then
+    trait_deletion.refresh_from_db()
+    assert trait_deletion.status == TraitDeletionStatus.COMPLETE
+    assert trait_deletion.num_deleted_traits == 2
+    assert not Trait.objects.filter(trait_key=trait.trait_key).exists()
+
+
+def test_delete_environment_traits_resumes_from_last_deleted_trait(
+    environment, identity, trait
+):
+    # Given
+    another_identity = environment.identities.create(identifier="another")
+    remaining_trait = Trait.objects.create(
+        identity=another_identity, trait_key=trait.trait_key, string_value="foo"
+    )
+    # i.e. the task failed after deleting the traits up to the given trait
+    trait_deletion = TraitDeletion.objects.create(
+        environment=environment,
+        key=trait.trait_key,
+        status=TraitDeletionStatus.FAILED,
+        last_deleted_trait_id=trait.id,
+        num_deleted_traits=1,
+    )
+
+    # When
+    delete_environment_traits(trait_deletion_id=trait_deletion.id)
+
+    # Then
+    assert not Trait.objects.filter(id=remaining_trait.id).exists()
+    assert Trait.objects.filter(id=trait.id).exists()
+
+    trait_deletion.refresh_from_db()
+    assert trait_deletion.status == TraitDeletionStatus.COMPLETE
+    assert trait_deletion.num_deleted_traits == 2
+
+
+def test_delete_traits_returns_pollable_trait_deletion(
+    admin_client, environment, trait
+):
+    # Given
+    url = reverse(
+        "api-v1:environments:environment-delete-traits", args=[environment.api_key]
+    )
+
+    # When
+    response = admin_client.post(url, data={"key": trait.trait_key})
+
+    # Then
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    trait_deletion_id = response.json()["id"]
+
+    # and the deletion has been run (synchronously) by the time it's polled
+    status_url = reverse(
+        "api-v1:environments:environment-trait-deletion",
+        args=[environment.api_key, trait_deletion_id],
+    )
+    status_response = admin_client.get(status_url)
+    assert status_response.status_code == status.HTTP_200_OK
+    assert status_response.json()["status"] == TraitDeletionStatus.COMPLETE
+    assert status_response.json()["num_deleted_traits"] == 1
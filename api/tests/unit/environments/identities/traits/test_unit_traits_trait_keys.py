@@ -0,0 +1,170 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait, TraitKey
+
+
+@pytest.fixture(autouse=True)
+def use_trait_key_registry(settings):
+    settings.USE_TRAIT_KEY_REGISTRY = True
+
+
+def _get_usage_counts(environment) -> dict:
+    return dict(
+        TraitKey.objects.filter(environment=environment).values_list(
+            "key", "usage_count"
+        )
+    )
+
+
+def test_bulk_update_traits_records_trait_key_usage(environment, identity, trait):
+    # Given
+    another_identity = Identity.objects.create(
+        identifier="another_identity", environment=environment
+    )
+
+    # When
+    Trait.objects.bulk_update_traits(
+        {
+            identity: [
+                {"trait_key": trait.trait_key, "trait_value": None},
+                {"trait_key": "new_trait", "trait_value": "foo"},
+            ],
+            another_identity: [{"trait_key": "new_trait", "trait_value": "bar"}],
+        }
+    )
+
+    # Then
+    # the trait created by the fixture was recorded when it was saved
+    assert _get_usage_counts(environment) == {trait.trait_key: 0, "new_trait": 2}
+
+
+def test_trait_save_records_trait_key_usage(environment, identity):
+    # When
+    Trait.objects.create(identity=identity, trait_key="trait_key", string_value="foo")
+
+    # Then
+    trait_key = TraitKey.objects.get(environment=environment, key="trait_key")
+    assert trait_key.usage_count == 1
+    assert trait_key.last_seen is not None
+
+
+def test_trait_save_only_records_trait_key_usage_when_created(
+    environment, identity, django_assert_num_queries
+):
+    # Given
+    trait = Trait.objects.create(
+        identity=identity, trait_key="trait_key", string_value="foo"
+    )
+
+    # When
+    trait.string_value = "bar"
+    with django_assert_num_queries(1):
+        trait.save()
+
+    # Then
+    trait_key = TraitKey.objects.get(environment=environment, key="trait_key")
+    assert trait_key.usage_count == 1
+
+
+def test_generate_traits_records_trait_key_usage(environment, identity):
+    # When
+    identity.generate_traits(
+        [{"trait_key": "trait_key", "trait_value": "foo"}], persist=True
+    )
+
+    # Then
+    assert _get_usage_counts(environment) == {"trait_key": 1}
+
+
+def test_updating_traits_does_not_record_trait_key_usage(
+    environment, identity, trait, django_assert_num_queries
+):
+    # When
+    with django_assert_num_queries(2):
+        # to retrieve and update the traits
+        identity.update_traits([{"trait_key": trait.trait_key, "trait_value": "bar"}])
+
+    # Then
+    assert _get_usage_counts(environment) == {trait.trait_key: 1}
+
+
+def test_trait_key_usage_is_not_recorded_if_registry_is_not_used(
+    settings, environment, identity
+):
+    # Given
+    settings.USE_TRAIT_KEY_REGISTRY = False
+
+    # When
+    identity.update_traits([{"trait_key": "trait_key", "trait_value": "foo"}])
+    Trait.objects.create(identity=identity, trait_key="another", string_value="foo")
+
+    # Then
+    assert not TraitKey.objects.exists()
+
+
+def test_bulk_update_traits_does_not_record_traits_created_by_another_request(
+    environment, identity
+):
+    # Given
+    # the identity's traits are retrieved before another request creates a trait
+    identity = Identity.objects.prefetch_related("identity_traits").get(id=identity.id)
+    Trait.objects.create(identity=identity, trait_key="trait_key", string_value="foo")
+
+    # When
+    identity.update_traits([{"trait_key": "trait_key", "trait_value": "bar"}])
+
+    # Then
+    assert identity.identity_traits.get().trait_value == "bar"
+    assert _get_usage_counts(environment) == {"trait_key": 1}
+
+
+def test_trait_keys_are_listed_from_registry(
+    settings, admin_client, environment, identity, trait
+):
+    # Given
+    settings.USE_TRAIT_KEY_REGISTRY = True
+    Trait.objects.create(identity=identity, trait_key="deleted", string_value="foo")
+    identity.update_traits([{"trait_key": "deleted", "trait_value": None}])
+
+    url = reverse(
+        "api-v1:environments:environment-trait-keys", args=[environment.api_key]
+    )
+
+    # When
+    response = admin_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"keys": [trait.trait_key]}
+
+
+def test_delete_traits_deletes_trait_key(admin_client, environment, trait):
+    # Given
+    url = reverse(
+        "api-v1:environments:environment-delete-traits", args=[environment.api_key]
+    )
+
+    # When
+    response = admin_client.post(url, data={"key": trait.trait_key})
+
+    # Then
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert not TraitKey.objects.filter(environment=environment).exists()
+
+
+def test_backfilltraitkeys_corrects_trait_key_usage(environment, identity, trait):
+    # Given
+    TraitKey.objects.update(usage_count=10)
+    Trait.objects.bulk_create(
+        [Trait(identity=identity, trait_key="unrecorded", string_value="foo")]
+    )
+
+    # When
+    call_command("backfilltraitkeys")
+
+    # Then
+    assert _get_usage_counts(environment) == {trait.trait_key: 1, "unrecorded": 1}
@@ -0,0 +1,290 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from environments.identities.traits import write_behind
+from environments.identities.traits.models import Trait
+from environments.identities.traits.write_behind import (
+    TraitWriteBuffer,
+    persist_trait_writes,
+    trait_write_behind_stats_cache,
+)
+from task_processor.models import Task
+from task_processor.processor import run_tasks
+from task_processor.task_run_method import TaskRunMethod
+
+url = reverse("api-v1:sdk-identities")
+
+
+@pytest.fixture()
+def trait_write_buffer(db, settings, mocker):
+    settings.TRAIT_WRITE_BEHIND_ENABLED = True
+    trait_write_buffer = TraitWriteBuffer(batch_size=10, max_delay_seconds=60)
+    mocker.patch.object(write_behind, "trait_write_buffer", trait_write_buffer)
+    trait_write_behind_stats_cache.clear()
+    yield trait_write_buffer
+    # cancel the timer
+    trait_write_buffer.flush()
+
+
+@pytest.fixture()
+def server_side_client(environment_api_key):
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    return client
+
+
+def test_identify_with_write_behind_evaluates_flags_before_persisting_traits(
+    server_side_client, identity, trait, trait_write_buffer
+):
+    # Given
+    data = {
+        "identifier": identity.identifier,
+        "traits": [
+            {"trait_key": trait.trait_key, "trait_value": None},
+            {"trait_key": "new_trait", "trait_value": 1},
+        ],
+    }
+
+    # When
+    response = server_side_client.post(url, data=data, format="json")
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [
+        (item["trait_key"], item["trait_value"]) for item in response.json()["traits"]
+    ] == [("new_trait", 1)]
+
+    # and the traits haven't been persisted yet
+    assert list(identity.identity_traits.all()) == [trait]
+
+    # When
+    trait_write_buffer.flush()
+
+    # Then
+    assert list(identity.identity_traits.values_list("trait_key", "integer_value")) == [
+        ("new_trait", 1)
+    ]
+
+
+def test_identify_with_write_behind_includes_traits_which_are_yet_to_be_flushed(
+    server_side_client, identity, trait_write_buffer
+):
+    # Given
+    server_side_client.post(
+        url,
+        data={
+            "identifier": identity.identifier,
+            "traits": [{"trait_key": "buffered_trait", "trait_value": "foo"}],
+        },
+        format="json",
+    )
+
+    # When
+    response = server_side_client.post(
+        url,
+        data={
+            "identifier": identity.identifier,
+            "traits": [{"trait_key": "another_trait", "trait_value": "bar"}],
+        },
+        format="json",
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert {
+        item["trait_key"]: item["trait_value"] for item in response.json()["traits"]
+    } == {"buffered_trait": "foo", "another_trait": "bar"}
+
+
+def test_trait_write_buffer_keeps_the_last_write_for_each_trait(
+    identity, trait_write_buffer
+):
+    # Given
+    trait_write_buffer.add({identity: [{"trait_key": "key", "trait_value": 1}]})
+
+    # When
+    trait_write_buffer.add({identity: [{"trait_key": "key", "trait_value": 2}]})
+    trait_write_buffer.flush()
+
+    # Then
+    assert Trait.objects.get(identity=identity, trait_key="key").trait_value == 2
+
+    stats = trait_write_buffer.get_stats()
+    assert stats.buffered_writes == 1
+    assert stats.coalesced_writes == 1
+    assert stats.flushes == 1
+    assert stats.flushed_writes == 1
+    assert stats.persisted_writes == 1
+
+
+def test_trait_write_buffer_is_flushed_when_full(
+    identity,
+    trait_write_buffer,
+    django_assert_num_queries,
+    num_upsert_fallback_queries,
+    mocker,
+):
+    # Given
+    mocker.patch.object(write_behind, "record_persisted_writes")
+    trait_data_items = [
+        {"trait_key": f"key_{i}", "trait_value": i}
+        for i in range(trait_write_buffer.batch_size)
+    ]
+
+    # When
+    with django_assert_num_queries(3 + num_upsert_fallback_queries):
+        # to retrieve the identities and their existing traits, and upsert the
+        # traits
+        trait_write_buffer.add({identity: trait_data_items})
+
+    # Then
+    assert identity.identity_traits.count() == trait_write_buffer.batch_size
+    assert trait_write_buffer.get_trait_data_items(identity) == []
+
+
+def test_persist_trait_writes_records_flush_lag(
+    identity, trait, trait_write_buffer, mocker
+):
+    # Given
+    # some writes made after the trait was last saved
+    written_at = trait.updated_date.timestamp()
+    mocker.patch.object(write_behind.time, "time", return_value=written_at + 10)
+    writes = [
+        [identity.id, trait.trait_key, None, written_at, written_at],
+        [identity.id, "new_trait", "foo", written_at + 5, written_at + 5],
+        [identity.id + 1, "deleted_identity_trait", "foo", written_at, written_at],
+    ]
+
+    # When
+    persist_trait_writes(writes=writes)
+
+    # Then
+    assert list(identity.identity_traits.values_list("trait_key", flat=True)) == [
+        "new_trait"
+    ]
+
+    stats = trait_write_buffer.get_stats()
+    assert stats.persisted_writes == 3
+    assert stats.last_flush_lag_seconds == 10.0
+    assert stats.max_flush_lag_seconds == 10.0
+
+
+def test_trait_write_buffer_stats_include_writes_persisted_by_task_processor(
+    identity, trait_write_buffer, settings, mocker
+):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    mocked_time = mocker.patch.object(write_behind.time, "time", return_value=100.0)
+    trait_write_buffer.add({identity: [{"trait_key": "key", "trait_value": 1}]})
+    trait_write_buffer.flush()
+
+    # the writes haven't been persisted until the task processor runs the task
+    assert trait_write_buffer.get_stats().persisted_writes == 0
+
+    # When
+    mocked_time.return_value = 102.5
+    run_tasks()
+
+    # Then
+    assert Task.objects.get().completed is True
+    assert Trait.objects.get(identity=identity, trait_key="key").trait_value == 1
+
+    stats = trait_write_buffer.get_stats()
+    assert stats.flushed_writes == 1
+    assert stats.persisted_writes == 1
+    assert stats.last_flush_lag_seconds == 2.5
+    assert stats.max_flush_lag_seconds == 2.5
+
+
+def test_persist_trait_writes_does_not_overwrite_newer_writes(
+    identity, trait_write_buffer
+):
+    # Given
+    older_writes = [
+        [identity.id, "key", "older", 100.0, 100.0],
+        [identity.id, "to_delete", None, 100.0, 100.0],
+    ]
+    newer_writes = [
+        [identity.id, "key", "newer", 101.0, 101.0],
+        [identity.id, "to_delete", "newer", 101.0, 101.0],
+    ]
+
+    # When
+    # the tasks are run out of order
+    persist_trait_writes(writes=newer_writes)
+    persist_trait_writes(writes=older_writes)
+
+    # Then
+    assert dict(identity.identity_traits.values_list("trait_key", "string_value")) == {
+        "key": "newer",
+        "to_delete": "newer",
+    }
+
+
+def test_persist_trait_writes_does_not_overwrite_traits_written_since(
+    identity, trait, trait_write_buffer
+):
+    # Given
+    # a write which was buffered before the trait was last saved
+    writes = [
+        [identity.id, trait.trait_key, "older", 100.0, 100.0],
+    ]
+
+    # When
+    persist_trait_writes(writes=writes)
+
+    # Then
+    trait.refresh_from_db()
+    assert trait.trait_value != "older"
+
+
+def test_persist_trait_writes_applies_writes_of_unchanged_values(
+    identity, trait, trait_write_buffer, mocker
+):
+    # Given
+    mocker.patch.object(write_behind.time, "time", return_value=2000000000.0)
+    trait_write_buffer.add(
+        {identity: [{"trait_key": trait.trait_key, "trait_value": trait.trait_value}]}
+    )
+
+    # When
+    trait_write_buffer.flush()
+
+    # Then
+    # the trait's updated date is moved on, so that older writes aren't applied
+    trait.refresh_from_db()
+    assert trait.updated_date.timestamp() == 2000000000.0
+
+
+def test_trait_write_buffer_flush_at_exit_persists_buffered_writes(
+    identity, trait_write_buffer
+):
+    # Given
+    trait_write_buffer.add({identity: [{"trait_key": "key", "trait_value": 1}]})
+
+    # When
+    trait_write_buffer.flush_at_exit()
+
+    # Then
+    assert Trait.objects.get(identity=identity, trait_key="key").trait_value == 1
+
+
+def test_trait_write_buffer_flush_at_exit_logs_errors(
+    identity, trait_write_buffer, mocker
+):
+    # Given
+    trait_write_buffer.add({identity: [{"trait_key": "key", "trait_value": 1}]})
+    mocker.patch.object(
+        write_behind.persist_trait_writes, "delay", side_effect=Exception
+    )
+    mocked_logger = mocker.patch.object(write_behind, "logger")
+
+    # When
+    trait_write_buffer.flush_at_exit()
+
+    # Then
+    mocked_logger.exception.assert_called_once_with(
+        "Failed to flush trait writes at exit."
+    )
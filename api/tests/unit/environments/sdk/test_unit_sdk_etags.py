@@ -0,0 +1,30 @@
+import pytest
+from django.test import RequestFactory
+
+from environments.sdk.etags import etag_matches
+
+ETAG = '"abc"'
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected_result",
+    (
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ("*", True),
+        ('"xyz"', False),
+        ("abc", False),
+    ),
+)
+def test_etag_matches(if_none_match, expected_result):
+    # Given
+    headers = {"HTTP_IF_NONE_MATCH": if_none_match} if if_none_match else {}
+    request = RequestFactory().get("/", **headers)
+
+    # When
+    result = etag_matches(request, ETAG)
+
+    # Then
+    assert result is expected_result
@@ -1,10 +1,30 @@
-from core.constants import FLAGSMITH_UPDATED_AT_HEADER
+from datetime import timedelta
+
+import pytest
+from core.constants import (
+    FLAGSMITH_DOCUMENT_DELTA_HEADER,
+    FLAGSMITH_UPDATED_AT_HEADER,
+)
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from flag_engine.api.document_builders import build_environment_document
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from environments.models import Environment, EnvironmentAPIKey
-from features.models import Feature
+from audit.models import AuditLog
+from audit.related_object_type import RelatedObjectType
+from environments.document_patching import (
+    apply_environment_document_delta,
+    environment_documents_match,
+)
+from environments.models import (
+    Environment,
+    EnvironmentAPIKey,
+    environment_document_cache,
+    environment_two_tier_cache,
+)
+from features.models import Feature, FeatureState
 from segments.models import EQUAL, Condition, Segment, SegmentRule
 
 
@@ -81,3 +101,251 @@ def test_get_environment_document_fails_with_invalid_key(
     # We get a 403 since only the server side API keys are able to access the
     # environment document
     assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_get_environment_document_returns_304_if_etag_matches(
+    environment, environment_api_key, django_assert_num_queries, mocker
+):
+    # Given
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    url = reverse("api-v1:environment-document")
+
+    etag = client.get(url)["ETag"]
+    mock_build_environment_document = mocker.patch(
+        "environments.models.build_environment_document"
+    )
+
+    # When
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    assert response[FLAGSMITH_UPDATED_AT_HEADER] == str(
+        environment.updated_at.timestamp()
+    )
+    assert not response.content
+    mock_build_environment_document.assert_not_called()
+
+
+def test_get_environment_document_returns_200_if_environment_updated_since_etag(
+    environment, environment_api_key
+):
+    # Given
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    url = reverse("api-v1:environment-document")
+
+    etag = client.get(url)["ETag"]
+    Environment.objects.filter(id=environment.id).update(updated_at=timezone.now())
+    environment_two_tier_cache.clear()
+
+    # When
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()
+    assert response["ETag"] != etag
+
+
+def test_get_environment_document_etag_is_generated_from_cached_document(
+    settings, environment, environment_api_key
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    url = reverse("api-v1:environment-document")
+
+    etag = client.get(url)["ETag"]
+    environment_document_cache.set(
+        environment.api_key,
+        Environment.get_environment_document(environment.api_key),
+        timeout=60,
+    )
+
+    # the environment is updated but the document cache is still outdated
+    Environment.objects.filter(id=environment.id).update(updated_at=timezone.now())
+    environment_two_tier_cache.clear()
+
+    # When
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    second_response = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    # Then
+    # the outdated document isn't served as a 304 and it isn't given the ETag of
+    # the current version of the environment
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] == etag
+    assert second_response.status_code == status.HTTP_200_OK
+
+
+@pytest.fixture()
+def server_side_sdk_client(environment):
+    api_key = EnvironmentAPIKey.objects.create(environment=environment)
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=api_key.key)
+    return client
+
+
+@pytest.fixture()
+def environment_document(environment, feature, server_side_sdk_client):
+    # the version of the environment held by the client is the date of an audit log
+    _create_audit_log(environment, RelatedObjectType.FEATURE, feature.id)
+    return server_side_sdk_client.get(reverse("api-v1:environment-document")).json()
+
+
+def _create_audit_log(
+    environment: Environment,
+    related_object_type: RelatedObjectType,
+    related_object_id: int,
+    project_level: bool = False,
+) -> AuditLog:
+    return AuditLog.objects.create(
+        project=environment.project,
+        environment=None if project_level else environment,
+        related_object_type=related_object_type.name,
+        related_object_id=related_object_id,
+        log="Some change",
+    )
+
+
+def test_get_environment_document_delta(
+    environment, feature, segment, environment_document, server_side_sdk_client
+):
+    # Given
+    url = reverse("api-v1:environment-document")
+
+    feature_state = FeatureState.objects.get(environment=environment, feature=feature)
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+    _create_audit_log(environment, RelatedObjectType.FEATURE_STATE, feature_state.id)
+
+    new_feature = Feature.objects.create(
+        name="new_feature", project=environment.project
+    )
+    _create_audit_log(
+        environment, RelatedObjectType.FEATURE, new_feature.id, project_level=True
+    )
+
+    segment_id = segment.id
+    segment.delete()
+    _create_audit_log(
+        environment, RelatedObjectType.SEGMENT, segment_id, project_level=True
+    )
+
+    # When
+    response = server_side_sdk_client.get(
+        url, {"since": environment_document["updated_at"]}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers[FLAGSMITH_DOCUMENT_DELTA_HEADER] == "true"
+
+    delta = response.json()
+    assert delta["feature_ids"] == sorted([feature.id, new_feature.id])
+    assert delta["segment_ids"] == [segment_id]
+    assert delta["segments"] == []
+
+    assert environment_documents_match(
+        apply_environment_document_delta(environment_document, delta),
+        build_environment_document(
+            Environment.objects.filter_for_document_builder(id=environment.id).get()
+        ),
+    )
+
+
+def test_get_environment_document_delta_without_changes(
+    environment_document, server_side_sdk_client
+):
+    # Given
+    url = reverse("api-v1:environment-document")
+
+    # When
+    response = server_side_sdk_client.get(
+        url, {"since": environment_document["updated_at"]}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers[FLAGSMITH_DOCUMENT_DELTA_HEADER] == "true"
+    assert response.json()["feature_ids"] == []
+    assert response.json()["updated_at"] == environment_document["updated_at"]
+
+
+def test_get_environment_document_since_unknown_version_returns_full_document(
+    environment, environment_document, server_side_sdk_client
+):
+    # Given
+    url = reverse("api-v1:environment-document")
+    since = parse_datetime(environment_document["updated_at"]) - timedelta(seconds=1)
+
+    # When
+    response = server_side_sdk_client.get(url, {"since": since.isoformat()})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert FLAGSMITH_DOCUMENT_DELTA_HEADER not in response.headers
+    assert response.json()["api_key"] == environment.api_key
+
+
+def test_get_environment_document_since_with_too_many_changes_returns_full_document(
+    settings, environment, environment_document, server_side_sdk_client
+):
+    # Given
+    settings.ENVIRONMENT_DOCUMENT_DELTA_MAX_CHANGES = 1
+    url = reverse("api-v1:environment-document")
+
+    for i in range(2):
+        feature = Feature.objects.create(
+            name=f"feature_{i}", project=environment.project
+        )
+        _create_audit_log(environment, RelatedObjectType.FEATURE, feature.id)
+
+    # When
+    response = server_side_sdk_client.get(
+        url, {"since": environment_document["updated_at"]}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert FLAGSMITH_DOCUMENT_DELTA_HEADER not in response.headers
+    assert len(response.json()["feature_states"]) == 3
+
+
+def test_get_environment_document_since_with_environment_change_returns_full_document(
+    environment, environment_document, server_side_sdk_client
+):
+    # Given
+    url = reverse("api-v1:environment-document")
+
+    environment.hide_disabled_flags = True
+    environment.save()
+    _create_audit_log(environment, RelatedObjectType.ENVIRONMENT, environment.id)
+
+    # When
+    response = server_side_sdk_client.get(
+        url, {"since": environment_document["updated_at"]}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert FLAGSMITH_DOCUMENT_DELTA_HEADER not in response.headers
+    assert response.json()["api_key"] == environment.api_key
+
+
+def test_get_environment_document_with_invalid_since_returns_400(
+    server_side_sdk_client,
+):
+    # Given
+    url = reverse("api-v1:environment-document")
+
+    # When
+    response = server_side_sdk_client.get(url, {"since": "not-a-date"})
+
+    # Then
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
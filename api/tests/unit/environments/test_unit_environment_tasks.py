@@ -1,4 +1,11 @@
-from environments.tasks import rebuild_environment_document
+from audit.models import AuditLog
+from audit.related_object_type import RelatedObjectType
+from environments.tasks import (
+    check_environment_documents,
+    rebuild_environment_document,
+)
+from task_processor.models import Task
+from task_processor.task_run_method import TaskRunMethod
 
 
 def test_rebuild_environment_document(environment, mocker):
@@ -13,3 +20,47 @@ def test_rebuild_environment_document(environment, mocker):
 
     # Then
     mock_dynamo_wrapper.write_environment.assert_called_once_with(environment)
+
+
+def test_patching_environment_documents_schedules_check_of_documents(
+    settings, environment, feature
+):
+    # Given
+    settings.PATCH_ENVIRONMENT_DOCUMENTS = True
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+
+    # When
+    for _ in range(2):
+        AuditLog.objects.create(
+            environment=environment,
+            project=environment.project,
+            related_object_type=RelatedObjectType.FEATURE.name,
+            related_object_id=feature.id,
+        )
+
+    # Then
+    # the check is only scheduled once
+    assert (
+        Task.objects.filter(
+            task_identifier=check_environment_documents.task_identifier
+        ).count()
+        == 1
+    )
+
+
+def test_check_environment_documents_schedules_next_check(db, settings, mocker):
+    # Given
+    settings.PATCH_ENVIRONMENT_DOCUMENTS = True
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    settings.CHECK_ENVIRONMENT_DOCUMENTS_INTERVAL_SECONDS = 60
+    mocked_call_command = mocker.patch("environments.tasks.call_command")
+
+    # When
+    check_environment_documents()
+
+    # Then
+    mocked_call_command.assert_called_once_with("checkenvironmentdocuments")
+
+    task = Task.objects.get(task_identifier=check_environment_documents.task_identifier)
+    assert task.completed is False
+    assert 0 < (task.scheduled_for - task.created_at).total_seconds() <= 60
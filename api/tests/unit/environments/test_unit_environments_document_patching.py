@@ -0,0 +1,397 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management import call_command
+from django.db.models import Q
+from flag_engine.api.document_builders import build_environment_document
+
+from audit.models import AuditLog
+from audit.related_object_type import RelatedObjectType
+from environments.document_patching import (
+    EnvironmentDocumentChange,
+    environment_documents_match,
+    patch_environment_document,
+)
+from environments.models import Environment, environment_document_cache
+from features.models import Feature, FeatureSegment, FeatureState
+from segments.models import EQUAL, Condition, Segment, SegmentRule
+
+
+def _build_environment_document(environment: Environment) -> dict:
+    return build_environment_document(
+        Environment.objects.filter_for_document_builder(id=environment.id).get()
+    )
+
+
+def _get_change(environment, **kwargs) -> EnvironmentDocumentChange:
+    environment.refresh_from_db()
+    return EnvironmentDocumentChange(updated_at=environment.updated_at, **kwargs)
+
+
+def test_patch_environment_document_for_updated_feature_state(
+    environment, feature, multivariate_feature, segment, segment_featurestate
+):
+    # Given
+    document = _build_environment_document(environment)
+
+    feature_state = FeatureState.objects.get(
+        environment=environment, feature=feature, feature_segment=None
+    )
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+    feature_state.feature_state_value.string_value = "updated"
+    feature_state.feature_state_value.save()
+
+    segment_featurestate.enabled = not segment_featurestate.enabled
+    segment_featurestate.save()
+
+    # When
+    patched_document = patch_environment_document(
+        document, environment, _get_change(environment, feature_ids={feature.id})
+    )
+
+    # Then
+    assert environment_documents_match(
+        patched_document, _build_environment_document(environment)
+    )
+
+
+def test_patch_environment_document_for_created_and_deleted_features(
+    environment, feature, segment, segment_featurestate
+):
+    # Given
+    document = _build_environment_document(environment)
+
+    new_feature = Feature.objects.create(
+        name="new_feature", project=environment.project
+    )
+    deleted_feature_id = feature.id
+    feature.delete()
+
+    # When
+    patched_document = patch_environment_document(
+        document,
+        environment,
+        _get_change(environment, feature_ids={new_feature.id, deleted_feature_id}),
+    )
+
+    # Then
+    assert environment_documents_match(
+        patched_document, _build_environment_document(environment)
+    )
+    assert {fs["feature"]["id"] for fs in patched_document["feature_states"]} == {
+        new_feature.id
+    }
+
+
+def test_patch_environment_document_for_segment_override_priority(
+    environment, feature, segment, segment_featurestate
+):
+    # Given
+    another_segment = Segment.objects.create(name="another", project=segment.project)
+    another_feature_segment = FeatureSegment.objects.create(
+        feature=feature, segment=another_segment, environment=environment
+    )
+    FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        feature_segment=another_feature_segment,
+    )
+    document = _build_environment_document(environment)
+
+    # When
+    another_feature_segment.to(0)
+    patched_document = patch_environment_document(
+        document, environment, _get_change(environment, feature_ids={feature.id})
+    )
+
+    # Then
+    assert environment_documents_match(
+        patched_document, _build_environment_document(environment)
+    )
+
+
+def test_patch_environment_document_for_created_updated_and_deleted_segments(
+    environment, feature, segment, segment_featurestate
+):
+    # Given
+    deleted_segment = Segment.objects.create(name="deleted", project=segment.project)
+    document = _build_environment_document(environment)
+
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, property="foo", operator=EQUAL, value="bar")
+    new_segment = Segment.objects.create(name="new", project=segment.project)
+    deleted_segment_id = deleted_segment.id
+    deleted_segment.delete()
+
+    # When
+    patched_document = patch_environment_document(
+        document,
+        environment,
+        _get_change(
+            environment,
+            segment_ids={segment.id, new_segment.id, deleted_segment_id},
+        ),
+    )
+
+    # Then
+    assert environment_documents_match(
+        patched_document, _build_environment_document(environment)
+    )
+
+
+def test_patch_environment_document_only_queries_affected_feature(
+    environment, feature, multivariate_feature, segment, django_assert_num_queries
+):
+    # Given
+    document = _build_environment_document(environment)
+    change = _get_change(environment, feature_ids={multivariate_feature.id})
+
+    # When
+    with django_assert_num_queries(2):
+        # one for the feature states and one for the multivariate values
+        patch_environment_document(document, environment, change)
+
+
+def test_environment_document_change_from_feature_audit_log(project, feature):
+    # Given
+    audit_log = AuditLog(
+        project=project,
+        related_object_type=RelatedObjectType.FEATURE.name,
+        related_object_id=feature.id,
+    )
+
+    # When
+    change = EnvironmentDocumentChange.from_audit_log(audit_log)
+
+    # Then
+    assert change.feature_ids == {feature.id}
+    assert change.segment_ids == set()
+
+
+def test_environment_document_change_from_feature_state_audit_log(environment, feature):
+    # Given
+    feature_state = FeatureState.objects.get(environment=environment, feature=feature)
+    audit_log = AuditLog(
+        environment=environment,
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+        related_object_id=feature_state.id,
+    )
+
+    # When
+    change = EnvironmentDocumentChange.from_audit_log(audit_log)
+
+    # Then
+    assert change.feature_ids == {feature.id}
+
+
+def test_environment_document_change_from_deleted_feature_segment_audit_log(
+    environment, feature, feature_segment, segment_featurestate
+):
+    # Given
+    feature_segment_id = feature_segment.id
+    feature_segment.delete()
+    history_record = FeatureSegment.history.get(id=feature_segment_id, history_type="-")
+    audit_log = AuditLog(
+        environment=environment,
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+        related_object_id=segment_featurestate.id,
+        history_record_id=history_record.history_id,
+        history_record_class_path="features.models.HistoricalFeatureSegment",
+    )
+
+    # When
+    change = EnvironmentDocumentChange.from_audit_log(audit_log)
+
+    # Then
+    assert change.feature_ids == {feature.id}
+
+
+def test_environment_document_change_from_segment_audit_log(project, segment):
+    # Given
+    audit_log = AuditLog(
+        project=project,
+        related_object_type=RelatedObjectType.SEGMENT.name,
+        related_object_id=segment.id,
+    )
+
+    # When
+    change = EnvironmentDocumentChange.from_audit_log(audit_log)
+
+    # Then
+    assert change.segment_ids == {segment.id}
+
+
+def test_environment_document_change_from_environment_audit_log(environment):
+    # Given
+    audit_log = AuditLog(
+        environment=environment,
+        related_object_type=RelatedObjectType.ENVIRONMENT.name,
+        related_object_id=environment.id,
+    )
+
+    # When
+    change = EnvironmentDocumentChange.from_audit_log(audit_log)
+
+    # Then
+    assert change is None
+
+
+def test_audit_log_patches_cached_environment_document(
+    settings, mocker, environment, feature
+):
+    # Given
+    # the cache timeout is set from CACHE_ENVIRONMENT_DOCUMENT_SECONDS on start up
+    mocker.patch.object(environment_document_cache, "default_timeout", 60)
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    settings.PATCH_ENVIRONMENT_DOCUMENTS = True
+    environment_document_cache.set(
+        environment.api_key, _build_environment_document(environment)
+    )
+
+    feature_state = FeatureState.objects.get(environment=environment, feature=feature)
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+
+    # When
+    AuditLog.objects.create(
+        environment=environment,
+        project=environment.project,
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+        related_object_id=feature_state.id,
+    )
+
+    # Then
+    cached_document = environment_document_cache.get(environment.api_key)
+    assert cached_document["feature_states"][0]["enabled"] is feature_state.enabled
+    assert environment_documents_match(
+        cached_document, _build_environment_document(environment)
+    )
+
+
+def test_cached_environment_document_is_deleted_if_it_is_changed_while_patching(
+    settings, mocker, environment, feature
+):
+    # Given
+    mocker.patch.object(environment_document_cache, "default_timeout", 60)
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    settings.PATCH_ENVIRONMENT_DOCUMENTS = True
+    environment_document_cache.set(
+        environment.api_key, _build_environment_document(environment)
+    )
+
+    def _patch_environment_document(document, *args):
+        # another process replaces the cached document while it's being patched
+        environment_document_cache.set(
+            environment.api_key, {**document, "updated_at": "replaced"}
+        )
+        return patch_environment_document(document, *args)
+
+    mocker.patch(
+        "environments.models.patch_environment_document",
+        side_effect=_patch_environment_document,
+    )
+
+    # When
+    Environment.update_cached_environment_documents(
+        Q(id=environment.id),
+        change=_get_change(environment, feature_ids=frozenset([feature.id])),
+    )
+
+    # Then
+    assert environment_document_cache.get(environment.api_key) is None
+
+
+def test_audit_log_writes_patched_environment_documents_to_dynamodb(
+    settings, dynamo_enabled_project_environment_one, mock_dynamo_env_wrapper
+):
+    # Given
+    settings.PATCH_ENVIRONMENT_DOCUMENTS = True
+    environment = dynamo_enabled_project_environment_one
+    feature = Feature.objects.create(name="feature", project=environment.project)
+    mock_dynamo_env_wrapper.reset_mock()
+
+    # When
+    AuditLog.objects.create(
+        environment=environment,
+        project=environment.project,
+        related_object_type=RelatedObjectType.FEATURE.name,
+        related_object_id=feature.id,
+    )
+
+    # Then
+    mock_dynamo_env_wrapper.write_environments.assert_not_called()
+    (
+        (environments, change),
+        _,
+    ) = mock_dynamo_env_wrapper.patch_environments.call_args
+    assert environments == [environment]
+    assert change.feature_ids == {feature.id}
+
+
+def test_checkenvironmentdocuments_rebuilds_inconsistent_cached_documents(
+    settings, mocker, environment, feature
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    mocker.patch.object(environment_document_cache, "default_timeout", 60)
+
+    outdated_document = _build_environment_document(environment)
+    outdated_document["feature_states"] = []
+    environment_document_cache.set(environment.api_key, outdated_document)
+
+    # When
+    call_command("checkenvironmentdocuments")
+
+    # Then
+    assert environment_documents_match(
+        environment_document_cache.get(environment.api_key),
+        _build_environment_document(environment),
+    )
+
+
+def test_checkenvironmentdocuments_writes_built_document_to_dynamodb(
+    settings, mocker, dynamo_enabled_project_environment_one, environment
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 0
+    mocked_environment_wrapper = mocker.patch(
+        "environments.management.commands.checkenvironmentdocuments.environment_wrapper",
+        is_enabled=True,
+    )
+    mocked_environment_wrapper.get_item.side_effect = ObjectDoesNotExist
+    mocked_build_environment_document = mocker.patch(
+        "environments.management.commands.checkenvironmentdocuments.build_environment_document",
+        wraps=build_environment_document,
+    )
+
+    # When
+    call_command("checkenvironmentdocuments")
+
+    # Then
+    # the document of the environment in the project which doesn't use dynamodb
+    # isn't built, and the inconsistent document is only built once
+    mocked_build_environment_document.assert_called_once()
+    mocked_environment_wrapper.write_environment.assert_not_called()
+    (document,), _ = mocked_environment_wrapper.write_environment_document.call_args
+    assert environment_documents_match(
+        document, _build_environment_document(dynamo_enabled_project_environment_one)
+    )
+
+
+def test_checkenvironmentdocuments_does_nothing_if_documents_are_not_stored(
+    settings, mocker, dynamo_enabled_project_environment_one
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 0
+    mocker.patch(
+        "environments.management.commands.checkenvironmentdocuments.environment_wrapper",
+        is_enabled=False,
+    )
+    mocked_build_environment_document = mocker.patch(
+        "environments.management.commands.checkenvironmentdocuments.build_environment_document"
+    )
+
+    # When
+    call_command("checkenvironmentdocuments")
+
+    # Then
+    mocked_build_environment_document.assert_not_called()
@@ -1,11 +1,17 @@
 from unittest.mock import MagicMock
 
 import pytest
+from core.cache_versions import (
+    get_environment_version,
+    get_project_version,
+    increment_environment_versions,
+)
 from core.request_origin import RequestOrigin
 from django.db.models import Q
 from flag_engine.api.document_builders import build_environment_document
 from pytest_django.asserts import assertQuerysetEqual as assert_queryset_equal
 
+from audit.models import AuditLog, RelatedObjectType
 from environments.models import Environment, Webhook
 from features.models import Feature, FeatureState
 from segments.models import Segment
@@ -285,7 +291,7 @@ def test_get_segments_returns_only_segments_that_have_an_override(
     assert segments == [segment]
 
     mock_environment_segments_cache.set.assert_called_once_with(
-        environment.id, segments
+        environment.id, segments, version=get_environment_version(environment.id)
     )
 
 
@@ -339,3 +345,57 @@ def test_get_hide_disabled_flags(
 
     # Then
     assert environment.get_hide_disabled_flags() is expected_result
+
+
+def test_get_from_cache_returns_updated_environment_once_version_is_incremented(
+    environment, django_assert_num_queries
+):
+    # Given
+    Environment.get_from_cache(environment.api_key)
+
+    # another worker updates the environment (without any signals firing in
+    # this process) and increments the version
+    Environment.objects.filter(id=environment.id).update(name="updated name")
+
+    with django_assert_num_queries(0):
+        cached_environment = Environment.get_from_cache(environment.api_key)
+
+    # When
+    increment_environment_versions([environment.id])
+    updated_environment = Environment.get_from_cache(environment.api_key)
+
+    # Then
+    assert cached_environment.name == environment.name
+    assert updated_environment.name == "updated name"
+
+
+def test_get_from_cache_returns_updated_environment_after_project_is_saved(
+    environment, project
+):
+    # Given
+    Environment.get_from_cache(environment.api_key)
+
+    # When
+    project.hide_disabled_flags = True
+    project.save()
+
+    # Then
+    cached_environment = Environment.get_from_cache(environment.api_key)
+    assert cached_environment.project.hide_disabled_flags is True
+
+
+def test_audit_log_increments_versions_of_project_environments(environment, project):
+    # Given
+    environment_version = get_environment_version(environment.id)
+    project_version = get_project_version(project.id)
+
+    # When
+    AuditLog.objects.create(
+        project=project,
+        log="Some audit log",
+        related_object_type=RelatedObjectType.SEGMENT.name,
+    )
+
+    # Then
+    assert get_environment_version(environment.id) != environment_version
+    assert get_project_version(project.id) != project_version
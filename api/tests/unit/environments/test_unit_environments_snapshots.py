@@ -0,0 +1,260 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from environments.identities.models import Identity
+from environments.models import Environment
+from environments.snapshots import (
+    EnvironmentSnapshot,
+    clear_environment_snapshots,
+    get_environment_snapshot,
+)
+from features.models import Feature, FeatureSegment, FeatureState
+from projects.models import Project
+from segments.evaluator import build_trait_index
+
+
+@pytest.fixture()
+def identity_with_overrides(
+    environment, identity, identity_matching_segment, multivariate_feature
+):
+    segment_overridden_feature = Feature.objects.create(
+        name="segment_overridden_feature", project=environment.project
+    )
+    feature_segment = FeatureSegment.objects.create(
+        feature=segment_overridden_feature,
+        segment=identity_matching_segment,
+        environment=environment,
+    )
+    FeatureState.objects.create(
+        feature=segment_overridden_feature,
+        environment=environment,
+        feature_segment=feature_segment,
+        enabled=True,
+    )
+
+    identity_overridden_feature = Feature.objects.create(
+        name="identity_overridden_feature", project=environment.project
+    )
+    FeatureState.objects.create(
+        feature=identity_overridden_feature,
+        environment=environment,
+        identity=identity,
+        enabled=True,
+    )
+
+    # and an override for another identity which should be ignored
+    other_identity = Identity.objects.create(
+        identifier="other_identity", environment=environment
+    )
+    FeatureState.objects.create(
+        feature=segment_overridden_feature,
+        environment=environment,
+        identity=other_identity,
+        enabled=False,
+    )
+
+    return identity
+
+
+@pytest.mark.parametrize("hide_disabled_flags", (True, False))
+def test_get_all_feature_states_from_snapshot_matches_db(
+    settings, environment, identity_with_overrides, hide_disabled_flags
+):
+    # Given
+    environment.hide_disabled_flags = hide_disabled_flags
+    environment.save()
+    identity = Identity.objects.get(id=identity_with_overrides.id)
+
+    settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT = False
+    db_feature_states = identity.get_all_feature_states()
+
+    # When
+    settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT = True
+    snapshot_feature_states = identity.get_all_feature_states()
+
+    # Then
+    assert snapshot_feature_states == db_feature_states
+    assert [fs.get_feature_state_value(identity) for fs in snapshot_feature_states] == [
+        fs.get_feature_state_value(identity) for fs in db_feature_states
+    ]
+
+
+def test_get_all_feature_states_from_snapshot_only_queries_identity_overrides(
+    settings, environment, identity_with_overrides, django_assert_num_queries
+):
+    # Given
+    settings.EVALUATE_IDENTITIES_FROM_ENVIRONMENT_SNAPSHOT = True
+    identity = Identity.objects.select_related(
+        "environment", "environment__project"
+    ).get(id=identity_with_overrides.id)
+    traits = list(identity.identity_traits.all())
+
+    # the first call builds the snapshot
+    identity.get_all_feature_states(traits=traits)
+
+    # When
+    # only the identity's overrides (and their multivariate values) are queried
+    with django_assert_num_queries(2):
+        feature_states = identity.get_all_feature_states(traits=traits)
+
+    # Then
+    assert {fs.feature.name for fs in feature_states} == {
+        "feature",
+        "segment_overridden_feature",
+        "identity_overridden_feature",
+    }
+
+
+def test_snapshot_feature_state_goes_live_without_rebuilding_snapshot(
+    mocker, environment, identity, feature
+):
+    # Given
+    scheduled_feature_state = FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        version=2,
+        live_from=timezone.now() + timedelta(hours=1),
+    )
+    snapshot = EnvironmentSnapshot.build(environment)
+
+    def get_feature_states():
+        return snapshot.get_identity_feature_states(
+            environment=environment,
+            identity_id=identity.id,
+            trait_index=build_trait_index([]),
+            identity_feature_states=[],
+        )
+
+    # Then
+    assert scheduled_feature_state not in get_feature_states()
+
+    mocker.patch(
+        "environments.snapshots.timezone.now",
+        return_value=timezone.now() + timedelta(hours=2),
+    )
+    assert get_feature_states() == [scheduled_feature_state]
+
+
+def test_get_environment_snapshot_rebuilds_snapshot_when_environment_updated(
+    environment, feature
+):
+    # Given
+    clear_environment_snapshots()
+    snapshot = get_environment_snapshot(environment)
+
+    # When
+    cached_snapshot = get_environment_snapshot(environment)
+    environment.updated_at = timezone.now() + timedelta(seconds=1)
+    rebuilt_snapshot = get_environment_snapshot(environment)
+
+    # Then
+    assert cached_snapshot is snapshot
+    assert rebuilt_snapshot is not snapshot
+    assert rebuilt_snapshot.updated_at == environment.updated_at
+
+
+def test_environment_snapshots_are_cleared_when_feature_state_saved(
+    environment, feature, feature_state
+):
+    # Given
+    snapshot = get_environment_snapshot(environment)
+
+    # When
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+
+    # Then
+    rebuilt_snapshot = get_environment_snapshot(environment)
+    assert rebuilt_snapshot is not snapshot
+    assert rebuilt_snapshot.environment_feature_states[0].thaw().enabled is (
+        feature_state.enabled
+    )
+
+
+def test_snapshot_feature_states_are_not_shared_between_evaluations(
+    environment, identity, multivariate_feature
+):
+    # Given
+    snapshot = EnvironmentSnapshot.build(environment)
+
+    def get_feature_states():
+        return snapshot.get_identity_feature_states(
+            environment=environment,
+            identity_id=identity.id,
+            trait_index=build_trait_index([]),
+            identity_feature_states=[],
+        )
+
+    (feature_state,) = get_feature_states()
+    value = feature_state.get_feature_state_value(identity)
+
+    # When
+    feature_state.enabled = not feature_state.enabled
+    feature_state.multivariate_feature_state_values.all()[0].percentage_allocation = 0
+
+    # Then
+    (new_feature_state,) = get_feature_states()
+    assert new_feature_state is not feature_state
+    assert new_feature_state.enabled is not feature_state.enabled
+    assert new_feature_state.get_feature_state_value(identity) == value
+
+
+def test_get_environment_snapshot_evicts_least_recently_used_snapshots(
+    settings, project, environment, django_assert_num_queries
+):
+    # Given
+    settings.ENVIRONMENT_SNAPSHOT_CACHE_SIZE = 2
+    clear_environment_snapshots()
+    other_environments = [
+        Environment.objects.create(name=f"env_{i}", project=project) for i in range(2)
+    ]
+
+    snapshot = get_environment_snapshot(environment)
+    get_environment_snapshot(other_environments[0])
+    get_environment_snapshot(environment)
+
+    # When
+    get_environment_snapshot(other_environments[1])
+
+    # Then
+    assert get_environment_snapshot(environment) is snapshot
+    with django_assert_num_queries(1):
+        # the (empty) snapshot is rebuilt
+        get_environment_snapshot(other_environments[0])
+
+
+def test_environment_snapshots_are_only_cleared_for_the_changed_environment(
+    project, environment, feature, feature_state
+):
+    # Given
+    other_environment = Environment.objects.create(name="other", project=project)
+    snapshot = get_environment_snapshot(environment)
+    other_snapshot = get_environment_snapshot(other_environment)
+
+    # When
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+
+    # Then
+    assert get_environment_snapshot(environment) is not snapshot
+    assert get_environment_snapshot(other_environment) is other_snapshot
+
+
+def test_environment_snapshots_are_cleared_for_the_project_when_feature_saved(
+    organisation, project, environment, feature
+):
+    # Given
+    other_project = Project.objects.create(name="other", organisation=organisation)
+    other_environment = Environment.objects.create(name="other", project=other_project)
+    snapshot = get_environment_snapshot(environment)
+    other_snapshot = get_environment_snapshot(other_environment)
+
+    # When
+    feature.description = "updated"
+    feature.save()
+
+    # Then
+    assert get_environment_snapshot(environment) is not snapshot
+    assert get_environment_snapshot(other_environment) is other_snapshot
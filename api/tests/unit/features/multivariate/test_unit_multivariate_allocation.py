@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from environments.snapshots import get_environment_snapshot
+from features.models import FeatureState
+from features.multivariate.allocation import MultivariateAllocationTable
+from features.multivariate.models import (
+    MultivariateFeatureOption,
+    MultivariateFeatureStateValue,
+)
+
+
+def _get_option_by_linear_search(mv_values, percentage_value):
+    # the original implementation, used to verify that allocations never change
+    start_percentage = 0
+    for mv_value in sorted(mv_values, key=lambda v: v.id):
+        limit = mv_value.percentage_allocation + start_percentage
+        if start_percentage <= percentage_value < limit:
+            return mv_value.multivariate_feature_option
+        start_percentage = limit
+    return None
+
+
+@pytest.mark.parametrize(
+    "allocations",
+    (
+        [30, 30, 40],
+        [0, 50, 0, 50],
+        [10.5, 20.25, 33.3],
+        [100],
+        [],
+        [random.uniform(0, 10) for _ in range(10)],
+    ),
+)
+def test_allocation_table_matches_linear_search(allocations):
+    # Given
+    mv_values = [
+        MultivariateFeatureStateValue(
+            id=len(allocations) - i,
+            percentage_allocation=percentage_allocation,
+            multivariate_feature_option=MultivariateFeatureOption(id=i),
+        )
+        for i, percentage_allocation in enumerate(allocations)
+    ]
+    percentage_values = [
+        0,
+        99.9999,
+        *[random.uniform(0, 100) for _ in range(1000)],
+        *[sum(allocations[: i + 1]) for i in range(len(allocations))],
+    ]
+
+    # When
+    allocation_table = MultivariateAllocationTable.build(mv_values)
+
+    # Then
+    for percentage_value in percentage_values:
+        assert allocation_table.get_option(
+            percentage_value
+        ) is _get_option_by_linear_search(mv_values, percentage_value)
+
+
+def test_allocation_table_is_cached_when_multivariate_values_are_prefetched(
+    environment, multivariate_feature, django_assert_num_queries
+):
+    # Given
+    feature_state = FeatureState.objects.prefetch_related(
+        "multivariate_feature_state_values__multivariate_feature_option"
+    ).get(environment=environment, feature=multivariate_feature)
+
+    # When
+    with django_assert_num_queries(0):
+        allocation_table = feature_state.get_multivariate_allocation_table()
+        cached_allocation_table = feature_state.get_multivariate_allocation_table()
+
+    # Then
+    assert cached_allocation_table is allocation_table
+    assert allocation_table.limits == (30, 60, 100)
+
+
+def test_allocation_table_is_not_cached_when_multivariate_values_are_not_prefetched(
+    environment, multivariate_feature
+):
+    # Given
+    feature_state = FeatureState.objects.get(
+        environment=environment, feature=multivariate_feature
+    )
+    allocation_table = feature_state.get_multivariate_allocation_table()
+
+    # When
+    MultivariateFeatureStateValue.objects.filter(feature_state=feature_state).update(
+        percentage_allocation=10
+    )
+
+    # Then
+    assert feature_state.get_multivariate_allocation_table().limits == (10, 20, 30)
+    assert allocation_table.limits == (30, 60, 100)
+
+
+def test_environment_snapshot_allocation_table_is_rebuilt_when_mv_values_change(
+    environment, multivariate_feature
+):
+    # Given
+    (frozen_feature_state,) = get_environment_snapshot(
+        environment
+    ).environment_feature_states
+    feature_state = frozen_feature_state.thaw()
+    mv_value = feature_state.multivariate_feature_state_values.first()
+
+    # When
+    mv_value.percentage_allocation = 0
+    mv_value.save()
+
+    # Then
+    (frozen_rebuilt_feature_state,) = get_environment_snapshot(
+        environment
+    ).environment_feature_states
+    rebuilt_feature_state = frozen_rebuilt_feature_state.thaw()
+    assert feature_state.get_multivariate_allocation_table().limits == (30, 60, 100)
+    assert rebuilt_feature_state.get_multivariate_allocation_table().limits == (
+        0,
+        30,
+        70,
+    )
@@ -0,0 +1,117 @@
+import gzip
+import json
+from datetime import timedelta
+
+import pytest
+from core.constants import FLAGSMITH_UPDATED_AT_HEADER
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from audit.models import AuditLog, RelatedObjectType
+from features.flags_cache import get_rendered_flags, set_rendered_flags
+from features.models import Feature
+
+url = reverse("api-v1:flags")
+
+
+@pytest.fixture()
+def sdk_client(environment):
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    return client
+
+
+def test_get_flags_from_cache_returns_same_response_as_uncached(
+    settings, sdk_client, environment, feature, django_assert_num_queries
+):
+    # Given
+    Feature.objects.create(name="another_feature", project=environment.project)
+
+    settings.CACHE_FLAGS_SECONDS = 0
+    uncached_response = sdk_client.get(url)
+
+    settings.CACHE_FLAGS_SECONDS = 60
+    sdk_client.get(url)
+
+    # When
+    with django_assert_num_queries(0):
+        cached_response = sdk_client.get(url)
+
+    # Then
+    assert cached_response.status_code == status.HTTP_200_OK
+    assert cached_response["Content-Type"] == "application/json"
+    assert cached_response.content == uncached_response.content
+    assert (
+        cached_response[FLAGSMITH_UPDATED_AT_HEADER]
+        == uncached_response[FLAGSMITH_UPDATED_AT_HEADER]
+    )
+
+
+def test_get_flags_from_cache_serves_gzip_content(
+    settings, sdk_client, environment, feature
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    settings.ENABLE_GZIP_COMPRESSION = True
+
+    # When
+    response = sdk_client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response["Vary"]
+    flags = json.loads(gzip.decompress(response.content))
+    assert [flag["feature"]["name"] for flag in flags] == [feature.name]
+
+
+def test_rendered_flags_are_not_served_for_a_newer_version_of_the_environment(
+    settings, environment
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    rendered_flags = set_rendered_flags(environment, b"[]")
+
+    # When
+    cached_rendered_flags = get_rendered_flags(environment)
+    environment.updated_at += timedelta(seconds=1)
+    outdated_rendered_flags = get_rendered_flags(environment)
+
+    # Then
+    assert cached_rendered_flags == rendered_flags
+    assert outdated_rendered_flags is None
+
+
+def test_rendered_flags_are_cached_per_hide_disabled_flags_mode(settings, environment):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    environment.hide_disabled_flags = False
+    set_rendered_flags(environment, b"[]")
+
+    # When
+    environment.hide_disabled_flags = True
+    rendered_flags = get_rendered_flags(environment)
+
+    # Then
+    assert rendered_flags is None
+
+
+def test_rendered_flags_are_deleted_when_audit_log_updates_environment(
+    settings, project, environment
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    set_rendered_flags(environment, b"[]")
+
+    # When
+    AuditLog.objects.create(
+        project=project,
+        environment=environment,
+        log="Some audit log",
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+    )
+
+    # Then
+    # even though the environment instance hasn't been refreshed from the db
+    assert get_rendered_flags(environment) is None
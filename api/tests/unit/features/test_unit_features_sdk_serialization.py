@@ -0,0 +1,90 @@
+import pytest
+from core.renderers import FastJSONRenderer
+from rest_framework.renderers import JSONRenderer
+
+from features.models import Feature, FeatureSegment, FeatureState
+from features.sdk_serialization import (
+    serialize_feature_state,
+    serialize_feature_states,
+)
+from features.serializers import FeatureStateSerializerFull
+
+
+@pytest.fixture()
+def feature_states(
+    environment, feature, multivariate_feature, segment, identity, trait
+):
+    # a feature with every field populated
+    Feature.objects.create(
+        name="described_feature",
+        project=environment.project,
+        description="A feature with a description",
+        initial_value="1234",
+        default_enabled=True,
+    )
+    # a segment override
+    feature_segment = FeatureSegment.objects.create(
+        feature=feature, segment=segment, environment=environment
+    )
+    FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        feature_segment=feature_segment,
+        enabled=True,
+    )
+    # an identity override
+    FeatureState.objects.create(
+        feature=multivariate_feature,
+        environment=environment,
+        identity=identity,
+        enabled=True,
+    )
+    return FeatureState.objects.filter(environment=environment).order_by("id")
+
+
+@pytest.mark.parametrize("with_identity", (True, False))
+def test_serialize_feature_states_matches_drf_serializer(
+    feature_states, identity, with_identity
+):
+    # Given
+    identity = identity if with_identity else None
+    drf_data = FeatureStateSerializerFull(
+        feature_states, many=True, context={"identity": identity}
+    ).data
+
+    # When
+    data = serialize_feature_states(feature_states, identity=identity)
+
+    # Then
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(drf_data)
+
+
+def test_serialize_feature_state_matches_drf_serializer(environment, feature):
+    # Given
+    feature_state = FeatureState.objects.get(environment=environment, feature=feature)
+
+    # When
+    data = serialize_feature_state(feature_state)
+
+    # Then
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(
+        FeatureStateSerializerFull(feature_state).data
+    )
+
+
+def test_serialize_feature_states_with_non_ascii_content_matches_drf_serializer(
+    environment,
+):
+    # Given
+    Feature.objects.create(
+        name="feature_ü", description="🚀", project=environment.project
+    )
+    feature_states = FeatureState.objects.filter(environment=environment)
+
+    # When
+    data = serialize_feature_states(feature_states)
+
+    # Then
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(
+        FeatureStateSerializerFull(feature_states, many=True).data
+    )
@@ -612,3 +612,84 @@ def test_get_feature_by_uuid_returns_404_if_feature_does_not_exists(client, proj
 
     # Then
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize("cache_flags_seconds", (0, 60))
+def test_get_flags_returns_304_if_etag_matches(
+    settings,
+    api_client,
+    environment,
+    feature,
+    django_assert_num_queries,
+    cache_flags_seconds,
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = cache_flags_seconds
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = reverse("api-v1:flags")
+
+    etag = api_client.get(url)["ETag"]
+
+    # When
+    with django_assert_num_queries(0):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    assert not response.content
+
+
+def test_get_flags_returns_200_if_hide_disabled_flags_changed_since_etag(
+    api_client, environment, feature
+):
+    # Given
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = reverse("api-v1:flags")
+
+    etag = api_client.get(url)["ETag"]
+
+    environment.hide_disabled_flags = True
+    environment.save()
+
+    # When
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+
+
+def test_get_flags_returns_304_for_weak_etag_of_gzipped_response(
+    settings, api_client, environment, feature
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    settings.ENABLE_GZIP_COMPRESSION = True
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = reverse("api-v1:flags")
+
+    gzip_response = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+
+    # When
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=gzip_response["ETag"])
+
+    # Then
+    assert gzip_response["ETag"].startswith('W/"')
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_get_flags_does_not_use_etags_if_the_endpoint_cache_is_enabled(
+    settings, api_client, environment, feature
+):
+    # Given
+    settings.GET_FLAGS_ENDPOINT_CACHE_SECONDS = 60
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = reverse("api-v1:flags")
+
+    # When
+    response = api_client.get(url, HTTP_IF_NONE_MATCH="*")
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert "ETag" not in response
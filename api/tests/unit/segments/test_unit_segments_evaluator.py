@@ -0,0 +1,289 @@
+import pytest
+from core.constants import BOOLEAN, FLOAT, INTEGER, STRING
+
+from environments.identities.traits.models import Trait
+from environments.models import Environment
+from projects.models import Project
+from segments.evaluator import (
+    build_trait_index,
+    clear_compiled_segments_cache,
+    compile_condition,
+    compile_segment,
+    get_compiled_segments,
+)
+from segments.models import (
+    CONTAINS,
+    EQUAL,
+    GREATER_THAN,
+    GREATER_THAN_INCLUSIVE,
+    IN,
+    IS_NOT_SET,
+    IS_SET,
+    LESS_THAN,
+    LESS_THAN_INCLUSIVE,
+    MODULO,
+    NOT_CONTAINS,
+    NOT_EQUAL,
+    PERCENTAGE_SPLIT,
+    REGEX,
+    Condition,
+    SegmentRule,
+)
+
+TRAIT_KEY = "some_property"
+
+
+@pytest.mark.parametrize(
+    "operator, condition_value, trait_value",
+    (
+        (EQUAL, "10", 10),
+        (EQUAL, "10", 11),
+        (GREATER_THAN, "10", 11),
+        (GREATER_THAN_INCLUSIVE, "10", 10),
+        (LESS_THAN, "10.5", 10.4),
+        (LESS_THAN_INCLUSIVE, "10.5", 10.6),
+        (NOT_EQUAL, "not-a-number", 10),
+        (CONTAINS, "10", 10),
+        (EQUAL, "true", True),
+        (NOT_EQUAL, "false", True),
+        (EQUAL, "yes", True),
+        (GREATER_THAN, "true", True),
+        (EQUAL, "foo", "foo"),
+        (NOT_EQUAL, "foo", "foo"),
+        (CONTAINS, "oo", "foo"),
+        (NOT_CONTAINS, "oo", "foo"),
+        (REGEX, "[a-z]+", "foo"),
+        (REGEX, "[0-9]+", "foo"),
+        (REGEX, "[a-z", "foo"),
+        (GREATER_THAN, "1.0.0:semver", "1.0.1"),
+        (LESS_THAN, "1.0.0:semver", "1.0.1"),
+        (EQUAL, "not-a-version:semver", "1.0.0"),
+        (REGEX, "1.0.0:semver", "1.0.0"),
+        (MODULO, "2|0", 4),
+        (MODULO, "2|0", 4.5),
+        (MODULO, "2|0", "4"),
+        (MODULO, "invalid", 4),
+        (IN, "foo,bar", "bar"),
+        (IN, "1,2", 2),
+        (IN, "1,2", 3),
+        (IS_SET, None, "foo"),
+        (IS_NOT_SET, None, "foo"),
+    ),
+)
+def test_compiled_condition_matches_condition_model(
+    identity, operator, condition_value, trait_value
+):
+    # Given
+    condition = Condition(operator=operator, property=TRAIT_KEY, value=condition_value)
+    traits = [
+        Trait(
+            trait_key=TRAIT_KEY,
+            identity=identity,
+            **Trait.generate_trait_value_data(trait_value),
+        )
+    ]
+
+    # When
+    compiled_condition = compile_condition(condition, segment_id=1)
+
+    # Then
+    try:
+        expected_result = condition.does_identity_match(identity, traits)
+    except Exception:
+        # some invalid condition values cause the model evaluation to error, the
+        # compiled condition should just not match in those cases
+        expected_result = False
+    assert compiled_condition.does_identity_match(
+        identity.id, build_trait_index(traits)
+    ) is (expected_result)
+
+
+@pytest.mark.parametrize("operator", (IS_SET, IS_NOT_SET, EQUAL))
+def test_compiled_condition_matches_condition_model_when_trait_missing(
+    identity, operator
+):
+    # Given
+    condition = Condition(operator=operator, property=TRAIT_KEY, value="foo")
+
+    # When
+    compiled_condition = compile_condition(condition, segment_id=1)
+
+    # Then
+    assert compiled_condition.does_identity_match(
+        identity.id, {}
+    ) is condition.does_identity_match(identity, [])
+
+
+@pytest.mark.parametrize(
+    "condition_value, hashed_percentage, expected_result",
+    (("10", 0.05, True), ("10", 0.2, False), ("invalid", 0.05, False)),
+)
+def test_compiled_percentage_split_condition_uses_segment_id(
+    mocker, identity, condition_value, hashed_percentage, expected_result
+):
+    # Given
+    mock_get_hashed_percentage = mocker.patch(
+        "segments.evaluator.get_hashed_percentage_for_object_ids",
+        return_value=hashed_percentage,
+    )
+    condition = Condition(operator=PERCENTAGE_SPLIT, value=condition_value)
+    compiled_condition = compile_condition(condition, segment_id=101)
+
+    # When
+    result = compiled_condition.does_identity_match(identity.id, {})
+
+    # Then
+    assert result is expected_result
+    if condition_value != "invalid":
+        mock_get_hashed_percentage.assert_called_once_with(
+            object_ids=[101, identity.id]
+        )
+
+
+@pytest.mark.parametrize(
+    "rule_type, trait_values, expected_result",
+    (
+        (SegmentRule.ALL_RULE, ("foo", 10), True),
+        (SegmentRule.ALL_RULE, ("foo", 9), False),
+        (SegmentRule.ANY_RULE, ("bar", 10), True),
+        (SegmentRule.ANY_RULE, ("bar", 9), False),
+        (SegmentRule.NONE_RULE, ("bar", 9), True),
+        (SegmentRule.NONE_RULE, ("foo", 9), False),
+    ),
+)
+def test_compiled_segment_matches_segment_model(
+    identity, segment, rule_type, trait_values, expected_result
+):
+    # Given
+    parent_rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    rule = SegmentRule.objects.create(rule=parent_rule, type=rule_type)
+    Condition.objects.create(rule=rule, operator=EQUAL, property="a", value="foo")
+    Condition.objects.create(
+        rule=rule, operator=GREATER_THAN_INCLUSIVE, property="b", value="10"
+    )
+
+    string_value, integer_value = trait_values
+    traits = [
+        Trait(trait_key="a", value_type=STRING, string_value=string_value),
+        Trait(trait_key="b", value_type=INTEGER, integer_value=integer_value),
+    ]
+
+    # When
+    compiled_segment = compile_segment(segment)
+
+    # Then
+    assert compiled_segment.id == segment.id
+    assert compiled_segment.does_identity_match(
+        identity.id, build_trait_index(traits)
+    ) is (expected_result)
+    assert segment.does_identity_match(identity, traits) is expected_result
+
+
+def test_compiled_segment_without_rules_does_not_match(identity, segment):
+    assert compile_segment(segment).does_identity_match(identity.id, {}) is False
+
+
+def test_get_compiled_segments_is_cached_per_environment_version(
+    environment, identity_matching_segment, django_assert_num_queries
+):
+    # Given
+    clear_compiled_segments_cache()
+    compiled_segments = get_compiled_segments(environment)
+
+    # When
+    with django_assert_num_queries(0):
+        cached_compiled_segments = get_compiled_segments(environment)
+
+    # Then
+    assert cached_compiled_segments is compiled_segments
+    assert [cs.segment for cs in compiled_segments] == [identity_matching_segment]
+
+
+def test_get_compiled_segments_recompiles_when_environment_is_updated(
+    environment, identity_matching_segment
+):
+    # Given
+    clear_compiled_segments_cache()
+    compiled_segments = get_compiled_segments(environment)
+
+    # When
+    environment.updated_at = environment.updated_at.replace(
+        year=environment.updated_at.year + 1
+    )
+    recompiled_segments = get_compiled_segments(environment)
+
+    # Then
+    assert recompiled_segments is not compiled_segments
+    assert recompiled_segments == compiled_segments
+
+
+def test_get_compiled_segments_is_cleared_when_condition_changes(
+    environment, identity_matching_segment
+):
+    # Given
+    compiled_segments = get_compiled_segments(environment)
+    rule = identity_matching_segment.rules.first()
+
+    # When
+    Condition.objects.create(rule=rule, operator=IS_SET, property="another_trait")
+
+    # Then
+    recompiled_segments = get_compiled_segments(environment)
+    assert recompiled_segments is not compiled_segments
+    assert len(recompiled_segments[0].rules[0].conditions) == 2
+
+
+@pytest.mark.parametrize("value_type", (BOOLEAN, FLOAT))
+def test_compiled_condition_does_not_compare_incompatible_operators(
+    identity, value_type
+):
+    # Given
+    condition = Condition(operator=CONTAINS, property=TRAIT_KEY, value="1")
+    traits = [
+        Trait(
+            trait_key=TRAIT_KEY,
+            value_type=value_type,
+            boolean_value=True,
+            float_value=1.0,
+        )
+    ]
+
+    # When
+    compiled_condition = compile_condition(condition, segment_id=1)
+
+    # Then
+    assert (
+        compiled_condition.does_identity_match(identity.id, build_trait_index(traits))
+        is False
+    )
+
+
+def test_build_trait_index_uses_first_trait_for_duplicate_keys():
+    # Given
+    first_trait = Trait(trait_key=TRAIT_KEY, value_type=STRING, string_value="foo")
+    second_trait = Trait(trait_key=TRAIT_KEY, value_type=STRING, string_value="bar")
+    other_trait = Trait(trait_key="other", value_type=STRING, string_value="baz")
+
+    # When
+    trait_index = build_trait_index([first_trait, second_trait, other_trait])
+
+    # Then
+    assert trait_index == {TRAIT_KEY: first_trait, "other": other_trait}
+
+
+def test_get_compiled_segments_is_only_cleared_for_the_changed_project(
+    organisation, environment, identity_matching_segment
+):
+    # Given
+    other_project = Project.objects.create(name="other", organisation=organisation)
+    other_environment = Environment.objects.create(name="other", project=other_project)
+    compiled_segments = get_compiled_segments(environment)
+    other_compiled_segments = get_compiled_segments(other_environment)
+
+    # When
+    identity_matching_segment.name = "updated"
+    identity_matching_segment.save()
+
+    # Then
+    assert get_compiled_segments(environment) is not compiled_segments
+    assert get_compiled_segments(other_environment) is other_compiled_segments
@@ -0,0 +1,88 @@
+import psycopg2
+
+from task_processor.notifications import (
+    TASK_CREATED_CHANNEL,
+    TaskNotificationListener,
+)
+from task_processor.threads import TaskRunner
+
+
+def test_task_notification_listener_sleeps_if_not_using_postgres(mocker, settings):
+    # Given
+    settings.TASK_PROCESSOR_LISTEN_FOR_TASKS = True
+    mocker.patch("task_processor.notifications.connection", vendor="sqlite")
+    mocked_sleep = mocker.patch("task_processor.notifications.time.sleep")
+
+    # When
+    notified = TaskNotificationListener().wait(2)
+
+    # Then
+    assert notified is False
+    mocked_sleep.assert_called_once_with(2)
+
+
+def test_task_notification_listener_waits_for_notification(mocker, settings):
+    # Given
+    settings.TASK_PROCESSOR_LISTEN_FOR_TASKS = True
+    mocked_connection = mocker.patch(
+        "task_processor.notifications.connection", vendor="postgresql"
+    )
+    pg_connection = mocked_connection.connection
+    pg_connection.notifies = []
+    pg_connection.poll.side_effect = lambda: pg_connection.notifies.append(
+        mocker.MagicMock(channel=TASK_CREATED_CHANNEL)
+    )
+    mocked_select = mocker.patch(
+        "task_processor.notifications.select.select",
+        return_value=([pg_connection], [], []),
+    )
+    listener = TaskNotificationListener()
+
+    # When
+    notified = listener.wait(2)
+
+    # Then
+    assert notified is True
+    assert pg_connection.notifies == []
+    mocked_select.assert_called_once_with([pg_connection], [], [], 2)
+
+    cursor = mocked_connection.cursor.return_value.__enter__.return_value
+    cursor.execute.assert_called_once_with(f"LISTEN {TASK_CREATED_CHANNEL}")
+
+    # and it only listens once on the same connection
+    listener.wait(2)
+    cursor.execute.assert_called_once()
+
+
+def test_task_notification_listener_sleeps_if_listening_fails(mocker, settings):
+    # Given
+    settings.TASK_PROCESSOR_LISTEN_FOR_TASKS = True
+    mocked_connection = mocker.patch(
+        "task_processor.notifications.connection", vendor="postgresql"
+    )
+    mocked_connection.ensure_connection.side_effect = psycopg2.OperationalError
+    mocked_sleep = mocker.patch("task_processor.notifications.time.sleep")
+
+    # When
+    notified = TaskNotificationListener().wait(2)
+
+    # Then
+    assert notified is False
+    mocked_connection.close.assert_called_once_with()
+    mocked_sleep.assert_called_once_with(2)
+
+
+def test_task_runner_waits_for_tasks_between_runs(mocker):
+    # Given
+    task_runner = TaskRunner(sleep_interval_millis=500, queue_pop_size=3)
+    mocked_run_tasks = mocker.patch("task_processor.threads.run_tasks")
+    mocked_wait = mocker.patch.object(
+        task_runner._listener, "wait", side_effect=lambda _: task_runner.stop()
+    )
+
+    # When
+    task_runner.run()
+
+    # Then
+    mocked_run_tasks.assert_called_once_with(3)
+    mocked_wait.assert_called_once_with(0.5)